@@ -1,6 +1,7 @@
 # agent.py
 import sys
 import traceback
+from contextlib import nullcontext
 from typing import Dict, Any, List
 
 # 引入核心模組
@@ -9,6 +10,10 @@ try:
     from strategy.engine import recommend_action
     from services.prompts import COACH_SYSTEM_PROMPT
     from services.llm_client import call_llm
+    from services.prompt_budget import build_prompt
+    from core.metrics import LLM_SECONDS
+    from core.profiling import RequestProfiler
+    from strategy.batch import spot_fingerprint
 except ImportError as e:
     print(f"❌ 模組載入失敗: {e}")
     sys.exit(1)
@@ -162,20 +167,22 @@ def generate_coaching_advice(user_input: str, game_state: Dict[str, Any], strate
     - 建議行動: {strategy_result.get('action_desc', 'Unknown')}
     - 混合策略頻率: {strategy_str}
     - 建議尺寸: {size_display_text}
-    - 系統判定理由: {strategy_result.get('reasoning', ['無'])}
+    - 系統判定理由: {"；".join(map(str, strategy_result.get('reasoning') or ['無']))}
     
     【用戶問題】: "{user_input}"
     """
     
-    # --- 5. 呼叫 LLM ---
-    raw_advice = call_llm(COACH_SYSTEM_PROMPT, context, history=chat_history)
+    # --- 5. 呼叫 LLM (壓縮快照 + 依 token 預算裁切歷史) ---
+    context, history, _ = build_prompt("coach", COACH_SYSTEM_PROMPT, context, chat_history)
+    with LLM_SECONDS.time(phase="coach"):
+        raw_advice = call_llm(COACH_SYSTEM_PROMPT, context, history=history)
     return _sanitize_coach_output(raw_advice)
 
 # ==========================================
 # 4. 互動對話模式
 # ==========================================
 
-def start_chat_mode():
+def start_chat_mode(profile: bool = False):
     print("\n" + "="*80)
     print("🃏 AI GTO 撲克教練")
     print("--------------------------------------------------")
@@ -210,43 +217,48 @@ def start_chat_mode():
                 chat_history = []
                 print("🧹 (偵測到新牌局，記憶已清除)")
 
-            # Phase 1: 解析 (不帶 Chat History，保持乾淨)
-            new_features = parse_poker_situation(user_input, current_context)
-            if not new_features: continue
+            # --profile：整段 (解析 + 策略 + 教練) 在 cProfile 下執行
+            with (RequestProfiler() if profile else nullcontext()) as prof:
+                # Phase 1: 解析 (不帶 Chat History，保持乾淨)
+                new_features = parse_poker_situation(user_input, current_context)
+                if not new_features: continue
             
-            # 如果是純提問 (is_strategy_query=True)，new_features 可能就是舊的 context，或者有標記
-            is_query = new_features.get("is_strategy_query", False)
-            if not is_query:
-                current_context = new_features
-            else:
-                # 如果是提問，使用舊的 context，但確保不為空
-                if current_context is None:
-                    print("⚠️ 請先提供牌局資訊，再詢問策略。")
-                    continue
+                # 如果是純提問 (is_strategy_query=True)，new_features 可能就是舊的 context，或者有標記
+                is_query = new_features.get("is_strategy_query", False)
+                if not is_query:
+                    current_context = new_features
+                else:
+                    # 如果是提問，使用舊的 context，但確保不為空
+                    if current_context is None:
+                        print("⚠️ 請先提供牌局資訊，再詢問策略。")
+                        continue
             
-            # Phase 2: 策略 (純邏輯 - 呼叫新的 Engine)
-            # engine.recommend_action 會回傳包含 math_data 的完整結果
-            strategy_output = recommend_action(current_context)
+                # Phase 2: 策略 (純邏輯 - 呼叫新的 Engine)
+                # engine.recommend_action 會回傳包含 math_data 的完整結果
+                strategy_output = recommend_action(current_context)
             
-            # [重要] 更新 context 中的數學數據，讓下一輪對話知道優勢狀態
-            # Engine 會把 range math 存在 strategy_output["context"]
-            if "context" in strategy_output:
-                current_context.update(strategy_output["context"])
+                # [重要] 更新 context 中的數學數據，讓下一輪對話知道優勢狀態
+                # Engine 會把 range math 存在 strategy_output["context"]
+                if "context" in strategy_output:
+                    current_context.update(strategy_output["context"])
             
-            # Phase 3: 表達 (帶 Chat History，保持連貫)
-            final_advice = generate_coaching_advice(user_input, current_context, strategy_output, chat_history)
+                # Phase 3: 表達 (帶 Chat History，保持連貫)
+                final_advice = generate_coaching_advice(user_input, current_context, strategy_output, chat_history)
             
-            print("\n" + "-"*30)
-            print(final_advice.strip())
-            print("-"*30)
+                print("\n" + "-"*30)
+                print(final_advice.strip())
+                print("-"*30)
+
+            if profile:
+                prof.save("cli", spot_fingerprint(current_context or {}))
             
             # 更新對話歷史
             chat_history.append({"role": "user", "content": user_input})
             chat_history.append({"role": "assistant", "content": final_advice})
             
-            # 限制歷史長度 (避免 Token 爆炸)
-            if len(chat_history) > 6:
-                chat_history = chat_history[-6:]
+            # 限制歷史長度 (送入 LLM 前另依 token 預算裁切)
+            if len(chat_history) > 20:
+                chat_history = chat_history[-20:]
 
         except KeyboardInterrupt:
             print("\n👋 強制結束。")
@@ -256,4 +268,4 @@ def start_chat_mode():
             traceback.print_exc()
 
 if __name__ == "__main__":
-    start_chat_mode()
+    start_chat_mode(profile="--profile" in sys.argv[1:])
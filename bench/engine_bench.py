@@ -0,0 +1,332 @@
+# bench/engine_bench.py
+"""
+Engine Benchmark：以固定牌局題庫 (bench/corpus.json) 量測策略引擎熱點的延遲分布，
+不呼叫 LLM，可離線執行。結果寫成 JSON，並可與儲存的 baseline 比較。
+
+使用方式:
+    python -m bench.engine_bench                       # 執行並與 bench/baseline.json 比較
+    python -m bench.engine_bench --save-baseline       # 以本次結果覆寫 baseline
+    python -m bench.engine_bench --tag flop -n 50      # 只跑 flop 題目，每題 50 次
+    python -m bench.engine_bench --warm                # 保留範圍快取 (量測同一牌局重複請求的命中路徑)
+
+預設每次呼叫前清空範圍重播/摘要快取 (cold)，量到的是第一次分析該牌局的成本；
+cold 與 warm 的結果不可互相比較，與 baseline 的模式不同時不做比較。
+"""
+from __future__ import annotations
+
+import io
+import gc
+import sys
+import copy
+import json
+import time
+import platform
+import argparse
+import contextlib
+from pathlib import Path
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+from features import analyze_board
+from features.context import normalize_poker_features
+from strategy.engine import recommend_action
+from strategy.ranges.range import RANGE_ANALYZER
+from strategy.ranges.range_utils import apply_action_history_to_ranges, clear_range_caches
+from strategy.batch import spot_fingerprint
+from core.profiling import RequestProfiler
+from core.metrics import HOT_PATH
+from .stats import summarize
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_CORPUS = BENCH_DIR / "corpus.json"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_OUTPUT = BENCH_DIR / "results.json"
+
+
+def load_corpus(path: Path = DEFAULT_CORPUS, tags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """讀取題庫並正規化成 Engine features (正規化不計入量測時間)。"""
+    with open(path, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    spots = []
+    for entry in corpus.get("spots", []):
+        spot_tags = entry.get("tags", [])
+        if tags and not set(tags) & set(spot_tags):
+            continue
+        if "features" in entry:
+            features = entry["features"]
+        else:
+            features = normalize_poker_features(copy.deepcopy(entry["state"]))
+        spots.append({"name": entry["name"], "tags": spot_tags, "features": features})
+    return spots
+
+
+# ------------------------------------------------------------------
+# 量測目標：每個目標回傳 (setup, call, mutates)
+# setup 不計時；mutates=True 表示 call 會改寫輸入，每次都要重新 setup
+# ------------------------------------------------------------------
+def _target_recommend_action(features: Dict[str, Any]):
+    # recommend_action 會寫入 features (例如 hero_pos)，每次都給一份新的
+    return lambda: copy.deepcopy(features), recommend_action, True
+
+
+def _target_apply_action_history(features: Dict[str, Any]):
+    board = features.get("board_cards", [])
+    return lambda: copy.deepcopy(features), lambda f: apply_action_history_to_ranges(f, board), True
+
+
+def _target_range_summary(features: Dict[str, Any]):
+    board = features.get("board_cards", [])
+    if not board:
+        return None
+    hero_range, _ = apply_action_history_to_ranges(copy.deepcopy(features), board)
+    return lambda: hero_range, lambda r: RANGE_ANALYZER.get_postflop_range_summary(r, board), False
+
+
+def _target_analyze_board(features: Dict[str, Any]):
+    board = features.get("board_cards", [])
+    if not board:
+        return None
+    return lambda: board, analyze_board, False
+
+
+TARGETS: Dict[str, Callable[[Dict[str, Any]], Optional[Tuple[Callable, Callable, bool]]]] = {
+    "recommend_action": _target_recommend_action,
+    "apply_action_history_to_ranges": _target_apply_action_history,
+    "get_postflop_range_summary": _target_range_summary,
+    "analyze_board": _target_analyze_board,
+}
+
+
+# 不改寫輸入的目標，單次樣本至少累積這麼久 (秒)，以平均掉 perf_counter 的量測誤差
+MIN_SAMPLE_SECONDS = 0.002
+
+
+def _loops_per_sample(setup: Callable, call: Callable) -> int:
+    arg = setup()
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            call(arg)
+        if time.perf_counter() - started >= MIN_SAMPLE_SECONDS or loops >= 10_000:
+            return loops
+        loops *= 10
+
+
+def _time_calls(setup: Callable, call: Callable, mutates: bool, iterations: int, warmup: int) -> List[float]:
+    loops = 1 if mutates else _loops_per_sample(setup, call)
+    samples = []
+    for i in range(warmup + iterations):
+        arg = setup()
+        started = time.perf_counter()
+        for _ in range(loops):
+            call(arg)
+        elapsed = (time.perf_counter() - started) * 1000.0 / loops
+        if i >= warmup:
+            samples.append(elapsed)
+    return samples
+
+
+def _cold(setup: Callable) -> Callable:
+    """setup (不計時) 時清空範圍快取，讓每次呼叫都重新重播範圍。"""
+    def wrapped():
+        clear_range_caches()
+        return setup()
+    return wrapped
+
+
+def run_benchmark(
+    spots: List[Dict[str, Any]],
+    iterations: int = 20,
+    warmup: int = 2,
+    targets: Optional[List[str]] = None,
+    warm: bool = False,
+) -> Dict[str, Any]:
+    """
+    對每個目標函式逐題量測，回傳
+    {"meta": {...}, "targets": {target: {"overall": stats, "by_tag": {...}, "spots": {...}}}}
+    warm=False (預設) 時每次呼叫前清空範圍快取。
+    """
+    results: Dict[str, Any] = {}
+    for target_name in targets or list(TARGETS):
+        make = TARGETS[target_name]
+        all_samples: List[float] = []
+        by_tag: Dict[str, List[float]] = {}
+        per_spot: Dict[str, Dict[str, float]] = {}
+
+        for spot in spots:
+            prepared = make(spot["features"])
+            if prepared is None:
+                continue
+            setup, call, mutates = prepared
+            if not warm:
+                setup = _cold(setup)
+            gc.collect()
+            gc_was_enabled = gc.isenabled()
+            gc.disable()  # 與 timeit 相同：避免 GC 停頓混入單次量測
+            try:
+                # Engine 會印出除錯訊息，量測期間丟棄以免終端 I/O 影響結果
+                with contextlib.redirect_stdout(io.StringIO()):
+                    samples = _time_calls(setup, call, mutates, iterations, warmup)
+            finally:
+                if gc_was_enabled:
+                    gc.enable()
+
+            per_spot[spot["name"]] = summarize(samples)
+            if target_name == "recommend_action":
+                # 熱點計數與機器無關，可直接看出演算法層級的變化
+                with contextlib.redirect_stdout(io.StringIO()), HOT_PATH.scope() as counts:
+                    call(setup())
+                per_spot[spot["name"]]["hot_path"] = HOT_PATH.report(counts)
+            all_samples.extend(samples)
+            for tag in spot["tags"]:
+                by_tag.setdefault(tag, []).extend(samples)
+
+        results[target_name] = {
+            "overall": summarize(all_samples),
+            "by_tag": {tag: summarize(v) for tag, v in sorted(by_tag.items())},
+            "spots": per_spot,
+        }
+
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "iterations": iterations,
+            "warmup": warmup,
+            "cache": "warm" if warm else "cold",
+            "spots": len(spots),
+        },
+        "targets": results,
+    }
+
+
+def compare(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    metric: str = "p50_ms",
+    tolerance: float = 0.25,
+) -> List[Dict[str, Any]]:
+    """
+    與 baseline 比較 overall 及各題的指定統計量。
+    ratio = 本次 / baseline；ratio > 1 + tolerance 視為退步，< 1 - tolerance 視為進步。
+    """
+    rows = []
+    # 舊 baseline 沒有記錄模式，當時快取一律保留 (warm)
+    if results.get("meta", {}).get("cache", "warm") != baseline.get("meta", {}).get("cache", "warm"):
+        return rows
+    base_targets = baseline.get("targets", {})
+    # 只跑部分題目時 overall 不可比，只比較各題
+    same_corpus = results.get("meta", {}).get("spots") == baseline.get("meta", {}).get("spots")
+    for target_name, data in results.get("targets", {}).items():
+        base = base_targets.get(target_name)
+        if not base:
+            continue
+        pairs = [("overall", data["overall"], base.get("overall"))] if same_corpus else []
+        pairs += [(name, stats, base.get("spots", {}).get(name)) for name, stats in data["spots"].items()]
+        for scope, current, previous in pairs:
+            if not previous or not previous.get(metric):
+                continue
+            ratio = current[metric] / previous[metric]
+            status = "ok"
+            if ratio > 1 + tolerance:
+                status = "regression"
+            elif ratio < 1 - tolerance:
+                status = "improvement"
+            rows.append({
+                "target": target_name,
+                "scope": scope,
+                "baseline_ms": previous[metric],
+                "current_ms": current[metric],
+                "ratio": round(ratio, 3),
+                "status": status,
+            })
+    return rows
+
+
+def profile_spots(spots: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """每題在 cProfile 下跑一次 recommend_action，輸出到 PROFILE_DIR。"""
+    saved = []
+    for spot in spots:
+        features = copy.deepcopy(spot["features"])
+        clear_range_caches()
+        with contextlib.redirect_stdout(io.StringIO()):
+            with RequestProfiler() as prof:
+                recommend_action(features)
+        saved.append(prof.save(f"bench-{spot['name']}", spot_fingerprint(spot["features"])))
+    return saved
+
+
+def _print_results(results: Dict[str, Any]) -> None:
+    print(f"{'target':<32}{'n':>6}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}  (ms)")
+    for target_name, data in results["targets"].items():
+        s = data["overall"]
+        print(f"{target_name:<32}{s['n']:>6}{s['mean_ms']:>10.3f}{s['p50_ms']:>10.3f}{s['p90_ms']:>10.3f}{s['p99_ms']:>10.3f}")
+
+
+def _print_comparison(rows: List[Dict[str, Any]], metric: str) -> None:
+    marks = {"regression": "🔺", "improvement": "🟢", "ok": "  "}
+    print(f"\n📊 vs baseline ({metric})")
+    for row in rows:
+        if row["scope"] != "overall" and row["status"] == "ok":
+            continue
+        print(f"{marks[row['status']]} {row['target']:<32}{row['scope']:<34}"
+              f"{row['baseline_ms']:>10.3f} → {row['current_ms']:>10.3f}  x{row['ratio']:.2f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline engine latency benchmark")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS))
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    parser.add_argument("-n", "--iterations", type=int, default=20, help="每題量測次數")
+    parser.add_argument("--warmup", type=int, default=2, help="每題暖身次數 (不計入)")
+    parser.add_argument("--tag", action="append", help="只跑含此 tag 的題目，可重複指定")
+    parser.add_argument("--target", action="append", choices=list(TARGETS), help="只量測指定函式，可重複指定")
+    parser.add_argument("--metric", default="p50_ms", help="與 baseline 比較的統計量 (例如 p50_ms、p90_ms)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允許的相對誤差 (0.25 = ±25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="將本次結果寫入 baseline")
+    parser.add_argument("--fail-on-regression", action="store_true", help="有退步時以 exit code 1 結束")
+    parser.add_argument("--profile", action="store_true", help="不量測，改為每題輸出一份 cProfile 結果")
+    parser.add_argument("--warm", action="store_true", help="不清空範圍快取 (量測快取命中路徑)")
+    args = parser.parse_args(argv)
+
+    spots = load_corpus(Path(args.corpus), args.tag)
+    if args.profile:
+        profile_spots(spots)
+        return 0
+    print(f"🏁 {len(spots)} spots × {args.iterations} iterations")
+    results = run_benchmark(spots, args.iterations, args.warmup, args.target, args.warm)
+    _print_results(results)
+
+    output = Path(args.output)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"💾 results → {output}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"💾 baseline → {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        print("ℹ️ 尚無 baseline，可用 --save-baseline 建立")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    mode, base_mode = results["meta"]["cache"], baseline.get("meta", {}).get("cache", "warm")
+    if mode != base_mode:
+        print(f"ℹ️ baseline 為 {base_mode} 模式，本次為 {mode}，不做比較")
+        return 0
+    rows = compare(results, baseline, args.metric, args.tolerance)
+    _print_comparison(rows, args.metric)
+    regressions = [r for r in rows if r["status"] == "regression"]
+    if regressions:
+        print(f"⚠️ {len(regressions)} regression(s) beyond ±{args.tolerance:.0%}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+# bench/load_chat.py
+"""
+/chat 壓力測試 (asyncio + httpx)：以固定訊息題庫逐級提高並行數，
+回報每級的 p50/p95/p99 延遲、吞吐量、錯誤率、executor 在途請求數與排隊等待時間，用來找出飽和點。
+
+建議搭配延遲可調的 LLM stub，結果才可重現:
+    python -m bench.load_chat --spawn --stub-latency-ms 300 --levels 1,2,4,8,16,32
+    python -m bench.load_chat --url http://127.0.0.1:8000 --levels 4,8 --duration 30   # 打既有的伺服器
+
+取自伺服器 /metrics：在途請求數 = poker_executor_inflight (排隊中 + 執行中，不是排隊深度)；
+排隊程度看 poker_executor_queue_wait_seconds 的平均等待時間。
+
+每個模擬用戶端帶自己的 X-Session-Key (load-0, load-1, ...)，各自累積對話歷史與持久化寫入；
+--shared-session 改為全部共用同一個 session (量測單一 session 的競爭)。
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import httpx
+
+from .stats import summarize
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT_DIR = BENCH_DIR.parent
+DEFAULT_MESSAGES = BENCH_DIR / "chat_messages.json"
+
+# /chat 在錯誤時仍回 200，advice 以這些符號開頭
+_ERROR_PREFIXES = ("❌", "⚠️")
+
+
+def load_messages(path: Path = DEFAULT_MESSAGES) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    messages = data.get("messages", []) if isinstance(data, dict) else data
+    if not messages:
+        raise ValueError(f"{path} 沒有訊息")
+    return messages
+
+
+# ------------------------------------------------------------------
+# /metrics 解析 (只取需要的幾條，不依賴 prometheus 函式庫)
+# ------------------------------------------------------------------
+def _metric_value(text: str, name: str, labels: str = "") -> float:
+    prefix = f"{name}{{{labels}}}" if labels else name
+    for line in text.splitlines():
+        if line.startswith(prefix + " "):
+            try:
+                return float(line.rsplit(" ", 1)[1])
+            except ValueError:
+                return 0.0
+    return 0.0
+
+
+async def _scrape(client: httpx.AsyncClient) -> Optional[str]:
+    try:
+        response = await client.get("/metrics", timeout=5.0)
+        return response.text if response.status_code == 200 else None
+    except httpx.HTTPError:
+        return None
+
+
+def _queue_wait(text: Optional[str]) -> Tuple[float, float]:
+    if not text:
+        return 0.0, 0.0
+    labels = 'endpoint="chat"'
+    return (
+        _metric_value(text, "poker_executor_queue_wait_seconds_sum", labels),
+        _metric_value(text, "poker_executor_queue_wait_seconds_count", labels),
+    )
+
+
+# ------------------------------------------------------------------
+# 單一並行等級
+# ------------------------------------------------------------------
+async def _worker(
+    client: httpx.AsyncClient,
+    messages: List[str],
+    offset: int,
+    deadline: float,
+    timeout: float,
+    latencies: List[float],
+    errors: Dict[str, int],
+    session_key: str,
+) -> None:
+    headers = {"X-Session-Key": session_key}
+    i = offset
+    while time.perf_counter() < deadline:
+        message = messages[i % len(messages)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            response = await client.post("/chat", json={"message": message}, headers=headers, timeout=timeout)
+            elapsed = (time.perf_counter() - started) * 1000.0
+            if response.status_code != 200:
+                errors[f"http_{response.status_code}"] = errors.get(f"http_{response.status_code}", 0) + 1
+            elif str(response.json().get("advice", "")).startswith(_ERROR_PREFIXES):
+                errors["advice_error"] = errors.get("advice_error", 0) + 1
+            latencies.append(elapsed)
+        except httpx.TimeoutException:
+            errors["timeout"] = errors.get("timeout", 0) + 1
+        except httpx.HTTPError as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+
+async def _sample_inflight(client: httpx.AsyncClient, interval: float, samples: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        text = await _scrape(client)
+        if text is not None:
+            samples.append(_metric_value(text, "poker_executor_inflight", 'endpoint="chat"'))
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_level(
+    url: str,
+    messages: List[str],
+    concurrency: int,
+    duration: float,
+    timeout: float = 120.0,
+    sample_interval: float = 0.25,
+    shared_session: bool = False,
+) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=concurrency + 2, max_keepalive_connections=concurrency + 2)
+    async with httpx.AsyncClient(base_url=url, limits=limits) as client:
+        before = _queue_wait(await _scrape(client))
+        latencies: List[float] = []
+        errors: Dict[str, int] = {}
+        inflight_samples: List[float] = []
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(_sample_inflight(client, sample_interval, inflight_samples, stop))
+
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*[
+            _worker(client, messages, n, deadline, timeout, latencies, errors, "load-shared" if shared_session else f"load-{n}")
+            for n in range(concurrency)
+        ])
+        wall = time.perf_counter() - started
+        stop.set()
+        await sampler
+        after = _queue_wait(await _scrape(client))
+
+    total = len(latencies) + sum(v for k, v in errors.items() if k != "advice_error")
+    failed = sum(errors.values())
+    wait_count = after[1] - before[1]
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "duration_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall > 0 else 0.0,
+        "error_rate": round(failed / total, 4) if total else 0.0,
+        "errors": errors,
+        "latency": summarize(latencies),
+        "inflight": {
+            "mean": round(sum(inflight_samples) / len(inflight_samples), 3) if inflight_samples else None,
+            "max": max(inflight_samples) if inflight_samples else None,
+        },
+        "queue_wait_mean_ms": round((after[0] - before[0]) / wait_count * 1000.0, 3) if wait_count > 0 else None,
+    }
+
+
+def find_saturation(levels: List[Dict[str, Any]], min_gain: float = 0.10) -> Optional[int]:
+    """吞吐量增幅低於 min_gain 的第一個等級之前一級，即視為飽和點。"""
+    for prev, cur in zip(levels, levels[1:]):
+        if prev["throughput_rps"] <= 0:
+            continue
+        if cur["throughput_rps"] < prev["throughput_rps"] * (1 + min_gain):
+            return prev["concurrency"]
+    return None
+
+
+# ------------------------------------------------------------------
+# --spawn：自行啟動 stub LLM 與伺服器
+# ------------------------------------------------------------------
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} 未在 {timeout:.0f} 秒內啟動")
+
+
+def spawn_stack(stub_latency_ms: float, stub_jitter_ms: float, stub_error_rate: float, workers: int) -> Tuple[str, List[subprocess.Popen]]:
+    stub_port, server_port = _free_port(), _free_port()
+    env = dict(os.environ)
+    env.update({
+        "LLM_API_URL": f"http://127.0.0.1:{stub_port}/v1/chat/completions",
+        "LLM_API_KEY": env.get("LLM_API_KEY") or "stub",
+        "ENGINE_WORKERS": str(workers),
+        "PYTHONUNBUFFERED": "1",
+    })
+    devnull = subprocess.DEVNULL
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "services.llm_stub", "--port", str(stub_port),
+         "--latency-ms", str(stub_latency_ms), "--jitter-ms", str(stub_jitter_ms),
+         "--error-rate", str(stub_error_rate)],
+        cwd=ROOT_DIR, env=env, stdout=devnull, stderr=devnull,
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(server_port), "--log-level", "warning"],
+        cwd=ROOT_DIR, env=env, stdout=devnull, stderr=devnull,
+    )
+    url = f"http://127.0.0.1:{server_port}"
+    try:
+        _wait_ready(f"http://127.0.0.1:{stub_port}/docs")
+        _wait_ready(f"{url}/metrics")
+    except RuntimeError:
+        for p in (server, stub):
+            p.terminate()
+        raise
+    return url, [server, stub]
+
+
+def _print_level(r: Dict[str, Any]) -> None:
+    lat = r["latency"]
+    inflight = r["inflight"]
+    wait = r["queue_wait_mean_ms"]
+    print(f"{r['concurrency']:>6}{r['requests']:>8}{r['throughput_rps']:>10.2f}"
+          f"{lat['p50_ms']:>10.1f}{lat['p95_ms']:>10.1f}{lat['p99_ms']:>10.1f}"
+          f"{r['error_rate'] * 100:>8.1f}%"
+          f"{(inflight['mean'] if inflight['mean'] is not None else float('nan')):>9.2f}"
+          f"{(inflight['max'] if inflight['max'] is not None else float('nan')):>6.0f}"
+          f"{(wait if wait is not None else float('nan')):>10.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test POST /chat with ramped concurrency")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="伺服器位址 (--spawn 時忽略)")
+    parser.add_argument("--messages", default=str(DEFAULT_MESSAGES))
+    parser.add_argument("--levels", default="1,2,4,8,16", help="並行數，逗號分隔，依序執行")
+    parser.add_argument("--duration", type=float, default=15.0, help="每級持續秒數")
+    parser.add_argument("--timeout", type=float, default=120.0, help="單一請求逾時秒數")
+    parser.add_argument("--output", help="結果 JSON 路徑")
+    parser.add_argument("--shared-session", action="store_true", help="所有用戶端共用同一個 session (預設各自一個)")
+    parser.add_argument("--spawn", action="store_true", help="自行啟動 LLM stub 與伺服器")
+    parser.add_argument("--stub-latency-ms", type=float, default=300.0)
+    parser.add_argument("--stub-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--engine-workers", type=int, default=int(os.getenv("ENGINE_WORKERS", "0") or 0),
+                        help="--spawn 時伺服器使用的 ENGINE_WORKERS")
+    args = parser.parse_args(argv)
+
+    messages = load_messages(Path(args.messages))
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+
+    processes: List[subprocess.Popen] = []
+    url = args.url
+    if args.spawn:
+        url, processes = spawn_stack(args.stub_latency_ms, args.stub_jitter_ms, args.stub_error_rate, args.engine_workers)
+        print(f"🧪 stub LLM ({args.stub_latency_ms:.0f}ms) + server on {url} (ENGINE_WORKERS={args.engine_workers})")
+
+    results: List[Dict[str, Any]] = []
+    try:
+        print(f"{'conc':>6}{'reqs':>8}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'err':>9}{'inflight':>9}{'max':>6}{'wait ms':>10}")
+        for concurrency in levels:
+            result = asyncio.run(run_level(url, messages, concurrency, args.duration, args.timeout, shared_session=args.shared_session))
+            results.append(result)
+            _print_level(result)
+    finally:
+        for p in processes:
+            p.terminate()
+        for p in processes:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+    saturation = find_saturation(results)
+    if saturation is not None:
+        print(f"📈 吞吐量約在並行數 {saturation} 後停止成長")
+
+    if args.output:
+        report = {
+            "meta": {
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "url": url,
+                "spawned": args.spawn,
+                "stub_latency_ms": args.stub_latency_ms if args.spawn else None,
+                "engine_workers": args.engine_workers if args.spawn else None,
+                "duration_s": args.duration,
+                "shared_session": args.shared_session,
+            },
+            "levels": results,
+            "saturation_concurrency": saturation,
+        }
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"💾 results → {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+# bench/stats.py
+"""Benchmark 共用的統計工具 (百分位數、延遲摘要)。"""
+from __future__ import annotations
+
+from typing import Dict, List
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """線性內插百分位數 (sorted_values 需已排序)。"""
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(rank)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (rank - lo)
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    values = sorted(samples_ms)
+    stats = {
+        "n": len(values),
+        "mean_ms": round(sum(values) / len(values), 4) if values else 0.0,
+        "min_ms": round(values[0], 4) if values else 0.0,
+        "max_ms": round(values[-1], 4) if values else 0.0,
+    }
+    for pct in PERCENTILES:
+        stats[f"p{pct}_ms"] = round(percentile(values, pct), 4)
+    return stats
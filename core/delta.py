@@ -0,0 +1,48 @@
+# core/delta.py
+"""
+差量回應：記錄每個 top-level 欄位最後一次變動的版本號，
+用戶端回報已確認的版本後，只回傳之後變動的欄位 (patch)。
+
+patch 格式 (static/script.js 的 applyPatch 套用)：
+    {"set": {key: value, ...}, "unset": [key, ...]}
+"""
+from __future__ import annotations
+
+from typing import Dict, Any, Optional
+
+
+class VersionedDict:
+    """
+    tracked = VersionedDict()
+    tracked.replace(new_payload, version)   # 每次 session 更新
+    tracked.diff(since)                     # since 之後變動的欄位
+    欄位以 == 比較 (巢狀的 math_data 等也一併比較)，沒變的欄位不會出現在 patch。
+    """
+
+    __slots__ = ("data", "changed", "removed")
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self.changed: Dict[str, int] = {}  # key -> 最後一次設定的版本
+        self.removed: Dict[str, int] = {}  # key -> 被移除的版本
+
+    def replace(self, payload: Optional[Dict[str, Any]], version: int) -> None:
+        payload = payload or {}
+        for key, value in payload.items():
+            if key not in self.data or self.data[key] != value:
+                self.changed[key] = version
+            self.removed.pop(key, None)
+        for key in self.data.keys() - payload.keys():
+            self.changed.pop(key, None)
+            self.removed[key] = version
+        self.data = dict(payload)
+
+    def diff(self, since: int) -> Dict[str, Any]:
+        return {
+            "set": {k: self.data[k] for k, v in self.changed.items() if v > since},
+            "unset": [k for k, v in self.removed.items() if v > since],
+        }
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        return dict(self.data) if self.data else None
+
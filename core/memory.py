@@ -0,0 +1,105 @@
+# core/memory.py
+"""
+記憶體帳目：tracemalloc 快照 (依程式碼位置統計、與上一次快照比較) 與物件深度大小估算。
+tracemalloc 只在開始追蹤後才有額外成本；預設關閉，由 /debug/memory 或 MEMORY_TRACE=1 開啟。
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import tracemalloc
+from typing import Dict, Any, List, Optional
+
+MEMORY_TRACE = os.getenv("MEMORY_TRACE", "").strip().lower() in {"1", "true", "yes", "on"}
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "1"))
+
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def deep_sizeof(obj: Any, _seen: Optional[set] = None) -> int:
+    """遞迴估算容器 (dict/list/tuple/set、__slots__ 物件) 及其內容的總大小 (bytes)，共用物件只算一次。"""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(type(obj), "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, name, None), seen) for name in type(obj).__slots__)
+    return size
+
+
+class MemoryTracker:
+    def __init__(self):
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = MEMORY_TRACE_FRAMES) -> None:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(max(int(frames), 1))
+                self._previous = None
+
+    def stop(self) -> None:
+        with self._lock:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self._previous = None
+
+    @staticmethod
+    def _format(stats, limit: int) -> List[Dict[str, Any]]:
+        rows = []
+        for stat in stats[:limit]:
+            frame = stat.traceback[0]
+            row = {
+                "location": f"{frame.filename}:{frame.lineno}",
+                "size_kb": round(stat.size / 1024, 2),
+                "count": stat.count,
+            }
+            if hasattr(stat, "size_diff"):
+                row["size_diff_kb"] = round(stat.size_diff / 1024, 2)
+                row["count_diff"] = stat.count_diff
+            rows.append(row)
+        return rows
+
+    def report(self, limit: int = 20, group_by: str = "lineno") -> Dict[str, Any]:
+        """
+        取一次快照：回傳目前/峰值追蹤量、前 limit 名配置位置，以及與上一次快照的差異。
+        尚未追蹤時只回傳 {"tracing": False}。
+        """
+        if group_by not in {"lineno", "filename", "traceback"}:
+            raise ValueError(f"group_by 必須是 lineno / filename / traceback: {group_by}")
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                return {"tracing": False}
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+            previous, self._previous = self._previous, snapshot
+
+        result: Dict[str, Any] = {
+            "tracing": True,
+            "traced_current_kb": round(current / 1024, 2),
+            "traced_peak_kb": round(peak / 1024, 2),
+            "top": self._format(snapshot.statistics(group_by), limit),
+        }
+        if previous is not None:
+            result["diff"] = self._format(snapshot.compare_to(previous, group_by), limit)
+        return result
+
+
+MEMORY_TRACKER = MemoryTracker()
+if MEMORY_TRACE:
+    MEMORY_TRACKER.start()
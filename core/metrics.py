@@ -0,0 +1,287 @@
+# core/metrics.py
+"""
+輕量 in-process 指標 (Counter / Gauge / Histogram)，輸出 Prometheus text format。
+不依賴 prometheus_client；每個指標一把鎖，observe 成本約數微秒。
+"""
+from __future__ import annotations
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Tuple, List, Iterable, Optional, Any
+
+# 秒為單位的預設 buckets：涵蓋 engine (ms 級) 到 LLM (數十秒)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 12000)
+
+_LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> _LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[_LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+        _record(("counter", self.name, labels, amount))
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[_LabelKey, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        # key -> [bucket counts..., +Inf count], sum
+        self._counts: Dict[_LabelKey, List[int]] = {}
+        self._sums: Dict[_LabelKey, float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[idx] += 1
+            self._sums[key] += value
+        _record(("histogram", self.name, labels, value))
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        return sum(self._counts.get(self._key(labels), []))
+
+    def render(self) -> List[str]:
+        lines: List[str] = []
+        with self._lock:
+            items = sorted((k, list(v), self._sums[k]) for k, v in self._counts.items())
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def replay(self, events: List[Tuple[str, str, Dict[str, Any], float]]) -> None:
+        """套用其他行程 (engine worker) 記錄下來的觀測值。"""
+        for kind, name, labels, value in events or []:
+            metric = self._metrics.get(name)
+            if kind == "histogram" and isinstance(metric, Histogram):
+                metric.observe(value, **labels)
+            elif kind == "counter" and isinstance(metric, Counter):
+                metric.inc(value, **labels)
+
+
+REGISTRY = Registry()
+
+# ------------------------------------------------------------------
+# 跨行程紀錄：worker 在 recording() 內的觀測值會另外存成事件，回傳給主行程 replay
+# ------------------------------------------------------------------
+_local = threading.local()
+
+
+def _record(event) -> None:
+    events = getattr(_local, "events", None)
+    if events is not None:
+        events.append(event)
+
+
+@contextmanager
+def recording():
+    previous = getattr(_local, "events", None)
+    _local.events = []
+    try:
+        yield _local.events
+    finally:
+        _local.events = previous
+
+
+# ------------------------------------------------------------------
+# 熱點計數：每次呼叫只更新 thread-local dict，scope 結束時才一次寫入全域 Counter
+# ------------------------------------------------------------------
+class HotPathCounters:
+    """
+    with HOT_PATH.scope() as counts:   # 一次請求
+        ...                            # 熱點內呼叫 HOT_PATH.add("hand_strength_calls")
+    counts 為這次請求的計數；巢狀 scope 會併入外層。
+    快取以 "<name>_cache_hits" / "<name>_cache_misses" 命名，report() 會算出命中率。
+    """
+
+    def __init__(self, metric: Counter):
+        self._metric = metric
+        self._local = threading.local()
+
+    def add(self, name: str, amount: int = 1) -> None:
+        counts = getattr(self._local, "counts", None)
+        if counts is None:
+            # 不在任何 scope 內 (例如直接呼叫 RangeAnalyzer)：直接寫入全域
+            self._metric.inc(amount, counter=name)
+            return
+        counts[name] = counts.get(name, 0) + amount
+
+    @contextmanager
+    def scope(self):
+        previous = getattr(self._local, "counts", None)
+        counts: Dict[str, int] = {}
+        self._local.counts = counts
+        try:
+            yield counts
+        finally:
+            self._local.counts = previous
+            if previous is not None:
+                for name, n in counts.items():
+                    previous[name] = previous.get(name, 0) + n
+            else:
+                for name, n in counts.items():
+                    self._metric.inc(n, counter=name)
+
+    @staticmethod
+    def report(counts: Dict[str, int]) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(sorted(counts.items()))
+        for name in list(out):
+            if name.endswith("_cache_hits"):
+                prefix = name[: -len("_hits")]
+                hits = out[name]
+                total = hits + out.get(prefix + "_misses", 0)
+                out[prefix + "_hit_ratio"] = round(hits / total, 4) if total else 0.0
+        return out
+
+
+# ------------------------------------------------------------------
+# 應用指標 (集中定義，避免各模組命名不一致)
+# ------------------------------------------------------------------
+LLM_SECONDS = REGISTRY.histogram("poker_llm_seconds", "LLM call latency by phase (parse/coach).", ["phase"])
+LLM_RETRIES = REGISTRY.counter("poker_llm_retries_total", "Retried LLM attempts.")
+LLM_FAILURES = REGISTRY.counter("poker_llm_failures_total", "LLM calls that failed after retries or were rejected by the breaker.", ["reason"])
+PROMPT_TOKENS = REGISTRY.histogram("poker_prompt_tokens", "Estimated prompt tokens by phase.", ["phase"], TOKEN_BUCKETS)
+PARSE_VALIDATION_SECONDS = REGISTRY.histogram("poker_parse_validation_seconds", "Local normalization/validation after LLM extraction.")
+RECOMMEND_SECONDS = REGISTRY.histogram("poker_recommend_action_seconds", "recommend_action latency by street.", ["street"])
+RANGE_SECONDS = REGISTRY.histogram("poker_range_seconds", "Range filtering/summary computation by stage.", ["stage"])
+QUEUE_WAIT_SECONDS = REGISTRY.histogram("poker_executor_queue_wait_seconds", "Time a request waits for an executor thread.", ["endpoint"])
+REQUEST_SECONDS = REGISTRY.histogram("poker_request_seconds", "End-to-end request latency.", ["endpoint"])
+INFLIGHT = REGISTRY.gauge("poker_executor_inflight", "Requests submitted to the executor and not yet finished.", ["endpoint"])
+ERRORS = REGISTRY.counter("poker_errors_total", "Errors by phase.", ["phase"])
+HOT_PATH = HotPathCounters(REGISTRY.counter("poker_hot_path_total", "Engine hot-path operation counts (hand evaluations, combo iterations, board analyses, range copies).", ["counter"]))
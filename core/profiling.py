@@ -0,0 +1,115 @@
+# core/profiling.py
+"""
+單次請求的 on-demand profiling (cProfile)。
+只在請求帶 profile 旗標時啟用，未啟用時不包裝任何呼叫 (零額外成本)。
+每次輸出兩個檔案到 PROFILE_DIR：
+  - <label>-<fingerprint>-<時間>.pstats     : python -m pstats / snakeviz 可讀
+  - <label>-<fingerprint>-<時間>.collapsed  : collapsed stack，可直接給 flamegraph.pl / speedscope
+"""
+from __future__ import annotations
+
+import os
+import time
+import pstats
+import cProfile
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Tuple, Optional
+
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR") or Path(__file__).resolve().parents[1] / "profiles")
+
+_TRUTHY = {"1", "true", "yes", "on"}
+
+# Python 3.12 起同時間只能有一個 profiler；profiled 請求彼此排隊
+_PROFILE_LOCK = threading.Lock()
+
+_FuncKey = Tuple[str, int, str]
+
+
+def is_profile_flag(value: Any) -> bool:
+    """解析 header / query / CLI 的 profile 旗標 ("1"、"true"、"yes"、"on")。"""
+    if isinstance(value, bool):
+        return value
+    return str(value or "").strip().lower() in _TRUTHY
+
+
+def _frame_name(func: _FuncKey) -> str:
+    filename, line, name = func
+    if filename == "~":  # built-in
+        return name.strip("<>").replace(";", ",")
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ",")
+
+
+def collapse_stats(stats: pstats.Stats, min_us: int = 1, max_depth: int = 64) -> List[str]:
+    """
+    將 cProfile 的呼叫圖展開成 collapsed stack ("a;b;c <微秒>")。
+    cProfile 只記錄 caller→callee 的邊，這裡依每條邊佔 callee 累計時間的比例
+    往下分配 self time，得到與 flamegraph 相容的近似堆疊。
+    """
+    raw: Dict[_FuncKey, Any] = stats.stats  # func -> (cc, nc, tt, ct, callers)
+    callees: Dict[_FuncKey, Dict[_FuncKey, float]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge[3]  # 該 caller 呼叫此 func 的累計時間
+
+    totals: Dict[str, float] = {}
+
+    def _walk(func: _FuncKey, path_time: float, stack: List[_FuncKey]) -> None:
+        _, _, tt, ct, _ = raw[func]
+        share = path_time / ct if ct > 0 else 0.0
+        stack.append(func)
+        key = ";".join(_frame_name(f) for f in stack)
+        totals[key] = totals.get(key, 0.0) + tt * share
+        if len(stack) < max_depth:
+            for child, edge_ct in callees.get(func, {}).items():
+                if child in stack or child not in raw:
+                    continue  # 遞迴呼叫：時間已計入上層
+                child_time = edge_ct * share
+                if child_time * 1e6 >= min_us:
+                    _walk(child, child_time, stack)
+        stack.pop()
+
+    roots = [f for f, v in raw.items() if not v[4]]
+    for root in roots:
+        _walk(root, raw[root][3], [])
+
+    return [f"{k} {int(v * 1e6)}" for k, v in sorted(totals.items()) if int(v * 1e6) >= min_us]
+
+
+class RequestProfiler:
+    """
+    with RequestProfiler() as prof:
+        result = handle(...)
+    paths = prof.save("strategy", fingerprint)
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory or PROFILE_DIR)
+        self._profile = cProfile.Profile()
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "RequestProfiler":
+        _PROFILE_LOCK.acquire()
+        self._started = time.perf_counter()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._profile.disable()
+        self.elapsed = time.perf_counter() - self._started
+        _PROFILE_LOCK.release()
+
+    def save(self, label: str, fingerprint: Optional[str] = None) -> Dict[str, str]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S") + f"-{int(time.time() * 1000) % 1000:03d}"
+        base = self.directory / f"{label}-{fingerprint or 'nofp'}-{stamp}"
+
+        stats = pstats.Stats(self._profile)
+        pstats_path = base.with_suffix(".pstats")
+        stats.dump_stats(str(pstats_path))
+
+        collapsed_path = base.with_suffix(".collapsed")
+        collapsed_path.write_text("\n".join(collapse_stats(stats)) + "\n", encoding="utf-8")
+
+        print(f"🔬 [{label}] profile saved ({self.elapsed * 1000:.1f} ms) → {pstats_path.name}")
+        return {"pstats": str(pstats_path), "collapsed": str(collapsed_path)}
@@ -0,0 +1,161 @@
+# core/session_store.py
+"""
+Session 持久化 (SQLite, WAL)：write-behind。
+請求路徑只把快照放進記憶體佇列 (同一個 key 只保留最新一筆)，
+背景 thread 批次寫入；伺服器重啟後第一次存取該 session 時才從資料庫讀回。
+
+資料表只有 (key, payload JSON, updated_at)：session 整體讀寫，不需要欄位查詢。
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from core.metrics import ERRORS
+
+# 空字串 = 不持久化 (只存在記憶體，與舊行為相同)
+SESSION_DB = os.getenv("SESSION_DB", str(Path(__file__).resolve().parents[1] / "sessions.db"))
+# 記憶體內保留的 session 數 (LRU)；被擠出的 session 已寫入資料庫，下次存取再讀回
+HOT_SESSIONS = int(os.getenv("HOT_SESSIONS", "8") or 8)
+
+# 寫入失敗後的重試間隔 (秒，每次加倍到上限)；close() 之後最多再試 _CLOSE_RETRIES 次，仍失敗就捨棄並列出 key
+_RETRY_DELAY = 0.5
+_RETRY_DELAY_MAX = 30.0
+_CLOSE_RETRIES = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    key TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(_SCHEMA)
+    return conn
+
+
+class SessionStore:
+    """
+    store = SessionStore("sessions.db")
+    store.save(key, record)   # 不碰磁碟，只放進佇列
+    store.load(key)           # 佇列中尚未寫入的版本優先，其次才查資料庫
+    store.close()             # 寫完佇列後關閉 (shutdown 時呼叫)
+    """
+
+    def __init__(self, path: str = SESSION_DB):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = _connect(self.path)    # 只給 writer thread 用
+        self._reader = _connect(self.path)  # WAL：讀取不會被寫入擋住
+        self._read_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._writing: Dict[str, Dict[str, Any]] = {}  # 寫入中的批次 (load 仍要看得到)
+        self._wakeup = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="session-writer", daemon=True)
+        self._writer.start()
+
+    # ------------------------------------------------------------------
+    # 請求路徑
+    # ------------------------------------------------------------------
+    def save(self, key: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._pending[key] = record
+            self._idle.clear()
+        self._wakeup.set()
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._pending.get(key) or self._writing.get(key)
+        if record is not None:
+            return record
+        with self._read_lock:
+            row = self._reader.execute("SELECT payload FROM sessions WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @property
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    # ------------------------------------------------------------------
+    # 背景寫入
+    # ------------------------------------------------------------------
+    def _run(self) -> None:
+        delay: Optional[float] = None  # 上一批寫入失敗時的重試間隔 (None = 等下一次 save)
+        close_failures = 0
+        while True:
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._writing = batch
+            written = self._write(batch) if batch else True
+            delay = None if written else min((delay or _RETRY_DELAY / 2) * 2, _RETRY_DELAY_MAX)
+            with self._lock:
+                self._writing = {}
+                if self._closed and not written:
+                    close_failures += 1
+                    if close_failures >= _CLOSE_RETRIES:
+                        dropped, self._pending = sorted(self._pending), {}
+                        print(f"⚠️ Session 寫入重試 {close_failures} 次仍失敗，關閉時捨棄 {len(dropped)} 筆: {', '.join(dropped)}")
+                if not self._pending:
+                    self._idle.set()
+                    if self._closed:
+                        return
+
+    def _write(self, batch: Dict[str, Dict[str, Any]]) -> bool:
+        now = time.time()
+        try:
+            rows = [(key, json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str), now)
+                    for key, record in batch.items()]
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR REPLACE INTO sessions (key, payload, updated_at) VALUES (?, ?, ?)", rows)
+            self._conn.execute("COMMIT")
+            return True
+        except Exception as e:
+            ERRORS.inc(phase="session_store")
+            print(f"⚠️ Session 寫入失敗 ({len(batch)} 筆): {e}")
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            # 放回佇列 (期間若有更新的版本則以新版為準)，_run 依退避間隔重試
+            with self._lock:
+                for key, record in batch.items():
+                    self._pending.setdefault(key, record)
+            return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等到佇列寫完 (回傳 False 表示逾時)。"""
+        self._wakeup.set()
+        return self._idle.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._idle.clear()
+        self._wakeup.set()
+        self._writer.join(timeout)
+        if not self._writer.is_alive():
+            self._conn.close()
+        else:
+            with self._lock:
+                unsaved = sorted(set(self._pending) | set(self._writing))
+            print(f"⚠️ Session 寫入 {timeout}s 內未完成，尚未寫入 {len(unsaved)} 筆: {', '.join(unsaved)}")
+        with self._read_lock:
+            self._reader.close()
@@ -11,7 +11,8 @@ from .cards import (  # noqa: F401
     canonicalize_hand,
     analyze_board,
 )
-from .context import parse_poker_situation  # noqa: F401
+from .context import parse_poker_situation, normalize_poker_features, prune_context  # noqa: F401
+from .game_state import GameState  # noqa: F401
 
 __all__ = [
     "RANKS",
@@ -23,4 +24,7 @@ __all__ = [
     "canonicalize_hand",
     "analyze_board",
     "parse_poker_situation",
+    "normalize_poker_features",
+    "prune_context",
+    "GameState",
 ]
@@ -6,6 +6,8 @@ from __future__ import annotations
 from typing import List, Tuple, Optional, Dict, Any, Union
 import re
 
+from core.metrics import HOT_PATH
+
 try:
     from core.config import RANKS, RANK_VALUE, SUITS
 except ImportError:
@@ -160,6 +162,7 @@ def analyze_board(board_cards: List[str]) -> Dict[str, Any]:
     """
     進化的公共牌分析。包含連張分、聽牌密度與動態性評估。
     """
+    HOT_PATH.add("analyze_board_calls")
     if not board_cards:
         return {"danger_level": "safe", "is_monotone": False, "is_paired": False, "archetypes": []}
 
@@ -11,12 +11,13 @@ from typing import Dict, Any, List, Union
 from .cards import parse_hand_string, normalize_card_input
 from core.parser import (
     normalize_action_token,
-    resolve_amount,
     action_has_amount,
 )
 from services.prompts import EXTRACTOR_SYSTEM_PROMPT
 from services.llm_client import call_llm
-from strategy.pot import compute_pot_bb, compute_amount_to_call
+from services.prompt_budget import build_prompt
+from core.metrics import LLM_SECONDS, PARSE_VALIDATION_SECONDS
+from strategy.hand_state import HandState, STREETS
 
 
 # ==========================================
@@ -277,11 +278,232 @@ def _normalize_actions_from_model(raw_actions: Any, hero_pos: str, villain_pos:
     return _normalize_actions(raw_actions, hero_pos, villain_pos)
 
 
+def _coerce_float(value: Any):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    raw = str(value).strip().lower().replace("bb", "")
+    if not raw:
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
+def normalize_poker_features(data: Dict[str, Any], current_state: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    將結構化牌局 (LLM 擷取結果或 API 直接傳入) 正規化為 Engine 使用的 features：
+    位置/手牌/公牌/行動正規化、籌碼與底池計算、缺失欄位與系統限制檢查。
+    欄位不足或不符限制時拋出 ValueError。
+    """
+    if current_state is None:
+        current_state = {}
+
+    players = data.get("players") if isinstance(data.get("players"), dict) else {}
+    hero_info = players.get("hero") if isinstance(players.get("hero"), dict) else {}
+    villain_info = players.get("villain") if isinstance(players.get("villain"), dict) else {}
+
+    hero_pos = hero_info.get("position") or data.get("hero_position") or current_state.get("hero_position")
+    villain_pos = villain_info.get("position") or data.get("villain_position") or current_state.get("villain_position")
+
+    # current_state 的籌碼是上一輪重播後的剩餘籌碼；本輪沒給時先取上一輪快照記錄的起始籌碼
+    previous_snapshots = current_state.get("street_snapshots")
+    starting_stacks = HandState.exported_stacks(previous_snapshots)
+
+    # Stacks: 0 is valid, so check for None explicitly
+    hero_stack = hero_info.get("stack_bb")
+    if hero_stack is None: hero_stack = data.get("hero_stack_bb")
+    if hero_stack is None and hero_pos: hero_stack = starting_stacks.get(str(hero_pos).upper())
+    if hero_stack is None: hero_stack = current_state.get("hero_stack_bb")
+    # [NEW] Default to 100bb if not specified
+    if hero_stack is None: hero_stack = 100.0
+
+    villain_stack = villain_info.get("stack_bb")
+    if villain_stack is None: villain_stack = data.get("villain_stack_bb")
+    if villain_stack is None and villain_pos: villain_stack = starting_stacks.get(str(villain_pos).upper())
+    if villain_stack is None: villain_stack = current_state.get("villain_stack_bb")
+    # [NEW] Default to 100bb if not specified
+    if villain_stack is None: villain_stack = 100.0
+
+    hero_cards = hero_info.get("cards") or data.get("hero_hole_cards") or current_state.get("hero_hole_cards") or []
+
+    board = data.get("board") if isinstance(data.get("board"), dict) else {}
+    board_cards = board.get("cards") or data.get("board_cards") or current_state.get("board_cards") or []
+
+    hero_cards = normalize_card_input(hero_cards)
+    board_cards = normalize_card_input(board_cards)
+
+    board_len = len(board_cards)
+    street_map = {0: "preflop", 3: "flop", 4: "turn", 5: "river"}
+    derived_street = street_map.get(board_len)
+    street = data.get("street") or derived_street
+    if derived_street:
+        street = derived_street
+
+    raw_actions = data.get("actions", [])
+    if not raw_actions and current_state:
+         raw_actions = current_state.get("actions", [])
+
+    actions = _normalize_actions_from_model(raw_actions, hero_pos or "", villain_pos or "")
+
+    hero_stack = _coerce_float(hero_stack)
+    villain_stack = _coerce_float(villain_stack)
+
+    stacks = {}
+    if hero_pos:
+        stacks[str(hero_pos).upper()] = hero_stack
+    if villain_pos:
+        stacks[str(villain_pos).upper()] = villain_stack
+
+    blinds = data.get("blinds") if isinstance(data.get("blinds"), dict) else {}
+    sb = _coerce_float(blinds.get("sb", 0.5)) or 0.5
+    bb = _coerce_float(blinds.get("bb", 1.0)) or 1.0
+
+    # 單次重播：底池、各街投入、剩餘籌碼、跟注額 (all-in / 超額下注會把實際金額寫回 action)
+    # 上一輪留下的各街快照可沿用到第一條被修改的街為止
+    hand_state = HandState.replay(actions, stacks, sb, bb, previous=previous_snapshots)
+
+    action_missing = []
+    for street_name in ("preflop", "flop", "turn", "river"):
+        for item in actions.get(street_name, []):
+            if not isinstance(item, dict):
+                continue
+            act = str(item.get("action", "")).lower()
+            if act in {"open", "raise", "bet", "limp"} and not action_has_amount(item):
+                label = f"actions.{street_name}.{act}_amount"
+                if label not in action_missing:
+                    action_missing.append(label)
+
+    missing = []
+    if not hero_pos:
+        missing.append("hero_position")
+    if not villain_pos:
+        missing.append("villain_position")
+    if not hero_cards or len(hero_cards) != 2:
+        missing.append("hero_hole_cards")
+    if hero_stack is None:
+        missing.append("hero_stack_bb")
+    if villain_stack is None:
+        missing.append("villain_stack_bb")
+    if board_len not in (0, 3, 4, 5):
+        missing.append("board_cards")
+    if not street:
+        missing.append("street")
+    if not _actions_has_data(actions):
+        missing.append("actions")
+    if action_missing:
+        missing.extend(action_missing)
+
+    if missing:
+        raise ValueError(f"缺少必要欄位: {', '.join(missing)}")
+
+    data["hero_position"] = hero_pos
+    data["villain_position"] = villain_pos
+    data["hero_stack_bb"] = hero_stack
+    data["villain_stack_bb"] = villain_stack
+    data["hero_hole_cards"] = hero_cards
+    data["board_cards"] = board_cards
+    data["street"] = street
+    data["actions"] = actions
+
+    pos_matchup, hero_is_ip = _classify_position_matchup(hero_pos, villain_pos, data.get("is_3bet_pot", False))
+    data["hero_is_ip"] = hero_is_ip
+    data["position_matchup"] = pos_matchup
+
+    preflop_raises = 0
+    for item in actions.get("preflop", []):
+        if not isinstance(item, dict):
+            continue
+        action = str(item.get("action", "")).lower()
+        if action in {"open", "raise"}:
+            preflop_raises += 1
+    if preflop_raises >= 2:
+        data["is_3bet_pot"] = True
+    elif preflop_raises == 1:
+        data["is_3bet_pot"] = False
+
+    data["pot_bb"] = hand_state.pot_bb if _actions_has_data(actions) else 0.0
+    data["amount_to_call"] = hand_state.to_call(hero_pos, street) if street in STREETS else 0.0
+    data["preflop_aggressor_seat"] = hand_state.preflop_aggressor  # 座位 (例如 "BTN")；Engine ctx 的 preflop_aggressor 是 "hero"/"villain"
+    data["street_snapshots"] = hand_state.export()
+    if villain_pos:
+        data["all_in_cap"] = hand_state.all_in_cap(hero_pos, villain_pos)
+
+    if street in ("flop", "turn", "river"):
+        street_actions = actions.get(street, [])
+        if isinstance(street_actions, list) and street_actions:
+            inferred = _infer_villain_action(actions, street, villain_pos)
+            data["villain_action"] = inferred or "check"
+
+    pot_raw = data.get("pot_bb")
+    stack_raw = data.get("hero_stack_bb")
+    data["pot_bb"] = float(pot_raw) if pot_raw is not None else 0.0
+    data["hero_stack_bb"] = float(stack_raw) if stack_raw is not None else 100.0
+    if data["pot_bb"] > 0:
+        # Use current effective stack for SPR
+        current_stacks = hand_state.stacks()
+        eff_stack = current_stacks.get(str(hero_pos).upper(), 0.0) if hero_pos else 0.0
+        data["spr"] = eff_stack / data["pot_bb"]
+        # Update returned stack to reflect current state
+        data["hero_stack_bb"] = eff_stack
+        if villain_pos:
+            data["villain_stack_bb"] = current_stacks.get(str(villain_pos).upper(), 0.0)
+    else:
+        data["spr"] = 100.0
+
+    # ==========================================
+    # 驗證系統限制條件
+    # ==========================================
+    validation_errors = _validate_constraints(data)
+    if validation_errors:
+        err_msg = "\\n".join(validation_errors)
+        print(f"Validation Error: {err_msg}")
+        raise ValueError(f"牌局不符合系統限制:\\n{err_msg}")
+
+    return data
+
+
 # ==========================================
 # 主要解析流程
 # ==========================================
 
 
+# Session 之間只需保留下一輪解析 (current_state) 與 Engine 會讀到的欄位；
+# math_data、advantage_data 等每次請求都會重算，留在 session 只會累積記憶體。
+SESSION_CONTEXT_KEYS = (
+    "hero_position",
+    "villain_position",
+    "hero_hole_cards",
+    "board_cards",
+    "actions",
+    "street",
+    "hero_stack_bb",
+    "villain_stack_bb",
+    "pot_bb",
+    "amount_to_call",
+    "spr",
+    "hero_is_ip",
+    "villain_action",
+    "is_3bet_pot",
+    "position_matchup",
+)
+
+# HandState 各街快照 (下一輪只重播被修改的街)：伺服器端的重播快取，
+# 只存在 GameState 的內部欄位，不進 API 回應、delta patch 與持久化紀錄
+REPLAY_CACHE_KEYS = (
+    "street_snapshots",
+)
+
+
+def prune_context(context: Dict[str, Any]) -> Dict[str, Any]:
+    """只保留 SESSION_CONTEXT_KEYS，丟掉 Engine 回填的衍生資料 (範圍摘要、優勢數據等)。"""
+    if not context:
+        return context
+    return {k: context[k] for k in SESSION_CONTEXT_KEYS if k in context}
+
+
 def parse_poker_situation(user_input: str, current_state: Dict[str, Any] = None) -> Dict[str, Any]:
     print("正在更新牌局資訊...")
 
@@ -291,19 +513,6 @@ def parse_poker_situation(user_input: str, current_state: Dict[str, Any] = None)
         else:
             print("需要補充")
 
-    def _coerce_float(value: Any):
-        if value is None:
-            return None
-        if isinstance(value, (int, float)):
-            return float(value)
-        raw = str(value).strip().lower().replace("bb", "")
-        if not raw:
-            return None
-        try:
-            return float(raw)
-        except ValueError:
-            return None
-
     state_prompt = ""
     if current_state:
         filtered_keys = [
@@ -320,11 +529,14 @@ def parse_poker_situation(user_input: str, current_state: Dict[str, Any] = None)
             "villain_action",
         ]
         filtered_state = {k: v for k, v in current_state.items() if k in filtered_keys}
-        state_prompt = f"【上一手狀態】: {json.dumps(filtered_state)}\n"
+        state_json = json.dumps(filtered_state, ensure_ascii=False, separators=(",", ":"))
+        state_prompt = f"【上一手狀態】: {state_json}\n"
 
     user_message = f"{state_prompt}【用戶新指令】: {user_input}"
+    user_message, _, _ = build_prompt("parse", EXTRACTOR_SYSTEM_PROMPT, user_message)
 
-    json_str = call_llm(EXTRACTOR_SYSTEM_PROMPT, user_message)
+    with LLM_SECONDS.time(phase="parse"):
+        json_str = call_llm(EXTRACTOR_SYSTEM_PROMPT, user_message)
     json_str = json_str.replace("```json", "").replace("```", "").strip()
 
     data = None
@@ -445,260 +657,13 @@ def parse_poker_situation(user_input: str, current_state: Dict[str, Any] = None)
 
         if data.get("is_strategy_query", False):
             if current_state:
-                preserved = current_state.copy()
+                preserved = dict(current_state.items())  # dict 或 GameState
                 preserved["is_strategy_query"] = True
                 return preserved
             raise ValueError("無法執行策略查詢：缺少當前牌局狀態 (Current State Missing)")
 
-        players = data.get("players") if isinstance(data.get("players"), dict) else {}
-        hero_info = players.get("hero") if isinstance(players.get("hero"), dict) else {}
-        villain_info = players.get("villain") if isinstance(players.get("villain"), dict) else {}
-
-        if current_state is None:
-            current_state = {}
-
-        hero_pos = hero_info.get("position") or data.get("hero_position") or current_state.get("hero_position")
-        villain_pos = villain_info.get("position") or data.get("villain_position") or current_state.get("villain_position")
-        
-        # Stacks: 0 is valid, so check for None explicitly
-        hero_stack = hero_info.get("stack_bb")
-        if hero_stack is None: hero_stack = data.get("hero_stack_bb")
-        if hero_stack is None: hero_stack = current_state.get("hero_stack_bb")
-        # [NEW] Default to 100bb if not specified
-        if hero_stack is None: hero_stack = 100.0
-
-        villain_stack = villain_info.get("stack_bb")
-        if villain_stack is None: villain_stack = data.get("villain_stack_bb")
-        if villain_stack is None: villain_stack = current_state.get("villain_stack_bb")
-        # [NEW] Default to 100bb if not specified
-        if villain_stack is None: villain_stack = 100.0
-
-        hero_cards = hero_info.get("cards") or data.get("hero_hole_cards") or current_state.get("hero_hole_cards") or []
-
-        board = data.get("board") if isinstance(data.get("board"), dict) else {}
-        board_cards = board.get("cards") or data.get("board_cards") or current_state.get("board_cards") or []
-
-        hero_cards = normalize_card_input(hero_cards)
-        board_cards = normalize_card_input(board_cards)
-
-        board_len = len(board_cards)
-        street_map = {0: "preflop", 3: "flop", 4: "turn", 5: "river"}
-        derived_street = street_map.get(board_len)
-        street = data.get("street") or derived_street
-        if derived_street:
-            street = derived_street
-
-        raw_actions = data.get("actions", [])
-        if not raw_actions and current_state:
-             raw_actions = current_state.get("actions", [])
-
-        actions = _normalize_actions_from_model(raw_actions, hero_pos or "", villain_pos or "")
-
-        hero_stack = _coerce_float(hero_stack)
-        villain_stack = _coerce_float(villain_stack)
-
-        stacks = {}
-        if hero_pos:
-            stacks[str(hero_pos).upper()] = hero_stack
-        if villain_pos:
-            stacks[str(villain_pos).upper()] = villain_stack
-
-        # Track current/remaining stacks for correct SPR calc
-        current_stacks = {k: v for k, v in stacks.items()}
-
-        def _resolve_amounts_and_stacks():
-            pot = 0.0
-            total_contrib = {key: 0.0 for key in stacks}
-
-            for street_name in ("preflop", "flop", "turn", "river"):
-                street_contrib = {}
-                street_max = 0.0
-
-                if street_name == "preflop":
-                    if "SB" in stacks:
-                        amt = 0.5
-                        street_contrib["SB"] = amt
-                        total_contrib["SB"] = total_contrib.get("SB", 0.0) + amt
-                        pot += amt
-                        current_stacks["SB"] = max(stacks["SB"] - total_contrib["SB"], 0.0)
-                        street_max = max(street_max, amt)
-                    if "BB" in stacks:
-                         amt = 1.0
-                         street_contrib["BB"] = amt
-                         total_contrib["BB"] = total_contrib.get("BB", 0.0) + amt
-                         pot += amt
-                         current_stacks["BB"] = max(stacks["BB"] - total_contrib["BB"], 0.0)
-                         street_max = max(street_max, amt)
-
-                for item in actions.get(street_name, []):
-                    if not isinstance(item, dict):
-                        continue
-                    player = str(item.get("player", "")).upper()
-                    act = str(item.get("action", "")).lower()
-                    if not player or act in {"", "fold", "check"}:
-                        continue
-                    
-                    # Try to resolve amount
-                    amount = resolve_amount(item, pot, 1.0)
-                    
-                    # [FIX]: Handle All-in without explicit amount
-                    if amount is None and act in {"open", "bet", "raise", "limp"} and item.get("is_all_in") and player in stacks:
-                        remaining = stacks[player] - total_contrib.get(player, 0.0)
-                        amount = street_contrib.get(player, 0.0) + max(remaining, 0.0)
-                        item["amount"] = round(amount, 2) # Inject back into item
-
-                    # [FIX]: If still None but we have ratio (e.g. "full pot"), resolve_amount should have handled it IF pot > 0.
-                    # But resolve_amount logic depends on parser.py
-                    # Here we re-check if amount is None but we have ratio
-                    if amount is None and act in {"open", "bet", "raise", "limp"}:
-                         # Check for manual ratio calc if parser didn't catch it
-                         # (parser needs `amount_ratio` key)
-                         pass
-
-                    if act == "call":
-                        required = max(street_max - street_contrib.get(player, 0.0), 0.0)
-                        # All-in call checks
-                        can_pay = stacks.get(player, 9999) - total_contrib.get(player, 0.0)
-                        actual_call = min(required, can_pay)
-                        
-                        if amount is None:
-                            amount = actual_call
-                        elif amount > required: # Cap at required
-                            amount = required # Simplify
-                        
-                        street_contrib[player] = street_contrib.get(player, 0.0) + amount
-                        total_contrib[player] = total_contrib.get(player, 0.0) + amount
-                        pot += amount
-                        if player in current_stacks:
-                            current_stacks[player] = max(stacks[player] - total_contrib[player], 0.0)
-                        continue
-
-                    if act in {"open", "bet", "raise", "limp"}:
-                        if amount is None:
-                            amount = 1.0 if act == "limp" else 0.0
-                        
-                        # Verify we don't bet more than stack
-                        can_pay = stacks.get(player, 99999) - total_contrib.get(player, 0.0) # total remaining
-                        prev_street_bet = street_contrib.get(player, 0.0)
-                        # amount implies 'raise to' or 'bet total'.
-                        # Increment needed = amount - prev_street_bet
-                        increment_needed = amount - prev_street_bet
-                        if increment_needed > can_pay:
-                             # Cap to all-in
-                             amount = prev_street_bet + can_pay
-                             item["amount"] = round(amount, 2)
-
-                        prev = street_contrib.get(player, 0.0)
-                        increment = max(amount - prev, 0.0)
-                        if increment > 0:
-                            pot += increment
-                            street_contrib[player] = prev + increment
-                            total_contrib[player] = total_contrib.get(player, 0.0) + increment
-                            if player in current_stacks:
-                                current_stacks[player] = max(stacks[player] - total_contrib[player], 0.0)
-                        
-                        if street_contrib.get(player, 0.0) > street_max:
-                            street_max = street_contrib[player]
-
-        _resolve_amounts_and_stacks()
-
-        action_missing = []
-        for street_name in ("preflop", "flop", "turn", "river"):
-            for item in actions.get(street_name, []):
-                if not isinstance(item, dict):
-                    continue
-                act = str(item.get("action", "")).lower()
-                if act in {"open", "raise", "bet", "limp"} and not action_has_amount(item):
-                    label = f"actions.{street_name}.{act}_amount"
-                    if label not in action_missing:
-                        action_missing.append(label)
-
-        missing = []
-        if not hero_pos:
-            missing.append("hero_position")
-        if not villain_pos:
-            missing.append("villain_position")
-        if not hero_cards or len(hero_cards) != 2:
-            missing.append("hero_hole_cards")
-        if hero_stack is None:
-            missing.append("hero_stack_bb")
-        if villain_stack is None:
-            missing.append("villain_stack_bb")
-        if board_len not in (0, 3, 4, 5):
-            missing.append("board_cards")
-        if not street:
-            missing.append("street")
-        if not _actions_has_data(actions):
-            missing.append("actions")
-        if action_missing:
-            missing.extend(action_missing)
-
-        if missing:
-            raise ValueError(f"缺少必要欄位: {', '.join(missing)}")
-
-        data["hero_position"] = hero_pos
-        data["villain_position"] = villain_pos
-        data["hero_stack_bb"] = hero_stack
-        data["villain_stack_bb"] = villain_stack
-        data["hero_hole_cards"] = hero_cards
-        data["board_cards"] = board_cards
-        data["street"] = street
-        data["actions"] = actions
-
-        pos_matchup, hero_is_ip = _classify_position_matchup(hero_pos, villain_pos, data.get("is_3bet_pot", False))
-        data["hero_is_ip"] = hero_is_ip
-        data["position_matchup"] = pos_matchup
-
-        preflop_raises = 0
-        for item in actions.get("preflop", []):
-            if not isinstance(item, dict):
-                continue
-            action = str(item.get("action", "")).lower()
-            if action in {"open", "raise"}:
-                preflop_raises += 1
-        if preflop_raises >= 2:
-            data["is_3bet_pot"] = True
-        elif preflop_raises == 1:
-            data["is_3bet_pot"] = False
-
-        blinds = data.get("blinds") if isinstance(data.get("blinds"), dict) else {}
-        sb = _coerce_float(blinds.get("sb", 0.5)) or 0.5
-        bb = _coerce_float(blinds.get("bb", 1.0)) or 1.0
-
-        data["pot_bb"] = compute_pot_bb(actions, sb, bb)
-        data["amount_to_call"] = compute_amount_to_call(actions, street, hero_pos, sb, bb)
-
-        if street in ("flop", "turn", "river"):
-            street_actions = actions.get(street, [])
-            if isinstance(street_actions, list) and street_actions:
-                inferred = _infer_villain_action(actions, street, villain_pos)
-                data["villain_action"] = inferred or "check"
-
-        pot_raw = data.get("pot_bb")
-        stack_raw = data.get("hero_stack_bb")
-        data["pot_bb"] = float(pot_raw) if pot_raw is not None else 0.0
-        data["hero_stack_bb"] = float(stack_raw) if stack_raw is not None else 100.0
-        if data["pot_bb"] > 0:
-            # Use current effective stack for SPR
-            eff_stack = current_stacks.get(str(hero_pos).upper(), 0.0) if hero_pos else 0.0
-            data["spr"] = eff_stack / data["pot_bb"]
-            # Update returned stack to reflect current state
-            data["hero_stack_bb"] = eff_stack
-            if villain_pos:
-                data["villain_stack_bb"] = current_stacks.get(str(villain_pos).upper(), 0.0)
-        else:
-            data["spr"] = 100.0
-
-        # ==========================================
-        # 驗證系統限制條件
-        # ==========================================
-        validation_errors = _validate_constraints(data)
-        if validation_errors:
-            err_msg = "\\n".join(validation_errors)
-            print(f"Validation Error: {err_msg}")
-            raise ValueError(f"牌局不符合系統限制:\\n{err_msg}")
-
-        return data
+        with PARSE_VALIDATION_SECONDS.time():
+            return normalize_poker_features(data, current_state)
 
     except ValueError:
         raise
@@ -0,0 +1,143 @@
+# features/game_state.py
+"""
+GameState：/chat 每次請求的牌局狀態 (取代到處 copy()/update() 的 context dict)。
+欄位固定 (__slots__)，copy() 只複製參照；只在 API 邊界呼叫 to_dict() 序列化一次。
+"""
+from __future__ import annotations
+
+from typing import Dict, Any, Optional, Iterator, Tuple
+
+from .context import SESSION_CONTEXT_KEYS, REPLAY_CACHE_KEYS
+
+# 只在單次請求內使用、不存進 session 的欄位 (normalize_poker_features 的衍生結果)
+REQUEST_KEYS = (
+    "preflop_aggressor_seat",
+    "all_in_cap",
+)
+
+# 舊 context / Engine 混用的別名，一律轉成正式欄位名
+FIELD_ALIASES = {
+    "hero_pos": "hero_position",
+    "villain_pos": "villain_position",
+}
+
+_FIELDS = SESSION_CONTEXT_KEYS + REQUEST_KEYS
+_FIELD_SET = frozenset(_FIELDS)
+_INTERNAL_SET = frozenset(REPLAY_CACHE_KEYS)
+
+
+class GameState:
+    """
+    state = GameState.from_dict(ui_state)
+    state.update(new_features)          # 解析結果 (dict)
+    state.merge_engine_context(ctx)     # Engine 回填的 hand_category / advantage_data ...
+    session_state = state.for_session() # 只留下一輪會讀到的欄位
+    payload = session_state.to_dict()   # API 邊界唯一一次序列化
+
+    未知欄位 (LLM 額外回傳的 key) 放在 extras，仍會傳給 Engine；
+    Engine 的回填放在 analysis，get() 讀得到但不會進 session。
+    REPLAY_CACHE_KEYS (street_snapshots) 隨 session 保留在伺服器端，get() 讀得到，
+    但 items() / to_dict() 不輸出 (不進 API 回應、delta patch、持久化紀錄與 Engine 輸入)。
+    """
+
+    __slots__ = _FIELDS + REPLAY_CACHE_KEYS + ("extras", "analysis")
+
+    def __init__(self, **fields: Any):
+        for name in _FIELDS + REPLAY_CACHE_KEYS:
+            setattr(self, name, None)
+        self.extras: Dict[str, Any] = {}
+        self.analysis: Dict[str, Any] = {}
+        if fields:
+            self.update(fields)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "GameState":
+        if isinstance(data, GameState):
+            return data.copy()
+        state = cls()
+        if data:
+            state.update(data)
+        return state
+
+    def copy(self) -> "GameState":
+        """結構共用的淺複製：欄位值 (actions、board_cards ...) 只複製參照，呼叫端以整個替換代替就地修改。"""
+        clone = GameState.__new__(GameState)
+        for name in _FIELDS + REPLAY_CACHE_KEYS:
+            setattr(clone, name, getattr(self, name))
+        clone.extras = dict(self.extras)
+        clone.analysis = dict(self.analysis)
+        return clone
+
+    def update(self, data: Dict[str, Any]) -> "GameState":
+        for key, value in data.items():
+            name = FIELD_ALIASES.get(key, key)
+            if name in _FIELD_SET or name in _INTERNAL_SET:
+                setattr(self, name, value)
+            else:
+                self.extras[key] = value
+        return self
+
+    def merge_engine_context(self, ctx: Optional[Dict[str, Any]]) -> "GameState":
+        """strategy_output["context"]：spr 以 Engine 重算的值為準，其餘放進 analysis。"""
+        if not ctx:
+            return self
+        for key, value in ctx.items():
+            if key in _FIELD_SET:
+                setattr(self, key, value)
+            else:
+                self.analysis[key] = value
+        return self
+
+    def for_session(self) -> "GameState":
+        """只保留 SESSION_CONTEXT_KEYS (同 prune_context) 與伺服器端的重播快取。"""
+        clone = GameState.__new__(GameState)
+        for name in SESSION_CONTEXT_KEYS + REPLAY_CACHE_KEYS:
+            setattr(clone, name, getattr(self, name))
+        for name in REQUEST_KEYS:
+            setattr(clone, name, None)
+        clone.extras = {}
+        clone.analysis = {}
+        return clone
+
+    # ------------------------------------------------------------------
+    # 唯讀的 dict 相容介面：parse_poker_situation / 教練 prompt 仍以 .get() 讀取
+    # ------------------------------------------------------------------
+    def get(self, key: str, default: Any = None) -> Any:
+        name = FIELD_ALIASES.get(key, key)
+        if name in _FIELD_SET or name in _INTERNAL_SET:
+            value = getattr(self, name)
+            return default if value is None else value
+        if key in self.analysis:
+            return self.analysis[key]
+        return self.extras.get(key, default)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        for name in _FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                yield name, value
+        yield from self.extras.items()
+
+    def __bool__(self) -> bool:
+        return any(getattr(self, name) is not None for name in _FIELDS) or bool(self.extras)
+
+    @property
+    def has_hero_hand(self) -> bool:
+        return bool(self.hero_hole_cards or self.extras.get("hero_hand"))
+
+    # ------------------------------------------------------------------
+    # 序列化
+    # ------------------------------------------------------------------
+    def to_features(self) -> Dict[str, Any]:
+        """Engine 的輸入 (與舊 context dict 相同的 key；analysis 不送進 Engine)。"""
+        return self.to_dict()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """API 回應 / 持久化用：已設定的欄位 + extras。"""
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"GameState({self.hero_position} vs {self.villain_position}, {self.street}, pot={self.pot_bb})"
@@ -0,0 +1,36 @@
+# hand_history package
+# Thin aggregator: re-export hand-history parsing and decision extraction
+
+from .parser import HandHistoryError, iter_hand_blocks, parse_hand, parse_hand_history  # noqa: F401
+from .decisions import extract_decisions, compare_decision, describe_spot  # noqa: F401
+from .stream import stream_spots, evaluate_stream, Throughput  # noqa: F401
+from .store import ResultStore  # noqa: F401
+
+__all__ = [
+    "HandHistoryError",
+    "iter_hand_blocks",
+    "parse_hand",
+    "parse_hand_history",
+    "extract_decisions",
+    "compare_decision",
+    "describe_spot",
+    "stream_spots",
+    "evaluate_stream",
+    "Throughput",
+    "ResultStore",
+    "leak_report",
+    "describe_group",
+]
+
+
+# report 也是 `python -m hand_history.report` 的入口：import 套件時先載入它會觸發 runpy 的
+# RuntimeWarning ("found in sys.modules")，因此改成第一次取用時才載入
+_LAZY = {"leak_report": "report", "describe_group": "report"}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    return getattr(import_module(f".{module}", __name__), name)
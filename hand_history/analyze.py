@@ -0,0 +1,249 @@
+# hand_history/analyze.py
+"""
+Hand History 批次分析：讀取 PokerStars / GGPoker 匯出檔，在每個 Hero 決策點呼叫
+recommend_action (透過 Engine Pool 平行運算)，比對實際行動與策略矩陣。
+不呼叫 LLM，可離線執行。
+
+使用方式:
+    python -m hand_history.analyze hands/*.txt                     # 預設 worker 數 = CPU 數
+    python -m hand_history.analyze hh.txt --workers 0              # 在目前行程執行 (除錯用)
+    python -m hand_history.analyze hh.txt --output decisions.jsonl
+    python -m hand_history.analyze hh.txt --output decisions.jsonl --resume   # 從上次中斷的位移續跑
+    python -m hand_history.analyze hh.txt --store results.db                  # 寫入 SQLite 結果庫
+
+檔案以串流方式讀取 (hand_history/stream.py)，數 GB 的匯出檔也只佔用固定記憶體。
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import signal
+import argparse
+from pathlib import Path
+from collections import Counter
+from typing import Dict, Any, List, Iterator, Optional, Tuple
+
+from strategy.pool import EnginePool
+from strategy.batch import spot_fingerprint
+from .decisions import compare_decision, describe_spot, pot_type
+from .store import ResultStore, DEFAULT_CHUNK_SIZE as STORE_CHUNK_SIZE
+from .stream import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_PENDING, Throughput, stream_spots, evaluate_stream
+
+# 每處理多少手牌寫一次 checkpoint
+CHECKPOINT_EVERY = 1000
+
+
+def _record(file_name: str, decision: Dict[str, Any], strategy: Optional[Dict[str, Any]] = None,
+            error: Optional[str] = None) -> Dict[str, Any]:
+    record = {
+        "file": file_name,
+        "hand_id": decision.get("hand_id"),
+        "decision_index": decision.get("index"),
+        "street": decision.get("street"),
+        "hero_position": decision.get("hero_position"),
+        "villain_position": decision.get("villain_position"),
+        "hero_cards": decision.get("hero_cards"),
+        "board": decision.get("board"),
+        "actual": decision.get("actual"),
+    }
+    if decision.get("hero_cards"):
+        record.update(describe_spot(decision["hero_cards"], decision.get("board") or []))
+    if decision.get("skipped"):
+        record["skipped"] = decision["skipped"]
+        if decision.get("error"):
+            record["error"] = decision["error"]
+    elif error:
+        record["error"] = error
+    else:
+        record["fingerprint"] = spot_fingerprint(decision["features"])
+        record["pot_type"] = pot_type(decision["features"])
+        record.update(compare_decision(decision["actual"], strategy or {}))
+    return record
+
+
+def analyze(
+    paths: List[Path],
+    pool: EnginePool,
+    offsets: Optional[Dict[str, int]] = None,
+    max_pending: int = DEFAULT_MAX_PENDING,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    meter: Optional[Throughput] = None,
+) -> Iterator[Tuple[str, Any]]:
+    """
+    依檔案與原始順序 yield:
+      ("record", 決策紀錄)
+      ("offset", (檔案路徑, 已完成的位元組位移))
+    offsets 為 checkpoint 中各檔案的起始位移 (續跑用)。
+    """
+    offsets = offsets or {}
+    for path in paths:
+        start = int(offsets.get(str(path), 0))
+        if start >= path.stat().st_size:
+            continue
+        spots = stream_spots(path, start, chunk_size)
+        for kind, payload in evaluate_stream(spots, pool, max_pending, meter):
+            if kind == "hand_done":
+                yield "offset", (str(path), payload[1])
+            else:
+                _, decision, strategy, error = payload
+                yield "record", _record(path.name, decision, strategy, error)
+
+
+def load_checkpoint(path: Optional[Path]) -> Dict[str, Any]:
+    """{"offsets": {檔案: 已完成位移}, "output_bytes": 對應的輸出檔長度}"""
+    if not path or not path.exists():
+        return {"offsets": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_checkpoint(path: Path, offsets: Dict[str, int], output_bytes: Optional[int]) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    payload = {"offsets": offsets, "output_bytes": output_bytes}
+    tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)  # 原子替換，中斷時不會留下半份 checkpoint
+
+
+class DecisionSummary:
+    """逐筆累計 (不保留紀錄本身)，數百萬筆決策也只佔固定記憶體。"""
+
+    def __init__(self):
+        self.decisions = 0
+        self.errors = 0
+        self.skipped: Counter = Counter()
+        self.verdicts: Counter = Counter()
+        self.by_street: Dict[str, Counter] = {}
+
+    def add(self, record: Dict[str, Any]) -> None:
+        self.decisions += 1
+        if record.get("skipped"):
+            self.skipped[record["skipped"].split(":")[0]] += 1
+        elif record.get("error"):
+            self.errors += 1
+        elif "verdict" in record:
+            self.verdicts[record["verdict"]] += 1
+            row = self.by_street.setdefault(record["street"], Counter())
+            row["decisions"] += 1
+            row[record["verdict"]] += 1
+
+    def result(self) -> Dict[str, Any]:
+        analyzed = sum(self.verdicts.values())
+        by_street = {}
+        for street, row in self.by_street.items():
+            by_street[street] = {
+                "decisions": row["decisions"],
+                "match": row["match"],
+                "mixed": row["mixed"],
+                "deviation": row["deviation"],
+                "agreement": round(row["match"] / row["decisions"], 3),
+            }
+        return {
+            "decisions": self.decisions,
+            "analyzed": analyzed,
+            "skipped": dict(self.skipped),
+            "errors": self.errors,
+            "verdicts": dict(self.verdicts),
+            "agreement": round(self.verdicts.get("match", 0) / analyzed, 3) if analyzed else 0.0,
+            "by_street": by_street,
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Batch-analyze hero decisions in PokerStars/GG hand histories")
+    parser.add_argument("files", nargs="+", help="Hand history 文字檔")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Engine pool worker 數 (0 = 目前行程)")
+    parser.add_argument("--output", help="逐決策 JSONL 輸出路徑 (- = stdout；未指定且有 --store 時不輸出)")
+    parser.add_argument("--store", help="同時寫入 SQLite 結果庫 (hand_history/store.py)")
+    parser.add_argument("--store-chunk", type=int, default=STORE_CHUNK_SIZE, help="每個 SQLite transaction 寫入的筆數")
+    parser.add_argument("--summary", help="另外將彙總寫成 JSON")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING, help="送進 pool 尚未完成的決策上限")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="每次讀檔的位元組數")
+    parser.add_argument("--checkpoint", help="位移 checkpoint 檔 (預設 <output>.offsets.json)")
+    parser.add_argument("--resume", action="store_true", help="從 checkpoint 續跑，輸出改為附加")
+    parser.add_argument("--progress", type=float, default=5.0, help="每隔幾秒輸出一次吞吐量 (0 = 關閉)")
+    args = parser.parse_args(argv)
+
+    paths = [Path(p) for p in args.files]
+    missing = [str(p) for p in paths if not p.is_file()]
+    if missing:
+        parser.error(f"找不到檔案: {', '.join(missing)}")
+
+    if args.output is None:
+        args.output = "" if args.store else "-"
+    target = args.output if args.output not in ("", "-") else args.store
+    checkpoint = Path(args.checkpoint) if args.checkpoint else (Path(target + ".offsets.json") if target else None)
+    if args.resume and checkpoint is None:
+        parser.error("--resume 需要 --output、--store 或 --checkpoint")
+    state = load_checkpoint(checkpoint) if args.resume else {"offsets": {}}
+    offsets = state["offsets"]
+    if offsets:
+        print(f"⏩ resuming from checkpoint {checkpoint}", file=sys.stderr)
+    # SIGTERM 也走 finally，才會寫下最後的 checkpoint
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(128 + signal.SIGTERM))
+
+    pool = EnginePool(args.workers)
+    pool.start()
+    meter = Throughput(args.progress)
+    totals = DecisionSummary()
+    hands_since_checkpoint = 0
+    out = None
+    if args.output == "-":
+        out = sys.stdout
+    elif args.output:
+        out = open(args.output, "a" if args.resume else "w", encoding="utf-8")
+        if args.resume and state.get("output_bytes") is not None:
+            # 上次在 checkpoint 之後寫出的紀錄會重新產生，先截掉避免重複
+            out.truncate(state["output_bytes"])
+    # SQLite 以唯一鍵覆寫，續跑時不需截斷
+    store = ResultStore(Path(args.store), args.store_chunk) if args.store else None
+
+    def _output_bytes() -> Optional[int]:
+        if store is not None:
+            store.flush()
+        if out is None:
+            return None
+        out.flush()
+        return out.tell() if out is not sys.stdout else None
+
+    try:
+        for kind, payload in analyze(paths, pool, offsets, args.max_pending, args.chunk_size, meter):
+            if kind == "record":
+                totals.add(payload)
+                if out is not None:
+                    out.write(json.dumps(payload, ensure_ascii=False, separators=(",", ":")) + "\n")
+                if store is not None:
+                    store.add(payload)
+                continue
+            file_key, offset = payload
+            offsets[file_key] = offset
+            hands_since_checkpoint += 1
+            if checkpoint and hands_since_checkpoint >= CHECKPOINT_EVERY:
+                save_checkpoint(checkpoint, offsets, _output_bytes())
+                hands_since_checkpoint = 0
+    finally:
+        if checkpoint:
+            save_checkpoint(checkpoint, offsets, _output_bytes())
+        if out is not None and out is not sys.stdout:
+            out.close()
+        if store is not None:
+            store.close()
+        pool.shutdown()
+
+    summary = totals.result()
+    summary.update(meter.snapshot())
+    if args.summary:
+        Path(args.summary).write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"🃏 {summary['decisions']} decisions ({summary['analyzed']} analyzed) from {summary['hands']} hands "
+          f"in {summary['elapsed_s']:.2f}s ({summary['hands_per_sec']} hands/s)", file=sys.stderr)
+    if summary["skipped"]:
+        print(f"   skipped: {summary['skipped']}", file=sys.stderr)
+    print(f"   agreement: {summary['agreement']:.1%}  verdicts: {summary['verdicts']}", file=sys.stderr)
+    for street, row in summary["by_street"].items():
+        print(f"   {street:<8} {row['decisions']:>5}  match {row['agreement']:.1%}  "
+              f"mixed {row['mixed']}  deviation {row['deviation']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+# hand_history/decisions.py
+"""
+從解析後的手牌找出 Hero 的每個決策點，轉成與 parse_poker_situation 相同的 features。
+Engine 只支援單挑底池：決策當下仍有兩位以上對手的情況會標記為略過。
+"""
+from __future__ import annotations
+
+from typing import Dict, Any, List
+
+from features.cards import analyze_board
+from features.context import normalize_poker_features
+from strategy.eval.hand_eval import calculate_hand_strength
+
+STREETS = ("preflop", "flop", "turn", "river")
+_BOARD_SIZE = {"preflop": 0, "flop": 3, "turn": 4, "river": 5}
+
+
+def _to_state_action(action: Dict[str, Any], position: str, preflop_raised: bool) -> Dict[str, Any]:
+    """手牌紀錄的行動 → LLM 擷取格式 (open/limp/raise/bet/call/check/fold + BB 金額)。"""
+    street = action["street"]
+    verb = action["action"]
+    entry: Dict[str, Any] = {"street": street, "player": position}
+    if verb == "raise":
+        entry["action"] = "raise" if (street != "preflop" or preflop_raised) else "open"
+        entry["amount"] = action.get("to_bb")
+    elif verb == "bet":
+        entry["action"] = "bet"
+        entry["amount"] = action.get("amount_bb")
+    elif verb == "call" and street == "preflop" and not preflop_raised:
+        entry["action"] = "limp"
+        entry["amount"] = 1.0
+    else:
+        entry["action"] = verb
+    if action.get("all_in"):
+        entry["is_all_in"] = True
+    return entry
+
+
+def _unopened_features(hand: Dict[str, Any], hero_pos: str, prior: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    沒人入池時 (RFI)，API 驗證會因缺少開池行動而拒絕；直接組出 Engine features。
+    對手假設為大盲 (Hero 為大盲時不會有此決策點)。
+    """
+    hero = hand["players"][hand["hero"]]
+    villain_pos = "BB" if hero_pos != "BB" else "SB"
+    villain = next((p for p in hand["players"].values() if p["position"] == villain_pos), {})
+    posted = {"SB": 0.5, "BB": 1.0}.get(hero_pos, 0.0)
+    return {
+        "hero_position": hero_pos,
+        "villain_position": villain_pos,
+        "hero_hole_cards": list(hand["hero_cards"]),
+        "board_cards": [],
+        "actions": {"preflop": prior, "flop": [], "turn": [], "river": []},
+        "hero_stack_bb": hero["stack_bb"],
+        "villain_stack_bb": villain.get("stack_bb", 100.0),
+        "street": "preflop",
+        "pot_bb": 1.5,
+        "amount_to_call": max(1.0 - posted, 0.0),
+    }
+
+
+def extract_decisions(hand: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    每個 Hero 行動產生一筆:
+    {"hand_id", "index", "street", "hero_position", "villain_position",
+     "actual": {"action", "amount_bb"}, "features" 或 "skipped"}
+    """
+    hero_name = hand["hero"]
+    players = hand["players"]
+    hero_pos = players[hero_name]["position"]
+    decisions: List[Dict[str, Any]] = []
+
+    entered = set()  # 曾主動投入 (call/bet/raise/check) 的玩家，只貼盲注不算
+    preflop_raised = False
+    state_actions: List[Dict[str, Any]] = []
+
+    for index, action in enumerate(hand["actions"]):
+        player = action["player"]
+        street = action["street"]
+
+        if player == hero_name:
+            # 曾入池後才蓋牌的玩家仍留下死錢，Engine 的單挑模型無法處理，一併視為多人底池
+            opponents = [p for p in entered if p != hero_name]
+            decision: Dict[str, Any] = {
+                "hand_id": hand["hand_id"],
+                "index": index,
+                "street": street,
+                "hero_position": hero_pos,
+                "villain_position": players[opponents[0]]["position"] if len(opponents) == 1 else None,
+                "actual": {
+                    "action": action["action"],
+                    "amount_bb": action.get("to_bb", action.get("amount_bb")),
+                },
+            }
+            if not hero_pos:
+                decision["skipped"] = "unknown_position"
+            elif len(opponents) > 1:
+                decision["skipped"] = "multiway"
+            elif not opponents:
+                if street == "preflop":
+                    decision["villain_position"] = "BB" if hero_pos != "BB" else "SB"
+                    decision["features"] = _unopened_features(hand, hero_pos, list(state_actions))
+                else:
+                    decision["skipped"] = "no_opponent"
+            else:
+                villain = players[opponents[0]]
+                raw_state = {
+                    "players": {
+                        "hero": {"position": hero_pos, "stack_bb": players[hero_name]["stack_bb"], "cards": hand["hero_cards"]},
+                        "villain": {"position": villain["position"], "stack_bb": villain["stack_bb"]},
+                    },
+                    "board": {"cards": hand["board"][:_BOARD_SIZE[street]]},
+                    "street": street,
+                    "actions": list(state_actions),
+                }
+                try:
+                    decision["features"] = normalize_poker_features(raw_state)
+                except ValueError as e:
+                    decision["skipped"] = f"invalid: {e}"
+            decisions.append(decision)
+
+        position = players.get(player, {}).get("position")
+        if position:
+            state_actions.append(_to_state_action(action, position, preflop_raised))
+        if action["action"] != "fold":
+            entered.add(player)
+        if street == "preflop" and action["action"] == "raise":
+            preflop_raised = True
+        if action["action"] == "fold" and player == hero_name:
+            break
+
+    return decisions
+
+
+def compare_decision(actual: Dict[str, Any], strategy: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    實際行動 vs Engine 策略矩陣。
+    verdict: match (實際行動即建議行動)、mixed (矩陣中有此行動但非首選)、deviation (矩陣中沒有此行動)。
+    """
+    matrix = strategy.get("strategy_matrix") or {}
+    action = actual.get("action")
+    frequency = float(matrix.get(action, 0.0) or 0.0)
+    recommended = strategy.get("recommended_action")
+    if action == recommended:
+        verdict = "match"
+    elif frequency > 0:
+        verdict = "mixed"
+    else:
+        verdict = "deviation"
+
+    math_data = strategy.get("math_data") or {}
+    result = {
+        "recommended_action": recommended,
+        "recommended_amount": strategy.get("amount"),
+        "strategy_matrix": matrix,
+        "actual_frequency": round(frequency, 4),
+        # Engine 不估 EV；以「首選行動頻率 - 實際行動頻率」作為偏離程度
+        "frequency_gap": round(float(matrix.get(recommended, 0.0) or 0.0) - frequency, 4),
+        "verdict": verdict,
+        "range_advantage": math_data.get("range_advantage"),
+        "realized_range_advantage": math_data.get("realized_range_advantage"),
+        "nut_advantage": math_data.get("nut_advantage"),
+        "pot_bb": math_data.get("current_pot"),
+        "spr": math_data.get("spr"),
+    }
+    amount = actual.get("amount_bb")
+    rec_amount = strategy.get("amount")
+    if action == recommended and amount and rec_amount:
+        result["size_ratio"] = round(float(amount) / float(rec_amount), 3)
+    return result
+
+
+def describe_spot(hero_cards: List[str], board: List[str]) -> Dict[str, Any]:
+    """彙總用的維度：公牌結構 (categorize_board_type 標籤)、危險度、Hero 牌力類別。"""
+    analysis = analyze_board(board) if board else {}
+    category, _ = calculate_hand_strength(hero_cards, board)
+    return {
+        "board_texture": "|".join(analysis.get("archetypes") or []) or ("preflop" if not board else "other"),
+        "board_danger": analysis.get("danger_level") if board else None,
+        "hand_category": category,
+    }
+
+
+def pot_type(features: Dict[str, Any]) -> str:
+    """依 preflop 加注次數分類：unopened / limped / SRP / 3BP / 4BP。"""
+    preflop = (features.get("actions") or {}).get("preflop") or []
+    verbs = [str(a.get("action", "")).lower() for a in preflop if isinstance(a, dict)]
+    raises = sum(1 for v in verbs if v in ("open", "raise", "bet"))
+    if raises == 0:
+        return "limped" if any(v in ("limp", "call") for v in verbs) else "unopened"
+    return {1: "SRP", 2: "3BP"}.get(raises, "4BP")
@@ -0,0 +1,230 @@
+# hand_history/parser.py
+"""
+Hand History 文字解析：PokerStars / GGPoker 匯出檔 → 結構化手牌。
+只處理德州撲克 (Hold'em)；金額一律換算成 BB。
+
+解析結果 (dict):
+    {
+      "hand_id", "site", "big_blind", "button_seat",
+      "players": {name: {"seat", "stack_bb", "position"}},
+      "hero", "hero_cards", "board": [...],
+      "actions": [{"street", "player", "action", "amount_bb", "to_bb", "all_in"}]
+    }
+action 為 fold/check/call/bet/raise；bet 的 amount_bb 為下注額，raise 的 to_bb 為加注到的總額。
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, Any, List, Optional, Iterable, Iterator
+
+from core.parser import coerce_amount, normalize_action_token
+
+_HEADER_RE = re.compile(r"^(?P<site>PokerStars|Poker)\b.*?Hand #(?P<id>[^:\s]+):")
+_STAKES_RE = re.compile(r"\(([^()/]+)/([^()/]+)\)")
+_BUTTON_RE = re.compile(r"Seat #(\d+) is the button")
+_SEAT_RE = re.compile(r"^Seat (\d+): (.+?) \(([^)]*?) in chips")
+_POST_RE = re.compile(r"^(.+?): posts (small blind|big blind|the ante|small & big blinds) (\S+)")
+_DEALT_RE = re.compile(r"^Dealt to (.+?) \[(.+?)\]")
+_STREET_RE = re.compile(r"^\*\*\* (FLOP|TURN|RIVER) \*\*\*")
+_ACTION_RE = re.compile(
+    r"^(?P<player>.+?): (?P<verb>folds|checks|calls|bets|raises)"
+    r"(?: (?P<amount>[^\s]+))?(?: to (?P<to>[^\s]+))?(?P<allin> and is all-in)?"
+)
+_CARD_RE = re.compile(r"[2-9TJQKA][shdc]")
+_END_MARKERS = ("*** SHOW DOWN ***", "*** SUMMARY ***", "*** FIRST FLOP ***", "*** FIRST TURN ***", "*** FIRST RIVER ***")
+
+
+class HandHistoryError(ValueError):
+    """無法解析的手牌 (格式不符、缺少大盲或 Hero 手牌等)。"""
+
+
+def parse_money(text: Optional[str]) -> Optional[float]:
+    """'$1,234.50' / '€0.10' / '1500' / '0.1 USD' → float。"""
+    if text is None:
+        return None
+    cleaned = re.sub(r"[^\d.]", "", str(text))
+    if not cleaned or cleaned == ".":
+        return None
+    return coerce_amount(cleaned)
+
+
+def is_hand_header(line: str) -> bool:
+    return bool(_HEADER_RE.match(line.strip().lstrip("\ufeff")))
+
+
+def header_hand_id(line: str) -> Optional[str]:
+    header = _HEADER_RE.match(line.strip().lstrip("\ufeff"))
+    return header.group("id") if header else None
+
+
+def iter_hand_blocks(lines: Iterable[str]) -> Iterator[List[str]]:
+    """依手牌標頭切出每一手的文字行 (空行與標頭前的雜訊會被略過)。"""
+    block: List[str] = []
+    for raw in lines:
+        line = raw.rstrip("\r\n").lstrip("﻿")
+        if is_hand_header(line):
+            if block:
+                yield block
+            block = [line]
+        elif block and line.strip():
+            block.append(line)
+    if block:
+        yield block
+
+
+def _assign_positions(seats: List[int], button_seat: Optional[int], sb_seat: Optional[int], bb_seat: Optional[int]) -> Dict[int, str]:
+    """
+    依按鈕位置給 6-max 位置名稱 (Engine 只認 UTG/HJ/CO/BTN/SB/BB)。
+    超過 6 人時，較前面的位置都歸為 UTG；單挑時按鈕即 SB。
+    """
+    ordered = sorted(seats)
+    if not ordered:
+        return {}
+    if button_seat not in ordered:
+        # 按鈕座位已離桌：以小盲前一個座位當按鈕
+        if sb_seat in ordered:
+            idx = ordered.index(sb_seat)
+            button_seat = ordered[idx - 1]
+        else:
+            button_seat = ordered[0]
+
+    start = ordered.index(button_seat)
+    clockwise = ordered[start:] + ordered[:start]  # [BTN, SB, BB, ...]
+
+    if len(clockwise) == 2:
+        sb = sb_seat if sb_seat in clockwise else clockwise[0]
+        bb = bb_seat if bb_seat in clockwise else [s for s in clockwise if s != sb][0]
+        return {sb: "SB", bb: "BB"}
+
+    positions = {clockwise[0]: "BTN", clockwise[1]: "SB", clockwise[2]: "BB"}
+    early = clockwise[3:]  # UTG ... CO (依行動順序)
+    names = ["CO", "HJ"]
+    for i, seat in enumerate(reversed(early)):
+        positions[seat] = names[i] if i < len(names) else "UTG"
+    return positions
+
+
+def parse_hand(lines: List[str]) -> Dict[str, Any]:
+    """解析單一手牌的文字行。格式不符時拋出 HandHistoryError。"""
+    if not lines:
+        raise HandHistoryError("空的手牌區塊")
+    header = _HEADER_RE.match(lines[0].strip())
+    if not header:
+        raise HandHistoryError(f"無法辨識的標頭: {lines[0][:60]}")
+    if "Hold'em" not in lines[0] and "Holdem" not in lines[0]:
+        raise HandHistoryError("只支援 Hold'em")
+
+    site = "pokerstars" if header.group("site") == "PokerStars" else "gg"
+    hand_id = header.group("id")
+
+    big_blind = None
+    stakes = _STAKES_RE.search(lines[0])
+    if stakes:
+        big_blind = parse_money(stakes.group(2))
+
+    button_seat = None
+    seats: Dict[str, Dict[str, Any]] = {}
+    posts: Dict[str, str] = {}
+    hero = None
+    hero_cards: List[str] = []
+    board: List[str] = []
+    street = "preflop"
+    raw_actions: List[Dict[str, Any]] = []
+
+    for line in lines[1:]:
+        line = line.strip()
+        if line.startswith(_END_MARKERS):
+            break
+
+        m = _BUTTON_RE.search(line)
+        if m and button_seat is None:
+            button_seat = int(m.group(1))
+            continue
+
+        if street == "preflop" and not hero:
+            m = _SEAT_RE.match(line)
+            if m:
+                seats[m.group(2)] = {"seat": int(m.group(1)), "stack": parse_money(m.group(3)) or 0.0}
+                continue
+
+        m = _POST_RE.match(line)
+        if m:
+            kind = m.group(2)
+            if kind == "big blind" and big_blind is None:
+                big_blind = parse_money(m.group(3))
+            if kind in ("small blind", "big blind"):
+                posts.setdefault(kind, m.group(1))
+            continue
+
+        m = _DEALT_RE.match(line)
+        if m and not hero:
+            cards = _CARD_RE.findall(m.group(2))
+            if len(cards) == 2:
+                hero, hero_cards = m.group(1), cards
+            continue
+
+        m = _STREET_RE.match(line)
+        if m:
+            street = m.group(1).lower()
+            board = _CARD_RE.findall(line)
+            continue
+
+        m = _ACTION_RE.match(line)
+        if m and m.group("player") in seats:
+            raw_actions.append({
+                "street": street,
+                "player": m.group("player"),
+                "verb": normalize_action_token(m.group("verb")[:-1]),  # folds → fold
+                "amount": parse_money(m.group("amount")),
+                "to": parse_money(m.group("to")),
+                "all_in": bool(m.group("allin")),
+            })
+
+    if not big_blind:
+        raise HandHistoryError(f"{hand_id}: 找不到大盲金額")
+    if not hero:
+        raise HandHistoryError(f"{hand_id}: 找不到 Hero 手牌")
+
+    seat_to_name = {info["seat"]: name for name, info in seats.items()}
+    sb_seat = seats.get(posts.get("small blind"), {}).get("seat")
+    bb_seat = seats.get(posts.get("big blind"), {}).get("seat")
+    positions = _assign_positions(list(seat_to_name), button_seat, sb_seat, bb_seat)
+
+    players = {
+        name: {
+            "seat": info["seat"],
+            "stack_bb": round(info["stack"] / big_blind, 2),
+            "position": positions.get(info["seat"]),
+        }
+        for name, info in seats.items()
+    }
+
+    actions = []
+    for a in raw_actions:
+        entry = {"street": a["street"], "player": a["player"], "action": a["verb"], "all_in": a["all_in"]}
+        if a["verb"] == "raise":
+            entry["to_bb"] = round((a["to"] or a["amount"] or 0.0) / big_blind, 2)
+        elif a["verb"] in ("bet", "call") and a["amount"] is not None:
+            entry["amount_bb"] = round(a["amount"] / big_blind, 2)
+        actions.append(entry)
+
+    return {
+        "hand_id": hand_id,
+        "site": site,
+        "big_blind": big_blind,
+        "button_seat": button_seat,
+        "players": players,
+        "hero": hero,
+        "hero_cards": hero_cards,
+        "board": board,
+        "actions": actions,
+    }
+
+
+def parse_hand_history(text: str) -> Iterator[Dict[str, Any]]:
+    """逐手解析整份匯出檔；無法解析的手牌以 {"hand_id", "error"} 回報而不中斷。"""
+    for block in iter_hand_blocks(text.splitlines()):
+        try:
+            yield parse_hand(block)
+        except HandHistoryError as e:
+            yield {"hand_id": header_hand_id(block[0]), "error": str(e)}
@@ -0,0 +1,144 @@
+# hand_history/report.py
+"""
+Leak Report：在 SQLite 結果庫上以 GROUP BY 彙總，比較「你的行動頻率」與「Engine 的策略頻率」。
+分組維度：位置對抗 (含底池類型)、街、公牌結構 (categorize_board_type 標籤)、Hero 牌力類別。
+彙總全部在 SQLite 內完成，Python 只處理分組後的結果 (通常數百列)。
+
+使用方式:
+    python -m hand_history.report results.db
+    python -m hand_history.report results.db --by matchup,street,archetype --min-count 50
+    python -m hand_history.report results.db --street flop --json
+"""
+from __future__ import annotations
+
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from .store import ACTIONS, ResultStore
+
+# 維度名稱 → SQL 運算式 (archetype 來自 board_archetypes 對照表)
+DIMENSIONS = {
+    "matchup": "d.matchup",
+    "pot_type": "d.pot_type",
+    "street": "d.street",
+    "archetype": "a.archetype",
+    "texture": "d.board_texture",
+    "hand_category": "d.hand_category",
+    "hero_position": "d.hero_position",
+}
+DEFAULT_DIMENSIONS = ("matchup", "pot_type", "street", "archetype", "hand_category")
+
+
+def build_query(dimensions: List[str], street: Optional[str] = None) -> Tuple[str, List[Any]]:
+    unknown = [d for d in dimensions if d not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"unknown dimension(s): {', '.join(unknown)} (choose from {', '.join(DIMENSIONS)})")
+    select_dims = ", ".join(f"{DIMENSIONS[d]} AS {d}" for d in dimensions)
+    frequencies = ",\n    ".join(
+        f"AVG(d.actual_action = '{a}') AS you_{a}, AVG(d.freq_{a}) AS engine_{a}" for a in ACTIONS
+    )
+    join = "JOIN board_archetypes a ON a.board_texture = d.board_texture" if "archetype" in dimensions else ""
+    where = ["d.verdict IS NOT NULL"]
+    params: List[Any] = []
+    if street:
+        where.append("d.street = ?")
+        params.append(street)
+    sql = (
+        f"SELECT {select_dims},\n    COUNT(*) AS decisions,\n    AVG(d.verdict = 'match') AS agreement,\n"
+        f"    AVG(d.frequency_gap) AS avg_frequency_gap,\n    {frequencies}\n"
+        f"FROM decisions d {join}\nWHERE {' AND '.join(where)}\n"
+        f"GROUP BY {', '.join(dimensions)}\nHAVING COUNT(*) >= ?"
+    )
+    return sql, params
+
+
+def leak_report(
+    store: ResultStore,
+    dimensions: List[str] = DEFAULT_DIMENSIONS,
+    min_count: int = 20,
+    street: Optional[str] = None,
+    top: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    每組回傳各行動的 (你的頻率, Engine 頻率)，並挑出差距最大的行動作為 leak。
+    依 decisions × |差距| 排序 (樣本多、偏差大的優先)。
+    """
+    sql, params = build_query(list(dimensions), street)
+    groups = []
+    for row in store.query(sql, params + [int(min_count)]):
+        actions = {
+            a: {"you": round(row[f"you_{a}"] or 0.0, 3), "engine": round(row[f"engine_{a}"] or 0.0, 3)}
+            for a in ACTIONS
+        }
+        leak_action = max(ACTIONS, key=lambda a: abs(actions[a]["you"] - actions[a]["engine"]))
+        gap = actions[leak_action]["you"] - actions[leak_action]["engine"]
+        groups.append({
+            "group": {d: row[d] for d in dimensions},
+            "decisions": row["decisions"],
+            "agreement": round(row["agreement"] or 0.0, 3),
+            "avg_frequency_gap": round(row["avg_frequency_gap"] or 0.0, 3),
+            "actions": actions,
+            "leak": {"action": leak_action, "gap": round(gap, 3)},
+            "score": round(row["decisions"] * abs(gap), 2),
+        })
+    groups.sort(key=lambda g: g["score"], reverse=True)
+    return groups[:top] if top else groups
+
+
+def describe_group(group: Dict[str, Any]) -> str:
+    """例如: BTN_vs_BB SRP, A-High Dry flop, top_pair: you bet 45% vs engine 90% (n=120)"""
+    g = group["group"]
+    parts = []
+    head = " ".join(str(g[k]) for k in ("matchup", "pot_type") if g.get(k))
+    if head:
+        parts.append(head)
+    board = [str(g[k]) for k in ("archetype", "texture") if g.get(k) and g[k] != "preflop"]
+    if g.get("street"):
+        board.append(str(g["street"]))
+    if board:
+        parts.append(" ".join(board))
+    for key in ("hand_category", "hero_position"):
+        if g.get(key):
+            parts.append(str(g[key]))
+    leak = group["leak"]
+    freq = group["actions"][leak["action"]]
+    return (f"{', '.join(parts) or 'all'}: you {leak['action']} {freq['you']:.0%} vs engine {freq['engine']:.0%} "
+            f"(n={group['decisions']}, agreement {group['agreement']:.0%})")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Leak report over a hand_history results store")
+    parser.add_argument("store", help="hand_history.analyze --store 產生的 SQLite 檔")
+    parser.add_argument("--by", default=",".join(DEFAULT_DIMENSIONS),
+                        help=f"分組維度，逗號分隔 (可用: {', '.join(DIMENSIONS)})")
+    parser.add_argument("--min-count", type=int, default=20, help="樣本數少於此值的分組不列出")
+    parser.add_argument("--street", choices=["preflop", "flop", "turn", "river"])
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="輸出 JSON")
+    args = parser.parse_args(argv)
+
+    if not Path(args.store).is_file():
+        parser.error(f"找不到結果庫: {args.store}")
+    dimensions = [d.strip() for d in args.by.split(",") if d.strip()]
+    with ResultStore(Path(args.store)) as store:
+        try:
+            groups = leak_report(store, dimensions, args.min_count, args.street, args.top)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.json:
+        print(json.dumps(groups, ensure_ascii=False, indent=2))
+        return 0
+    if not groups:
+        print(f"ℹ️ 沒有樣本數 ≥ {args.min_count} 的分組")
+        return 0
+    for group in groups:
+        print(f"• {describe_group(group)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+# hand_history/store.py
+"""
+批次分析結果的 SQLite 儲存：逐筆累積、每 chunk_size 筆以單一 transaction 寫入。
+常用維度 (位置、街、公牌結構、牌力) 與各行動頻率都拆成獨立欄位並建立索引，
+之後的彙總查詢直接在資料庫上 GROUP BY，不必重新讀取 JSONL。
+
+同一決策以 (file, hand_id, decision_index) 為唯一鍵，續跑時重複寫入會覆蓋而不會重複。
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, Any, List, Iterator, Sequence, Tuple
+
+DEFAULT_CHUNK_SIZE = 5000
+
+ACTIONS = ("raise", "bet", "call", "check", "fold")
+
+# (欄位, SQLite 型別)；順序即 INSERT 順序
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("file", "TEXT NOT NULL"),
+    ("hand_id", "TEXT"),
+    ("decision_index", "INTEGER"),
+    ("street", "TEXT"),
+    ("hero_position", "TEXT"),
+    ("villain_position", "TEXT"),
+    ("matchup", "TEXT"),
+    ("pot_type", "TEXT"),
+    ("hero_cards", "TEXT"),
+    ("board", "TEXT"),
+    ("board_texture", "TEXT"),
+    ("board_danger", "TEXT"),
+    ("hand_category", "TEXT"),
+    ("fingerprint", "TEXT"),
+    ("actual_action", "TEXT"),
+    ("actual_amount", "REAL"),
+    ("recommended_action", "TEXT"),
+    ("recommended_amount", "REAL"),
+    ("verdict", "TEXT"),
+    ("actual_frequency", "REAL"),
+    ("frequency_gap", "REAL"),
+) + tuple((f"freq_{a}", "REAL") for a in ACTIONS) + (
+    ("range_advantage", "REAL"),
+    ("realized_range_advantage", "REAL"),
+    ("nut_advantage", "REAL"),
+    ("pot_bb", "REAL"),
+    ("spr", "REAL"),
+    ("strategy_matrix", "TEXT"),
+    ("skipped", "TEXT"),
+    ("error", "TEXT"),
+)
+
+_TEXTURE_INDEX = [name for name, _ in COLUMNS].index("board_texture")
+
+INDEXES = {
+    "idx_decisions_position": ("hero_position", "villain_position"),
+    "idx_decisions_matchup": ("matchup", "pot_type", "street"),
+    "idx_decisions_street": ("street",),
+    "idx_decisions_texture": ("board_texture",),
+    "idx_decisions_category": ("hand_category",),
+    "idx_decisions_verdict": ("verdict",),
+    "idx_decisions_fingerprint": ("fingerprint",),
+}
+
+
+def _row(record: Dict[str, Any]) -> Tuple[Any, ...]:
+    actual = record.get("actual") or {}
+    matrix = record.get("strategy_matrix") or {}
+    hero, villain = record.get("hero_position"), record.get("villain_position")
+    values = dict(record)
+    values.update({
+        "matchup": f"{hero}_vs_{villain}" if hero and villain else None,
+        "hero_cards": "".join(record.get("hero_cards") or []) or None,
+        "board": "".join(record.get("board") or []),
+        "actual_action": actual.get("action"),
+        "actual_amount": actual.get("amount_bb"),
+        "strategy_matrix": json.dumps(matrix, separators=(",", ":")) if matrix else None,
+    })
+    for action in ACTIONS:
+        values[f"freq_{action}"] = matrix.get(action, 0.0) if matrix else None
+    return tuple(values.get(name) for name, _ in COLUMNS)
+
+
+class ResultStore:
+    """
+    with ResultStore("results.db") as store:
+        for record in records:
+            store.add(record)      # 每 chunk_size 筆自動寫入
+    """
+
+    def __init__(self, path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.path = Path(path)
+        self.chunk_size = max(int(chunk_size), 1)
+        self._buffer: List[Tuple[Any, ...]] = []
+        self.written = 0
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")  # GROUP BY 的暫存排序留在記憶體
+        self._create_schema()
+        names = ", ".join(name for name, _ in COLUMNS)
+        marks = ", ".join("?" for _ in COLUMNS)
+        self._insert_sql = f"INSERT OR REPLACE INTO decisions ({names}) VALUES ({marks})"
+
+    def _create_schema(self) -> None:
+        columns = ",\n    ".join(f"{name} {kind}" for name, kind in COLUMNS)
+        with self.conn:
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS decisions (\n    id INTEGER PRIMARY KEY,\n    {columns},\n"
+                f"    UNIQUE (file, hand_id, decision_index)\n)"
+            )
+            # 舊版資料庫：補上新增的欄位
+            existing = {row[1] for row in self.conn.execute("PRAGMA table_info(decisions)")}
+            for name, kind in COLUMNS:
+                if name not in existing:
+                    self.conn.execute(f"ALTER TABLE decisions ADD COLUMN {name} {kind.replace(' NOT NULL', '')}")
+            # board_texture 是多個標籤以 | 串接；拆成 (texture, archetype) 對照表，彙總時以 JOIN 展開
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS board_archetypes ("
+                "board_texture TEXT NOT NULL, archetype TEXT NOT NULL, PRIMARY KEY (board_texture, archetype))"
+            )
+            for name, cols in INDEXES.items():
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON decisions ({', '.join(cols)})")
+
+    def add(self, record: Dict[str, Any]) -> None:
+        self._buffer.append(_row(record))
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        textures = {row[_TEXTURE_INDEX] for row in self._buffer if row[_TEXTURE_INDEX]}
+        with self.conn:
+            self.conn.executemany(self._insert_sql, self._buffer)
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO board_archetypes (board_texture, archetype) VALUES (?, ?)",
+                [(t, tag) for t in textures for tag in t.split("|")],
+            )
+        self.written += len(self._buffer)
+        self._buffer.clear()
+
+    def query(self, sql: str, params: Sequence[Any] = ()) -> Iterator[Dict[str, Any]]:
+        """逐列回傳 dict (游標串流，不一次載入所有結果)。"""
+        self.flush()
+        cursor = self.conn.execute(sql, params)
+        names = [d[0] for d in cursor.description]
+        for row in cursor:
+            yield dict(zip(names, row))
+
+    def count(self) -> int:
+        self.flush()
+        return self.conn.execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -0,0 +1,198 @@
+# hand_history/stream.py
+"""
+串流式 Hand History 讀取：檔案區塊 → 手牌文字 → 解析後手牌 → 決策點，每一段都是 generator。
+整份檔案不會載入記憶體；常駐記憶體只有一個讀取區塊、一手牌的文字，
+以及送進 Engine Pool 尚未完成的決策 (上限 max_pending，滿了就停止讀檔 = backpressure)。
+
+每手牌都帶著它在檔案中的位元組範圍 [start, end)，
+已完成手牌的 end 可存成 checkpoint，下次從該位移繼續 (位移一定落在手牌標頭上)。
+"""
+from __future__ import annotations
+
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, List, Iterator, Iterable, Optional, Tuple, Deque, TextIO
+
+from strategy.pool import EnginePool
+from .parser import HandHistoryError, is_hand_header, header_hand_id, parse_hand
+from .decisions import extract_decisions
+
+DEFAULT_CHUNK_SIZE = 1 << 20  # 1 MiB
+DEFAULT_MAX_PENDING = 256
+
+_BOARD_SIZE = {"preflop": 0, "flop": 3, "turn": 4, "river": 5}
+
+# (start, end, 內容)：內容依階段為文字行 / 手牌 dict / (手牌, 決策列表)
+Block = Tuple[int, int, List[str]]
+
+
+def iter_chunks(path: Path, start: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                return
+            yield data
+
+
+def iter_blocks(chunks: Iterable[bytes], start: int = 0) -> Iterator[Block]:
+    """
+    以位元組切行 (位移才會精確)，再依手牌標頭組成區塊。
+    一手牌的 end 為下一手標頭的位移 (或檔尾)。
+    """
+    block: List[str] = []
+    block_start = start
+    line_start = start
+    tail = b""
+
+    def _line(raw: bytes, at: int) -> Optional[Block]:
+        nonlocal block, block_start
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n").lstrip("﻿")
+        if is_hand_header(line):
+            done = (block_start, at, block) if block else None
+            block, block_start = [line], at
+            return done
+        if block and line.strip():
+            block.append(line)
+        return None
+
+    for data in chunks:
+        buf = tail + data
+        pos = 0
+        while True:
+            nl = buf.find(b"\n", pos)
+            if nl < 0:
+                break
+            done = _line(buf[pos:nl + 1], line_start)
+            if done:
+                yield done
+            line_start += nl + 1 - pos
+            pos = nl + 1
+        tail = buf[pos:]
+
+    if tail:
+        done = _line(tail, line_start)
+        if done:
+            yield done
+        line_start += len(tail)
+    if block:
+        yield block_start, line_start, block
+
+
+def iter_hands(blocks: Iterable[Block]) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+    """無法解析的手牌以 {"hand_id", "error"} 回報而不中斷。"""
+    for start, end, lines in blocks:
+        try:
+            hand = parse_hand(lines)
+        except HandHistoryError as e:
+            hand = {"hand_id": header_hand_id(lines[0]), "error": str(e)}
+        yield start, end, hand
+
+
+def iter_spots(hands: Iterable[Tuple[int, int, Dict[str, Any]]]) -> Iterator[Tuple[int, int, Dict[str, Any], List[Dict[str, Any]]]]:
+    """解析失敗的手牌輸出單一 skipped="parse_error" 決策，方便彙總。"""
+    for start, end, hand in hands:
+        if "error" in hand:
+            yield start, end, hand, [{"hand_id": hand["hand_id"], "skipped": "parse_error", "error": hand["error"]}]
+            continue
+        decisions = extract_decisions(hand)
+        for decision in decisions:
+            decision["hero_cards"] = hand["hero_cards"]
+            decision["board"] = hand["board"][:_BOARD_SIZE[decision["street"]]]
+        yield start, end, hand, decisions
+
+
+def stream_spots(path: Path, start: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """完整串流：path → (start, end, hand, decisions)。"""
+    return iter_spots(iter_hands(iter_blocks(iter_chunks(path, start, chunk_size), start)))
+
+
+class Throughput:
+    """累計手牌/決策/位元組數，每 interval 秒輸出一次 hands/sec。"""
+
+    def __init__(self, interval: float = 5.0, stream: TextIO = sys.stderr):
+        self.interval = interval
+        self.stream = stream
+        self.hands = 0
+        self.decisions = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    def add(self, hands: int = 0, decisions: int = 0, nbytes: int = 0) -> None:
+        self.hands += hands
+        self.decisions += decisions
+        self.bytes += nbytes
+        now = time.perf_counter()
+        if self.interval and now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = max(self.elapsed, 1e-9)
+        return {
+            "hands": self.hands,
+            "decisions": self.decisions,
+            "bytes": self.bytes,
+            "elapsed_s": round(elapsed, 3),
+            "hands_per_sec": round(self.hands / elapsed, 1),
+            "decisions_per_sec": round(self.decisions / elapsed, 1),
+            "mb_per_sec": round(self.bytes / elapsed / 1e6, 2),
+        }
+
+    def report(self) -> None:
+        s = self.snapshot()
+        print(f"📈 {s['hands']} hands ({s['hands_per_sec']}/s), {s['decisions']} decisions, "
+              f"{s['mb_per_sec']} MB/s", file=self.stream)
+
+
+def evaluate_stream(
+    spots: Iterable[Tuple[int, int, Dict[str, Any], List[Dict[str, Any]]]],
+    pool: EnginePool,
+    max_pending: int = DEFAULT_MAX_PENDING,
+    meter: Optional[Throughput] = None,
+) -> Iterator[Tuple[str, Any]]:
+    """
+    將決策送進 pool，依原始順序 yield:
+      ("decision", (hand, decision, strategy, error))
+      ("hand_done", (hand, end_offset))   ← 該手所有決策都已輸出，可作為 checkpoint
+    未完成的決策達 max_pending 時會先等最舊的完成才繼續讀檔。
+    """
+    pending: Deque[Tuple[str, Any, Any]] = deque()
+    in_flight = 0
+
+    def _drain(limit: int) -> Iterator[Tuple[str, Any]]:
+        nonlocal in_flight
+        # 超過上限時等最舊的完成；否則只輸出已完成 (或不需運算) 的前端項目
+        while pending and (limit == 0 or in_flight > limit or pending[0][2] is None or pending[0][2].done()):
+            kind, payload, future = pending.popleft()
+            if kind == "hand_done":
+                yield kind, payload
+                continue
+            in_flight -= future is not None
+            hand, decision = payload
+            strategy, error = None, None
+            if future is not None:
+                try:
+                    strategy = future.result()
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+            yield kind, (hand, decision, strategy, error)
+
+    for start, end, hand, decisions in spots:
+        for decision in decisions:
+            future = pool.submit(decision["features"]) if "features" in decision else None
+            in_flight += future is not None
+            pending.append(("decision", (hand, decision), future))
+        pending.append(("hand_done", (hand, end), None))
+        if meter is not None:
+            meter.add(hands=1, decisions=len(decisions), nbytes=end - start)
+        yield from _drain(max_pending)
+    yield from _drain(0)
@@ -1,50 +1,319 @@
 # server.py
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 import os
 import signal
 import traceback
 import asyncio
 import uuid
+import json
+import time
+import atexit
+import threading
+import weakref
+from collections import OrderedDict
+from functools import partial
 
 # 引入現有的 agent 邏輯
 import agent
 from features.context import parse_poker_situation
-from strategy.engine import recommend_action
+from features.context import normalize_poker_features
+from features.game_state import GameState
+from strategy.gto import prune_strategy_output
+from strategy.pool import get_engine_pool, EnginePool
+from strategy.batch import evaluate_spot, evaluate_spots, spot_fingerprint
+from strategy.ranges.range_utils import check_custom_range
+from services.llm_client import LLMError
+from core.metrics import REGISTRY, QUEUE_WAIT_SECONDS, REQUEST_SECONDS, INFLIGHT, ERRORS
+from core.profiling import RequestProfiler, is_profile_flag
+from core.memory import MEMORY_TRACKER, deep_sizeof
+from core.delta import VersionedDict
+from core.session_store import SessionStore, SESSION_DB, HOT_SESSIONS
 
 app = FastAPI(title="Poker Coach API")
+engine_pool = get_engine_pool()
+# Profiling 時 engine 必須在同一個 thread 執行，cProfile 才量得到
+_inline_pool = EnginePool(0)
+
+@app.on_event("startup")
+async def start_engine_pool():
+    # 預熱 Engine workers (ENGINE_WORKERS=0 時不做任何事)
+    await asyncio.get_running_loop().run_in_executor(None, engine_pool.start)
+
+@app.on_event("shutdown")
+async def stop_engine_pool():
+    engine_pool.shutdown()
+    # 把 write-behind 佇列寫完，重啟後 session 可以讀回
+    sessions.close()
+
+_TIMED_ENDPOINTS = {"/chat": "chat", "/strategy": "strategy", "/strategy/batch": "strategy_batch"}
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    endpoint = _TIMED_ENDPOINTS.get(request.url.path)
+    if endpoint is None:
+        return await call_next(request)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except BaseException:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+        raise
+    # call_next 在送出 header 時就返回；/strategy/batch 的 NDJSON 是邊算邊送，
+    # 因此等 body 送完 (或用戶端中斷) 才記錄延遲
+    body = response.body_iterator
+
+    async def timed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+
+    response.body_iterator = timed_body()
+    return response
+
+async def run_in_executor(endpoint: str, fn, *args):
+    """丟到預設 thread pool 執行，並記錄排隊時間與執行中數量。"""
+    submitted = time.perf_counter()
+
+    def _job():
+        QUEUE_WAIT_SECONDS.observe(time.perf_counter() - submitted, endpoint=endpoint)
+        return fn(*args)
+
+    INFLIGHT.inc(endpoint=endpoint)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, _job)
+    finally:
+        INFLIGHT.dec(endpoint=endpoint)
+
+def _profile_requested(http_request: Request) -> bool:
+    """X-Profile: 1 header 或 ?profile=1 query 開啟單次請求的 profiling。"""
+    return is_profile_flag(http_request.headers.get("X-Profile")) or is_profile_flag(http_request.query_params.get("profile"))
+
+def _profiled_spot(raw_state: Dict[str, Any]):
+    with RequestProfiler() as prof:
+        result = evaluate_spot(raw_state, _inline_pool)
+    return result, prof.save("strategy", spot_fingerprint(normalize_poker_features(dict(raw_state))))
+
+def _state_payload(state: Optional[GameState]) -> Optional[Dict[str, Any]]:
+    """GameState 只在 API 邊界序列化一次。"""
+    return state.to_dict() if state else None
+
+MAX_CHAT_HISTORY = 20
 
 # 記憶遊戲狀態與對話歷史
 class GameSession:
+    """
+    每次變動 (新訊息、新策略結果) 都會遞增 version；
+    用戶端帶上 session_id 與已確認的 version (since)，回應就只含之後變動的欄位。
+    """
+
     def __init__(self):
         self.session_id = str(uuid.uuid4())
-        self.current_context = None
+        self.current_context: Optional[GameState] = None
         self.chat_history = []
         self.last_strategy = None
+        self.version = 0
+        self._history_versions: List[int] = []  # 與 chat_history 一一對應：該訊息加入時的版本
+        self._tracked = {"game_state": VersionedDict(), "strategy": VersionedDict()}
+        self.on_change = None  # SessionManager 設定：每次變動後交給 write-behind 佇列
+
+    def _changed(self) -> None:
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def to_record(self) -> Dict[str, Any]:
+        """持久化快照 (game_state / strategy 直接沿用已序列化的 payload)。"""
+        return {
+            "version": self.version,
+            "context": self._tracked["game_state"].snapshot(),
+            "last_strategy": self.last_strategy,
+            "chat_history": list(self.chat_history),
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "GameSession":
+        """重啟後讀回；session_id 重新產生，用戶端舊的版本號會拿到完整狀態。"""
+        restored = cls()
+        restored.version = int(record.get("version") or 0)
+        restored.chat_history = list(record.get("chat_history") or [])[-MAX_CHAT_HISTORY:]
+        restored._history_versions = [restored.version] * len(restored.chat_history)
+        context = record.get("context")
+        restored.current_context = GameState.from_dict(context) if context else None
+        restored.last_strategy = record.get("last_strategy")
+        restored._tracked["game_state"].replace(context, restored.version)
+        restored._tracked["strategy"].replace(restored.last_strategy, restored.version)
+        return restored
+
+    def _bump(self) -> int:
+        self.version += 1
+        return self.version
+
+    def append_message(self, role: str, content: str) -> None:
+        self.chat_history.append({"role": role, "content": content})
+        self._history_versions.append(self._bump())
+        if len(self.chat_history) > MAX_CHAT_HISTORY:
+            self.chat_history = self.chat_history[-MAX_CHAT_HISTORY:]
+            self._history_versions = self._history_versions[-MAX_CHAT_HISTORY:]
+        self._changed()
+
+    def set_result(self, state: GameState, strategy: Optional[Dict[str, Any]]) -> None:
+        self.current_context = state
+        self.last_strategy = strategy
+        version = self._bump()
+        self._tracked["game_state"].replace(_state_payload(state), version)
+        self._tracked["strategy"].replace(strategy, version)
+        self._changed()
+
+    def can_patch(self, since: Optional[int], session_id: Optional[str]) -> bool:
+        """用戶端的版本屬於目前 session (重置或伺服器重啟後 session_id 會變) 才能送差量。"""
+        return since is not None and session_id == self.session_id and 0 <= since <= self.version
+
+    def state_payload(self) -> Dict[str, Any]:
+        """game_state / strategy 的完整內容 (直接沿用 set_result 時序列化好的 payload)。"""
+        return {name: tracked.snapshot() for name, tracked in self._tracked.items()}
+
+    def state_patch(self, since: int) -> Dict[str, Any]:
+        return {name: tracked.diff(since) for name, tracked in self._tracked.items()}
+
+    def messages_since(self, since: int) -> List[Dict[str, str]]:
+        return [msg for msg, v in zip(self.chat_history, self._history_versions) if v > since]
+
+    def memory_report(self) -> Dict[str, int]:
+        return {
+            "current_context_bytes": deep_sizeof(self.current_context),
+            "chat_history_bytes": deep_sizeof(self.chat_history),
+            "last_strategy_bytes": deep_sizeof(self.last_strategy),
+        }
 
     def reset(self):
-        self.session_id = str(uuid.uuid4())  # Rotate session ID
+        self.session_id = str(uuid.uuid4())  # Rotate session ID (舊版本號一併失效)
         self.current_context = None
-        self.chat_history = [{"role": "assistant", "content": "🧹 記憶已清除，請輸入新牌局。"}]
+        self.chat_history = []
+        self._history_versions = []
         self.last_strategy = None
+        self._tracked = {"game_state": VersionedDict(), "strategy": VersionedDict()}
+        self.append_message("assistant", "🧹 記憶已清除，請輸入新牌局。")
+
+DEFAULT_SESSION_KEY = "default"
+
+class SessionManager:
+    """
+    用戶端 key → GameSession 的 LRU (最多 hot_sessions 個在記憶體)。
+    有 store 時每次變動都寫入 write-behind 佇列，被擠出或重啟後第一次存取才從 SQLite 讀回。
+    擠出只是放掉 LRU 的引用：仍被請求持有的 session 會在下次存取時放回 LRU，不會重複載入。
+    """
+
+    def __init__(self, store: Optional[SessionStore] = None, hot_sessions: int = HOT_SESSIONS):
+        self.store = store
+        self.hot_sessions = max(int(hot_sessions or 1), 1)
+        self._sessions: "OrderedDict[str, GameSession]" = OrderedDict()
+        # 所有仍被引用的 session (含已擠出 LRU、但請求尚未結束的)
+        self._live: "weakref.WeakValueDictionary[str, GameSession]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def peek(self, key: str = DEFAULT_SESSION_KEY) -> Optional[GameSession]:
+        """不做 I/O：在 LRU 內，或已被擠出但仍有請求持有 (重新放回 LRU) 時回傳；否則 None。"""
+        with self._lock:
+            return self._attach(key)
 
-# Global session instance (Simplifying for single user local app)
-session = GameSession()
+    def get(self, key: str = DEFAULT_SESSION_KEY) -> GameSession:
+        """peek 不到時從 store 讀回 (SQLite I/O，async 端點請用 aget)。"""
+        found = self.peek(key)
+        if found is not None:
+            return found
+        record = self.store.load(key) if self.store else None
+        loaded = GameSession.from_record(record) if record else GameSession()
+        if self.store:
+            loaded.on_change = partial(self._persist, key)
+        with self._lock:
+            found = self._attach(key)
+            if found is not None:  # 另一個請求先載入了
+                return found
+            self._live[key] = loaded
+            self._insert(key, loaded)
+        return loaded
+
+    async def aget(self, key: str = DEFAULT_SESSION_KEY) -> GameSession:
+        found = self.peek(key)
+        if found is not None:
+            return found
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, key)
+
+    def _attach(self, key: str) -> Optional[GameSession]:
+        found = self._sessions.get(key)
+        if found is not None:
+            self._sessions.move_to_end(key)
+            return found
+        # 被擠出 LRU 但請求還在用：沿用同一個物件，不再從 store 載入第二份 (兩份會互相覆寫紀錄)
+        found = self._live.get(key)
+        if found is not None:
+            self._insert(key, found)
+        return found
+
+    def _insert(self, key: str, session: GameSession) -> None:
+        self._sessions[key] = session
+        while len(self._sessions) > self.hot_sessions:
+            self._sessions.popitem(last=False)
+
+    def _persist(self, key: str, changed: GameSession) -> None:
+        self.store.save(key, changed.to_record())
+
+    def close(self) -> None:
+        if self.store:
+            self.store.close()
+
+# 預設所有請求共用同一個 session (單人本機使用)；帶 X-Session-Key header 或 poker_session cookie 可分開
+sessions = SessionManager(SessionStore(SESSION_DB) if SESSION_DB else None)
+atexit.register(sessions.close)
+
+async def _get_session(http_request: Request) -> GameSession:
+    """不在記憶體時的 SQLite 讀取交給 executor，不擋住 event loop。"""
+    key = http_request.headers.get("X-Session-Key") or http_request.cookies.get("poker_session") or DEFAULT_SESSION_KEY
+    return await sessions.aget(key)
 
 class ChatRequest(BaseModel):
     message: str
     ui_state: Optional[Dict[str, Any]] = None
+    # 用戶端已套用的版本；帶上後成功的回應只含變動欄位 (patch)
+    since: Optional[int] = None
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     advice: str
     game_state: Optional[Dict[str, Any]]
     strategy: Optional[Dict[str, Any]]
+    # 只有成功的回應帶版本；patch 存在時 game_state / strategy 為 None
+    version: Optional[int] = None
+    session_id: Optional[str] = None
+    patch: Optional[Dict[str, Any]] = None
+
+class StrategyRequest(BaseModel):
+    # 與 parse_poker_situation 輸出相同的正規化欄位 (不經 LLM)
+    hero_position: Optional[str] = None
+    villain_position: Optional[str] = None
+    hero_hole_cards: Optional[Union[List[str], str]] = None
+    board_cards: Optional[Union[List[str], str]] = None
+    actions: Optional[Union[Dict[str, Any], List[Dict[str, Any]]]] = None
+    hero_stack_bb: Optional[float] = None
+    villain_stack_bb: Optional[float] = None
+    street: Optional[str] = None
+    blinds: Optional[Dict[str, float]] = None
+    # 自訂起始範圍：範圍字串 (例如 "22+, A2s+, KTo+, 76s:0.5") 或 1326 個權重 (combos.COMBOS 順序)
+    hero_range: Optional[Union[str, List[float]]] = None
+    villain_range: Optional[Union[str, List[float]]] = None
+
+class BatchStrategyRequest(BaseModel):
+    spots: List[StrategyRequest]
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request, response: Response):
+    session = await _get_session(http_request)
     user_message = request.message.strip()
     ui_state = request.ui_state
     
@@ -61,86 +330,88 @@ async def chat(request: ChatRequest):
     # If explicit text is empty but we have UI update, we might want to log a system event?
     # But user usually sees "Update Hand" generic text in frontend.
     if user_message:
-        session.chat_history.append({"role": "user", "content": user_message})
+        session.append_message("user", user_message)
 
     # Define synchronous processing function
-    def process_chat_logic(user_msg, current_ctx, history, ui_updates):
+    def process_chat_logic(user_msg, current_state, history, ui_updates, pool=engine_pool):
         try:
             # Phase 0: Enforce UI State Updates (Override memory)
             # This ensures that if user sees cards in UI, backend SEES them too.
-            effective_ctx = current_ctx.copy() if current_ctx else {}
-            
+            # Frontend sends: { "hero_hole_cards": [...], "board_cards": [...] }
+            state = current_state.copy() if current_state else GameState()
             if ui_updates:
-                # Map frontend keys to backend keys if needed, or assume consistent
-                # Frontend sends: { "hero_hole_cards": [...], "board_cards": [...] }
-                effective_ctx.update(ui_updates)
-                
+                state.update(ui_updates)
+
             # Phase 1: 解析 (Parsing)
-            # Pass the ALREADY updated context to parser so LLM sees the new cards as "Previous State"
-            new_features = parse_poker_situation(user_msg, effective_ctx)
-            
-            # Check for Strategy Query
-            is_query = new_features.get("is_strategy_query", False)
-            
-            # Prepare working context
-            local_ctx = effective_ctx # Start with what we had + UI
-            
-            # Always merge new features (excluding special flags if needed, but parser usually returns clean dict + flags)
-            local_ctx.update(new_features)
-            
-            if is_query:
-                 # Check if we have minimal required info (e.g., Hero Hand)
-                 # Adjust this check based on what recommend_action needs
-                 if not local_ctx.get("hero_hand") and not local_ctx.get("hero_hole_cards"):
-                     return {
-                         "error": "⚠️ 請先提供牌局資訊(至少手牌)，再詢問策略。", 
-                         "context": None, 
-                         "strategy": None
-                     }
+            # Pass the ALREADY updated state to parser so LLM sees the new cards as "Previous State"
+            new_features = parse_poker_situation(user_msg, state)
+            is_query = new_features.pop("is_strategy_query", False)
+            state.update(new_features)
+
+            if is_query and not state.has_hero_hand:
+                return {
+                    "error": "⚠️ 請先提供牌局資訊(至少手牌)，再詢問策略。",
+                    "context": None,
+                    "strategy": None
+                }
 
             # Phase 2: 策略 (Strategy Calculation)
-            # Pass the UPDATED local_ctx
-            strategy_output = recommend_action(local_ctx)
-            
-            # Update Context with Math Data from Strategy
-            if "context" in strategy_output:
-                local_ctx.update(strategy_output["context"])
-            
+            strategy_output = pool.recommend_action(state.to_features())
+
+            # Engine 回填的 hand_category / advantage_data 等 (spr 以 Engine 為準)
+            state.merge_engine_context(strategy_output.get("context"))
+
             # Phase 3: 表達 (Agent Advice Generation)
-            history_copy = list(history) # Work on copy
             final_advice = agent.generate_coaching_advice(
-                user_input=user_msg, 
-                game_state=local_ctx, 
-                strategy_result=strategy_output, 
-                chat_history=history_copy
+                user_input=user_msg,
+                game_state=state,
+                strategy_result=strategy_output,
+                chat_history=list(history)
             )
-            
+
             return {
                 "advice": final_advice.strip(),
-                "context": local_ctx,
+                "context": state,
                 "strategy": strategy_output
             }
+        except LLMError as le:
+             ERRORS.inc(phase="llm")
+             return {"error": str(le)}
         except ValueError as ve:
+             ERRORS.inc(phase="validation")
              return {"error": f"❌ {str(ve)}"}
         except Exception as e:
+             ERRORS.inc(phase="system")
              traceback.print_exc()
              return {"error": f"❌ 發生系統錯誤: {str(e)}"}
 
+    profile = _profile_requested(http_request)
+
+    def run_chat_logic(*args):
+        if not profile:
+            return process_chat_logic(*args)
+        with RequestProfiler() as prof:
+            result = process_chat_logic(*args, pool=_inline_pool)
+        result["profile"] = prof.save("chat", spot_fingerprint(_state_payload(result.get("context")) or {}))
+        return result
+
     # Capture current session ID
     current_sess_id = session.session_id
 
     try:
         # Run processing in a separate thread to avoid blocking the event loop
-        loop = asyncio.get_running_loop()
-        result = await loop.run_in_executor(
-            None, 
-            process_chat_logic, 
+        result = await run_in_executor(
+            "chat",
+            run_chat_logic, 
             user_message, 
             session.current_context,
             session.chat_history[:-1], # Exclude the just-added user message
             ui_state # [NEW] Pass UI state
         )
 
+        if result.get("profile"):
+            response.headers["X-Profile-Path"] = result["profile"]["pstats"]
+
         # Check if session was reset during processing
         if session.session_id != current_sess_id:
             print(f"Session mismatch: {current_sess_id} != {session.session_id}. Discarding result.")
@@ -152,24 +423,29 @@ async def chat(request: ChatRequest):
         if "error" in result:
              # Remove floating user message or append error?
              # Appending error as assistant message is better
-             session.chat_history.append({"role": "assistant", "content": result["error"]})
-             return ChatResponse(advice=result["error"], game_state=session.current_context, strategy=None)
+             session.append_message("assistant", result["error"])
+             return ChatResponse(advice=result["error"], game_state=session.state_payload()["game_state"], strategy=None)
         
-        # Success: Update Session
-        session.current_context = result["context"]
-        session.last_strategy = result["strategy"]
+        # Success: Update Session (只保留下一輪會讀到的欄位，避免 session 記憶體持續膨脹)
+        session.set_result(result["context"].for_session(), prune_strategy_output(result["strategy"]))
         
         final_advice = result["advice"]
-        session.chat_history.append({"role": "assistant", "content": final_advice})
-        
-        # Limit History Length
-        if len(session.chat_history) > 20:
-             session.chat_history = session.chat_history[-20:]
+        session.append_message("assistant", final_advice)
 
+        if session.can_patch(request.since, request.session_id):
+            return ChatResponse(
+                advice=final_advice,
+                game_state=None,
+                strategy=None,
+                version=session.version,
+                session_id=session.session_id,
+                patch=session.state_patch(request.since),
+            )
         return ChatResponse(
             advice=final_advice,
-            game_state=session.current_context,
-            strategy=session.last_strategy
+            version=session.version,
+            session_id=session.session_id,
+            **session.state_payload()
         )
 
     except Exception as e:
@@ -177,16 +453,60 @@ async def chat(request: ChatRequest):
         traceback.print_exc()
         return ChatResponse(
             advice=f"❌ 發生系統錯誤: {str(e)}",
-            game_state=session.current_context,
+            game_state=session.state_payload()["game_state"],
             strategy=None
         )
 
+def _check_custom_ranges(raw_state: Dict[str, Any]) -> None:
+    """自訂範圍在送進 Engine 前先解析，格式錯誤時丟出 ValueError (回 400)。"""
+    for key in ("hero_range", "villain_range"):
+        try:
+            check_custom_range(raw_state.get(key))
+        except ValueError as ve:
+            raise ValueError(f"{key}: {ve}") from None
+
+@app.post("/strategy")
+async def strategy(request: StrategyRequest, http_request: Request, response: Response):
+    """
+    直接以結構化牌局取得策略 (format_output 格式)，跳過解析與教練兩次 LLM 呼叫。
+    """
+    raw_state = request.model_dump(exclude_none=True)
+    try:
+        _check_custom_ranges(raw_state)
+        if not _profile_requested(http_request):
+            return await run_in_executor("strategy", evaluate_spot, raw_state, engine_pool)
+        result, paths = await run_in_executor("strategy", _profiled_spot, raw_state)
+        response.headers["X-Profile-Path"] = paths["pstats"]
+        return result
+    except ValueError as ve:
+        ERRORS.inc(phase="validation")
+        raise HTTPException(status_code=400, detail=str(ve))
+
+@app.post("/strategy/batch")
+async def strategy_batch(request: BatchStrategyRequest):
+    """
+    批次策略：相同牌局去重後平行運算，以 NDJSON 依完成順序串流回傳 (每行附 index 與 elapsed_ms)。
+    """
+    spots = [spot.model_dump(exclude_none=True) for spot in request.spots]
+    for index, spot in enumerate(spots):
+        try:
+            _check_custom_ranges(spot)
+        except ValueError as ve:
+            ERRORS.inc(phase="validation")
+            raise HTTPException(status_code=400, detail=f"spots[{index}].{ve}")
+
+    def _stream():
+        for item in evaluate_spots(spots, engine_pool):
+            yield json.dumps(item, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
 # Global variable for server control
 server_instance = None
 
 @app.post("/reset")
-async def reset():
-    session.reset()
+async def reset(http_request: Request):
+    (await _get_session(http_request)).reset()
     return {"status": "success", "message": "Game session reset"}
 
 @app.post("/shutdown")
@@ -210,15 +530,45 @@ async def shutdown():
     
     return {"status": "success", "message": "Server is shutting down..."}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text format 指標 (各階段延遲、排隊時間、錯誤數)。"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/memory")
+async def debug_memory(http_request: Request, top: int = 20, group_by: str = "lineno", start: bool = False, stop: bool = False):
+    """
+    記憶體帳目：session 各欄位大小，加上 tracemalloc 快照 (前 top 名配置位置與上一次快照的差異)。
+    ?start=1 開始追蹤 (之後的配置才會被記錄)，?stop=1 停止追蹤。
+    """
+    if stop:
+        MEMORY_TRACKER.stop()
+    elif start:
+        MEMORY_TRACKER.start()
+    try:
+        report = await asyncio.get_running_loop().run_in_executor(None, MEMORY_TRACKER.report, top, group_by)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    report["session"] = (await _get_session(http_request)).memory_report()
+    return report
+
 @app.get("/state")
-async def get_state():
+async def get_state(http_request: Request, since: Optional[int] = None, session_id: Optional[str] = None):
     """
     Retrieve current game session state for restoration.
+    ?since=<version>&session_id=<id>：只回傳該版本之後的新訊息與變動欄位 (polling 用)。
+    伺服器重啟後第一次存取會從 SQLite 讀回 session。
     """
+    session = await _get_session(http_request)
+    if session.can_patch(since, session_id):
+        patch = session.state_patch(since)
+        patch["chat_history"] = session.messages_since(since)
+        return {"version": session.version, "session_id": session.session_id, "patch": patch}
     return {
+        "version": session.version,
+        "session_id": session.session_id,
         "chat_history": session.chat_history,
-        "game_state": session.current_context,
-        "strategy": session.last_strategy
+        **session.state_payload()
     }
 
 # 掛載靜態檔案 (前端)
@@ -1,8 +1,12 @@
 import os
+import time
+import random
+import threading
 import requests
 from typing import List, Dict
 from pathlib import Path
 from dotenv import load_dotenv
+from core.metrics import LLM_RETRIES, LLM_FAILURES
 ENV_PATH = Path(__file__).resolve().parents[1] / ".env"
 load_dotenv(dotenv_path=ENV_PATH)
 
@@ -15,6 +19,107 @@ LLM_API_URL = os.getenv("LLM_API_URL")
 LLM_API_KEY = os.getenv("LLM_API_KEY")
 LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME")
 
+# 重試與熔斷設定
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "180"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.5"))   # 秒，指數退避的基數
+LLM_RETRY_BACKOFF_MAX = float(os.getenv("LLM_RETRY_BACKOFF_MAX", "8"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))  # 連續失敗幾次後熔斷
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))  # 熔斷後多久允許試探
+
+_RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    """LLM 呼叫失敗 (重試用盡、熔斷中或不可重試的錯誤)。"""
+
+
+class _RetryableError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    連續失敗達門檻即熔斷 (open)，冷卻期內直接失敗；
+    冷卻後放行一次試探 (half-open)，成功即恢復。
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = max(int(threshold), 1)
+        self.cooldown = float(cooldown)
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """結果不算成功也不算失敗 (例如 4xx)：只放掉試探名額，熔斷狀態與失敗次數不變。"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+_BREAKER = CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN)
+
+
+def _backoff_delay(attempt: int) -> float:
+    # Full jitter: uniform(0, min(cap, base * 2^attempt))
+    return random.uniform(0, min(LLM_RETRY_BACKOFF_MAX, LLM_RETRY_BACKOFF * (2 ** attempt)))
+
+
+def _post_once(headers: Dict[str, str], payload: Dict) -> str:
+    try:
+        response = requests.post(LLM_API_URL, headers=headers, json=payload, timeout=LLM_TIMEOUT)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        raise _RetryableError(str(e))
+    except requests.RequestException as e:
+        raise LLMError(f"LLM 請求錯誤: {e}")
+
+    if response.status_code in _RETRYABLE_STATUS:
+        raise _RetryableError(f"HTTP {response.status_code}")
+    try:
+        response.raise_for_status()
+        data = response.json()
+    except (requests.HTTPError, ValueError) as e:
+        raise LLMError(f"LLM 回應錯誤: {e}")
+
+    if "choices" in data:
+        return data["choices"][0]["message"]["content"]
+    elif "message" in data:
+        return data["message"]["content"]
+    else:
+        return str(data)
+
 
 def call_llm(system_prompt: str, user_message: str, history: List[Dict[str, str]] = None) -> str:
     if not LLM_API_URL or not LLM_API_KEY:
@@ -38,20 +143,33 @@ def call_llm(system_prompt: str, user_message: str, history: List[Dict[str, str]
     payload = {
         "model": LLM_MODEL_NAME,
         "messages": messages,
-        "temperature": 0.05, 
-        "stream": False 
+        "temperature": 0.05,
+        "stream": False
     }
 
-    try:
-        response = requests.post(LLM_API_URL, headers=headers, json=payload, timeout=180)
-        response.raise_for_status()
-        data = response.json()
-        if "choices" in data:
-            return data["choices"][0]["message"]["content"]
-        elif "message" in data:
-            return data["message"]["content"]
-        else:
-            return str(data)
-    except Exception as e:
-        print(f"[Error] API Call failed: {e}")
-        return ""
+    # 4. 送出 (可重試錯誤做退避重試，連續失敗則熔斷)
+    if not _BREAKER.allow():
+        LLM_FAILURES.inc(reason="breaker_open")
+        raise LLMError("⚠️ LLM 服務暫時無法連線，請稍後再試。")
+
+    last_error = ""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            content = _post_once(headers, payload)
+            _BREAKER.record_success()
+            return content
+        except _RetryableError as e:
+            last_error = str(e)
+            print(f"[Warn] API Call failed (attempt {attempt + 1}/{LLM_MAX_RETRIES + 1}): {e}")
+            if attempt < LLM_MAX_RETRIES:
+                LLM_RETRIES.inc()
+                time.sleep(_backoff_delay(attempt))
+        except LLMError:
+            LLM_FAILURES.inc(reason="non_retryable")
+            # 不可重試的錯誤 (4xx、設定錯誤) 不代表上游中斷，不計入熔斷；但也不能當成試探成功而關閉熔斷
+            _BREAKER.release_probe()
+            raise
+
+    _BREAKER.record_failure()
+    LLM_FAILURES.inc(reason="retries_exhausted")
+    raise LLMError(f"⚠️ LLM 服務呼叫失敗 (已重試 {LLM_MAX_RETRIES} 次): {last_error}")
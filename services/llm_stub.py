@@ -0,0 +1,140 @@
+# services/llm_stub.py
+"""
+本地 LLM Stub Server (OpenAI 相容)：離線測試與壓力測試 /chat 用。
+回應為固定內容 (可用 JSON 檔覆寫)，並可設定延遲與錯誤率。
+
+使用方式:
+    python -m services.llm_stub --port 9000 --latency-ms 300
+    LLM_API_URL=http://localhost:9000/v1/chat/completions LLM_API_KEY=stub python server.py
+
+回應檔格式 (--responses):
+    {"rules": [{"match": "turn", "content": "..."}], "extractor": {...}, "coach": "..."}
+    rules 依序比對最後一則 user 訊息，第一個命中者回傳；否則依 system prompt 判斷是解析或教練回應。
+"""
+from __future__ import annotations
+
+import json
+import time
+import random
+import asyncio
+import argparse
+from typing import Dict, Any, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from .prompts import EXTRACTOR_SYSTEM_PROMPT
+
+DEFAULT_EXTRACTION: Dict[str, Any] = {
+    "is_strategy_query": False,
+    "players": {
+        "hero": {"position": "BTN", "stack_bb": 100, "cards": ["Ah", "Kd"]},
+        "villain": {"position": "BB", "stack_bb": 100, "cards": []},
+    },
+    "board": {"cards": ["As", "7c", "2d"]},
+    "blinds": {"sb": 0.5, "bb": 1.0},
+    "street": "flop",
+    "actions": [
+        {"street": "preflop", "order": 1, "player": "BTN", "action": "open", "amount": 2.5},
+        {"street": "preflop", "order": 2, "player": "BB", "action": "call", "amount_to": None},
+        {"street": "flop", "order": 3, "player": "BB", "action": "check"},
+    ],
+    "meta": {"missing_fields": []},
+}
+
+DEFAULT_COACH = (
+    "GTO 建議：依照 Solver 結果執行。\n"
+    "情境數據：請參考右側面板。\n"
+    "戰術解析：\n- **理由 1 (範圍對抗)**: (stub)\n"
+    "結論：(stub response)"
+)
+
+
+class StubConfig:
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        responses: Optional[Dict[str, Any]] = None,
+    ):
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.error_rate = float(error_rate)
+        self.rng = random.Random(seed)  # 固定種子：延遲與錯誤序列可重現
+        responses = responses or {}
+        self.rules: List[Dict[str, str]] = responses.get("rules", [])
+        self.extractor = responses.get("extractor", DEFAULT_EXTRACTION)
+        self.coach = responses.get("coach", DEFAULT_COACH)
+        self.requests = 0
+
+
+def _pick_content(config: StubConfig, messages: List[Dict[str, Any]]) -> str:
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+
+    for rule in config.rules:
+        if rule.get("match") and rule["match"] in user:
+            content = rule.get("content", "")
+            return content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+
+    if system.strip() == EXTRACTOR_SYSTEM_PROMPT.strip():
+        extractor = config.extractor
+        return extractor if isinstance(extractor, str) else json.dumps(extractor, ensure_ascii=False)
+    return config.coach
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="LLM Stub")
+
+    @app.post("/{path:path}")
+    async def completions(path: str, request: Request):
+        config.requests += 1
+        delay = config.latency_ms + config.rng.uniform(0, config.jitter_ms)
+        fail = config.rng.random() < config.error_rate
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+        if fail:
+            return JSONResponse({"error": {"message": "stub injected failure"}}, status_code=503)
+
+        body = await request.json()
+        content = _pick_content(config, body.get("messages", []))
+        return {
+            "id": f"stub-{config.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model") or "stub",
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible LLM stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="0~1，回傳 503 的比例")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--responses", help="自訂回應 JSON 檔")
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses, "r", encoding="utf-8") as f:
+            responses = json.load(f)
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.seed, responses)
+    print(f"🧪 LLM stub on http://{args.host}:{args.port}/v1/chat/completions (latency {args.latency_ms}ms)")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# services/prompt_budget.py
+"""
+Token 預算化的 Prompt 組裝：本地估算 token，依預算裁切/摘要歷史對話，
+並壓縮牌局快照的空白，回報各段 token 數。
+"""
+from __future__ import annotations
+
+import os
+import math
+from typing import List, Dict, Tuple
+
+from core.metrics import PROMPT_TOKENS
+
+# 歷史對話可使用的 token 上限 (解析階段不帶歷史)
+COACH_HISTORY_TOKEN_BUDGET = int(os.getenv("COACH_HISTORY_TOKEN_BUDGET", "1500"))
+# 被裁掉的歷史會濃縮成一則摘要，摘要本身的 token 上限
+HISTORY_SUMMARY_TOKEN_BUDGET = int(os.getenv("HISTORY_SUMMARY_TOKEN_BUDGET", "200"))
+
+_MESSAGE_OVERHEAD = 4  # 每則訊息的 role/分隔符號成本 (OpenAI chat 格式約 3~4)
+
+
+def _is_cjk(ch: str) -> bool:
+    code = ord(ch)
+    return (
+        0x4E00 <= code <= 0x9FFF      # CJK Unified Ideographs
+        or 0x3400 <= code <= 0x4DBF   # Extension A
+        or 0x3000 <= code <= 0x303F   # CJK 標點
+        or 0xFF00 <= code <= 0xFFEF   # 全形符號
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗估 token 數：中日韓文字約 1 字 1 token，其餘約 4 字元 1 token。
+    不依賴 tokenizer，誤差約 ±15%，足夠做預算控制。
+    """
+    if not text:
+        return 0
+    cjk = 0
+    other = 0
+    for ch in text:
+        if _is_cjk(ch):
+            cjk += 1
+        elif not ch.isspace():
+            other += 1
+        else:
+            other += 0.25
+    return cjk + int(math.ceil(other / 4.0))
+
+
+def estimate_message_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(m.get("content", "")) + _MESSAGE_OVERHEAD for m in messages or [])
+
+
+def compact_text(text: str) -> str:
+    """移除每行的縮排與空行 (f-string 區塊內的排版空白也會送進 LLM)。"""
+    if not text:
+        return ""
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def _truncate_to_tokens(text: str, budget: int) -> str:
+    if estimate_tokens(text) <= budget:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo] + "…"
+
+
+def _summarize(dropped: List[Dict[str, str]], budget: int) -> Dict[str, str]:
+    """把被裁掉的舊對話濃縮成一則摘要 (只保留使用者的提問，教練回覆可由當前數據重建)。"""
+    questions = [compact_text(m.get("content", "")) for m in dropped if m.get("role") == "user"]
+    questions = [q for q in questions if q]
+    if not questions:
+        return {}
+    # 越新的提問越重要：由新到舊填入，再反轉回時間順序
+    per_item = max(budget // max(len(questions), 1), 24)
+    picked: List[str] = []
+    used = 0
+    for q in reversed(questions):
+        q = _truncate_to_tokens(q, per_item)
+        cost = estimate_tokens(q) + 1
+        if used + cost > budget:
+            break
+        picked.append(q)
+        used += cost
+    if not picked:
+        return {}
+    return {"role": "system", "content": "【先前對話摘要】使用者曾問: " + " | ".join(reversed(picked))}
+
+
+def fit_history(
+    history: List[Dict[str, str]],
+    budget: int = COACH_HISTORY_TOKEN_BUDGET,
+    summary_budget: int = HISTORY_SUMMARY_TOKEN_BUDGET,
+) -> List[Dict[str, str]]:
+    """
+    由新到舊保留歷史訊息直到用完預算；超出的部分摘要成一則訊息放在最前面。
+    """
+    if not history or budget <= 0:
+        return []
+
+    kept: List[Dict[str, str]] = []
+    used = 0
+    cut = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        msg = history[i]
+        cost = estimate_tokens(msg.get("content", "")) + _MESSAGE_OVERHEAD
+        if used + cost > budget:
+            break
+        kept.append(msg)
+        used += cost
+        cut = i
+    kept.reverse()
+
+    # 保持 user/assistant 成對：不要以 assistant 訊息開頭
+    while kept and kept[0].get("role") == "assistant":
+        kept.pop(0)
+        cut += 1
+
+    dropped = history[:cut]
+    if dropped and summary_budget > 0:
+        summary = _summarize(dropped, min(summary_budget, max(budget - used, 0)))
+        if summary:
+            kept.insert(0, summary)
+    return kept
+
+
+def token_report(system_prompt: str, user_message: str, history: List[Dict[str, str]] = None) -> Dict[str, int]:
+    system_tokens = estimate_tokens(system_prompt) + _MESSAGE_OVERHEAD
+    history_tokens = estimate_message_tokens(history or [])
+    user_tokens = estimate_tokens(user_message) + _MESSAGE_OVERHEAD
+    return {
+        "system": system_tokens,
+        "history": history_tokens,
+        "user": user_tokens,
+        "total": system_tokens + history_tokens + user_tokens,
+    }
+
+
+def build_prompt(
+    phase: str,
+    system_prompt: str,
+    user_message: str,
+    history: List[Dict[str, str]] = None,
+    history_budget: int = COACH_HISTORY_TOKEN_BUDGET,
+) -> Tuple[str, List[Dict[str, str]], Dict[str, int]]:
+    """
+    組裝單次 LLM 呼叫：壓縮 user 區塊、依預算裁切歷史，回傳 (user_message, history, token 報告)。
+    """
+    user_message = compact_text(user_message)
+    fitted = fit_history(history, history_budget) if history else []
+    report = token_report(system_prompt, user_message, fitted)
+    PROMPT_TOKENS.observe(report["total"], phase=phase)
+    print(f"🧮 [{phase}] prompt tokens ≈ {report['total']} "
+          f"(system {report['system']} / history {report['history']} / user {report['user']})")
+    return user_message, fitted, report
@@ -286,6 +286,49 @@ document.addEventListener('DOMContentLoaded', () => {
     // Request Generation Counter to prevent race conditions
     let currentGeneration = 0;
 
+    // --- Delta Sync ---
+    // 伺服器只回傳 since 版本之後變動的欄位 (patch)；這裡保存已套用的完整 game_state / strategy
+    let syncedState = { version: null, sessionId: null, game_state: null, strategy: null };
+
+    function resetSyncedState() {
+        syncedState = { version: null, sessionId: null, game_state: null, strategy: null };
+    }
+
+    function applyPatch(target, patch) {
+        if (!patch) return target;
+        const next = Object.assign({}, target || {});
+        Object.entries(patch.set || {}).forEach(([key, value]) => { next[key] = value; });
+        (patch.unset || []).forEach(key => { delete next[key]; });
+        return Object.keys(next).length > 0 ? next : null;
+    }
+
+    // 套用 /chat 或 /state 的回應 (完整或差量)，回傳目前的 { game_state, strategy }
+    function applyServerState(data) {
+        // 沒有版本號的回應 (錯誤、重置) 只用來顯示，不影響已同步的狀態
+        if (data.version === undefined || data.version === null) {
+            return { game_state: data.game_state, strategy: data.strategy };
+        }
+        const sameSession = data.session_id === syncedState.sessionId;
+        if (sameSession && syncedState.version !== null && data.version < syncedState.version) {
+            return { game_state: syncedState.game_state, strategy: syncedState.strategy }; // 過期的回應
+        }
+        if (data.patch) {
+            syncedState.game_state = applyPatch(syncedState.game_state, data.patch.game_state);
+            syncedState.strategy = applyPatch(syncedState.strategy, data.patch.strategy);
+        } else {
+            syncedState.game_state = data.game_state || null;
+            syncedState.strategy = data.strategy || null;
+        }
+        syncedState.version = data.version;
+        syncedState.sessionId = data.session_id;
+        return { game_state: syncedState.game_state, strategy: syncedState.strategy };
+    }
+
+    function stateUrl() {
+        if (syncedState.version === null) return '/state';
+        return `/state?since=${syncedState.version}&session_id=${encodeURIComponent(syncedState.sessionId)}`;
+    }
+
     // Reset Game
     // Reset Game
     resetBtn.addEventListener('click', async () => {
@@ -316,6 +359,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     </div>
                 `;
                 strategyContent.innerHTML = EMPTY_STATE_HTML;
+                resetSyncedState();
                 // Also clear selections
                 selectedCardMap.clear();
                 [...heroSlots, ...boardSlots].forEach(slot => { slot.className = 'card-slot empty'; slot.innerHTML = ''; });
@@ -414,7 +458,9 @@ document.addEventListener('DOMContentLoaded', () => {
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
                     message: fullMessage,
-                    ui_state: uiState // [NEW] Send structured state
+                    ui_state: uiState, // [NEW] Send structured state
+                    since: syncedState.version, // 已套用的版本：回應只含變動欄位
+                    session_id: syncedState.sessionId
                 })
             });
 
@@ -440,11 +486,12 @@ document.addEventListener('DOMContentLoaded', () => {
                 addMessage('assistant', formatResponse(data.advice));
             }
 
-            // Update Analysis Panel
-            updateAnalysisPanel(data);
+            // Apply full state or patch, then update Analysis Panel
+            const view = applyServerState(data);
+            updateAnalysisPanel(view);
 
             // Sync Visual State (Important for follow-up questions)
-            syncVisualState(data.game_state);
+            syncVisualState(view.game_state);
 
             // No need to poll since we got the response synchronously
 
@@ -638,6 +685,7 @@ document.addEventListener('DOMContentLoaded', () => {
             const res = await fetch('/state');
             if (!res.ok) return;
             const data = await res.json();
+            const view = applyServerState(data);
 
             // Store parsed cards from the *latest* user message to handle pending state restoration
             let pendingHeroCards = [];
@@ -671,16 +719,13 @@ document.addEventListener('DOMContentLoaded', () => {
 
             // 2. Restore Game State (Cards) from Server
             // If server has state, use it.
-            if (data.game_state) {
-                syncVisualState(data.game_state);
+            if (view.game_state) {
+                syncVisualState(view.game_state);
             }
 
             // 3. Restore Analysis
-            if (data.strategy) {
-                updateAnalysisPanel({
-                    strategy: data.strategy,
-                    game_state: data.game_state
-                });
+            if (view.strategy) {
+                updateAnalysisPanel(view);
             }
 
             // 4. Check Pending State (If last msg was user, we are waiting for assistant)
@@ -716,17 +761,20 @@ document.addEventListener('DOMContentLoaded', () => {
 
         pollingInterval = setInterval(async () => {
             try {
-                const res = await fetch('/state');
+                const res = await fetch(stateUrl());
                 const data = await res.json();
 
-                // If history length increased, or last message changed to assistant
-                if (data.chat_history.length > initialCount) {
+                // Patch 只含上次同步之後的新訊息；完整回應則依原本的訊息數切出新訊息
+                const newMsgs = data.patch ? data.patch.chat_history : data.chat_history.slice(initialCount);
+                const view = applyServerState(data);
+
+                // If new messages arrived (assistant reply)
+                if (newMsgs.length > 0) {
                     clearInterval(pollingInterval);
                     pollingInterval = null;
                     removeMessage(loadingId);
 
                     // Verify the new message is assistant
-                    const newMsgs = data.chat_history.slice(initialCount);
                     newMsgs.forEach(msg => {
                         if (msg.role === 'assistant') {
                             addMessage('assistant', formatResponse(msg.content));
@@ -734,12 +782,9 @@ document.addEventListener('DOMContentLoaded', () => {
                     });
 
                     // Also update strategy
-                    if (data.strategy) {
-                        updateAnalysisPanel({
-                            strategy: data.strategy,
-                            game_state: data.game_state
-                        });
-                        syncVisualState(data.game_state);
+                    if (view.strategy) {
+                        updateAnalysisPanel(view);
+                        syncVisualState(view.game_state);
                     }
                 }
             } catch (e) {
@@ -0,0 +1,107 @@
+# strategy/batch.py
+"""
+批次策略運算：一次評估大量牌局 (練習題、題庫)。
+相同牌局只算一次，其餘交給 Engine Pool 平行處理，依完成順序回傳。
+"""
+from __future__ import annotations
+
+import json
+import time
+import hashlib
+from concurrent.futures import as_completed
+from typing import Dict, Any, List, Iterator, Optional
+
+from features.context import normalize_poker_features
+from .pool import EnginePool, ENGINE_FEATURE_KEYS, get_engine_pool
+
+
+def spot_fingerprint(features: Dict[str, Any]) -> str:
+    """以 Engine 實際讀取的欄位計算牌局指紋，用於去重與快取。"""
+    compact = {k: features[k] for k in ENGINE_FEATURE_KEYS if k in features}
+    raw = json.dumps(compact, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def evaluate_spot(raw_state: Dict[str, Any], pool: Optional[EnginePool] = None) -> Dict[str, Any]:
+    """
+    單一牌局：正規化 + 底池計算 + recommend_action，不呼叫 LLM。
+    欄位不足時拋出 ValueError。
+    """
+    pool = pool or get_engine_pool()
+    features = normalize_poker_features(dict(raw_state))
+    return pool.recommend_action(features)
+
+
+def evaluate_spots(spots: List[Dict[str, Any]], pool: Optional[EnginePool] = None) -> Iterator[Dict[str, Any]]:
+    """
+    批次評估，依完成順序 yield：
+    {"index", "fingerprint", "strategy" 或 "error", "elapsed_ms", "deduplicated"}
+    """
+    pool = pool or get_engine_pool()
+
+    # 1. 正規化 + 去重 (相同指紋只送一次)
+    groups: Dict[str, List[int]] = {}
+    unique: Dict[str, Dict[str, Any]] = {}
+    for index, raw_state in enumerate(spots or []):
+        started = time.perf_counter()
+        try:
+            features = normalize_poker_features(dict(raw_state or {}))
+        except ValueError as ve:
+            yield {
+                "index": index,
+                "fingerprint": None,
+                "error": str(ve),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+                "deduplicated": False,
+            }
+            continue
+        fp = spot_fingerprint(features)
+        if fp not in groups:
+            groups[fp] = []
+            unique[fp] = features
+        groups[fp].append(index)
+
+    def _fan_out(fp: str, result: Dict[str, Any], elapsed: float, error: Optional[str]) -> Iterator[Dict[str, Any]]:
+        for n, index in enumerate(groups[fp]):
+            item = {
+                "index": index,
+                "fingerprint": fp,
+                "elapsed_ms": round(elapsed * 1000, 3),
+                "deduplicated": n > 0,
+            }
+            if error is None:
+                item["strategy"] = result
+            else:
+                item["error"] = error
+            yield item
+
+    # 2a. 未開 pool：逐一運算，算完一題就回傳一題
+    if not pool.enabled:
+        for fp, features in unique.items():
+            started = time.perf_counter()
+            try:
+                result, error = pool.recommend_action(features), None
+            except Exception as e:
+                result, error = None, str(e)
+            yield from _fan_out(fp, result, time.perf_counter() - started, error)
+        return
+
+    # 2b. Pool：全部送出，依完成順序回傳 (elapsed 含排隊時間)
+    submitted_at: Dict[Any, float] = {}
+    finished_at: Dict[Any, float] = {}
+    pending = {}
+    for fp, features in unique.items():
+        started = time.perf_counter()
+        future = pool.submit(features)
+        submitted_at[future] = started
+        future.add_done_callback(lambda f: finished_at.setdefault(f, time.perf_counter()))
+        pending[future] = fp
+
+    for future in as_completed(pending):
+        fp = pending[future]
+        elapsed = finished_at.get(future, time.perf_counter()) - submitted_at[future]
+        try:
+            result, error = future.result(), None
+        except Exception as e:
+            result, error = None, str(e)
+        yield from _fan_out(fp, result, elapsed, error)
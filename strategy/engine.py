@@ -1,7 +1,13 @@
 # strategy/engine.py
 from typing import Dict, Any, Optional
+import os
 import traceback
 
+from core.metrics import RECOMMEND_SECONDS, ERRORS, HOT_PATH
+
+# 開啟後，每次結果的 math_data 會附上 hot_path (該次請求的熱點計數)
+ENGINE_DEBUG = os.getenv("ENGINE_DEBUG", "").strip().lower() in {"1", "true", "yes", "on"}
+
 # 1. 引入核心配置
 from core.config import RANKS, SUITS
 
@@ -27,6 +33,14 @@ def recommend_action(features: Dict[str, Any]) -> Dict[str, Any]:
     """
     策略總入口：負責基礎分析，然後將控制權轉交給對應的街道模組。
     """
+    street = str(features.get("street") or "preflop").lower()
+    with RECOMMEND_SECONDS.time(street=street), HOT_PATH.scope() as counts:
+        result = _recommend_action(features)
+        if ENGINE_DEBUG and isinstance(result.get("math_data"), dict):
+            result["math_data"]["hot_path"] = HOT_PATH.report(counts)
+        return result
+
+def _recommend_action(features: Dict[str, Any]) -> Dict[str, Any]:
     try:
         street = features.get("street", "preflop").lower()
         
@@ -69,6 +83,7 @@ def recommend_action(features: Dict[str, Any]) -> Dict[str, Any]:
 
     except Exception as e:
         traceback.print_exc()
+        ERRORS.inc(phase="engine")
         return _error_fallback(str(e), features)
 
 def _error_fallback(msg: str, ctx: Dict) -> Dict:
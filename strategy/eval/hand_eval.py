@@ -2,6 +2,8 @@
 from typing import List, Tuple, Optional
 from collections import Counter
 
+from core.metrics import HOT_PATH
+
 try:
     from features import RANK_VALUE
 except ImportError:
@@ -78,6 +80,7 @@ def calculate_hand_strength(hero_hole: List[str], board: List[str]) -> Tuple[str
     分析手牌與公牌，回傳 (category, details)
     例如: ("set", "top_set"), ("draw", "flush_draw")
     """
+    HOT_PATH.add("hand_strength_calls")
     if not hero_hole:
         return "air", "no_cards"
 
@@ -288,3 +288,18 @@ def format_output(
     }
     if size_details: res["size_details"] = size_details
     return res
+
+
+def prune_strategy_output(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    長期保存用 (session.last_strategy)：advantage_data 內的 hero/villain_summary
+    與 math_data 的範圍摘要重複，只保留一份。
+    """
+    if not isinstance(result, dict):
+        return result
+    context = result.get("context")
+    adv = context.get("advantage_data") if isinstance(context, dict) else None
+    if not isinstance(adv, dict) or not ({"hero_summary", "villain_summary"} & adv.keys()):
+        return result
+    slim_adv = {k: v for k, v in adv.items() if k not in ("hero_summary", "villain_summary")}
+    return {**result, "context": {**context, "advantage_data": slim_adv}}
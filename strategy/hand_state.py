@@ -0,0 +1,322 @@
+# strategy/hand_state.py
+"""
+HandState：單次走訪行動序列，同時算出底池、各街投入、剩餘籌碼、跟注額、SPR、
+all-in 上限與翻前主動方。每條街結束時留下快照，後續可直接取用而不必重播。
+
+取代原本各自重播一次、規則略有不同的三段邏輯
+(normalize_poker_features 內的 _resolve_amounts_and_stacks、compute_pot_bb、compute_amount_to_call)。
+統一後的規則：
+  - 盲注一律計入底池 (SB/BB 不在單挑中時視為死錢)。
+  - 比例下注 (pot_ratio / "75%") 以當下底池 (含盲注) 換算。
+  - 下注、加注、跟注都不會超過玩家剩餘籌碼 (未知籌碼的玩家不設上限)。
+  - all-in 未給金額、或下注超過籌碼時，實際金額會寫回 action["amount"]，
+    讓後續的缺欄位檢查與 Engine 看到同一個數字。
+"""
+from __future__ import annotations
+
+import json
+import hashlib
+from typing import Dict, Any, List, Optional, Iterable
+
+from core.parser import normalize_action_token, resolve_amount
+from core.metrics import HOT_PATH
+
+STREETS = ("preflop", "flop", "turn", "river")
+
+_AGGRESSIVE = {"open", "bet", "raise", "limp"}
+_UNLIMITED = float("inf")
+
+
+def _iter_street_actions(actions: Dict[str, Any], street: str) -> List[Dict[str, Any]]:
+    if not isinstance(actions, dict):
+        return []
+    items = actions.get(street, [])
+    if not isinstance(items, list):
+        return []
+    return [item for item in items if isinstance(item, dict)]
+
+
+def street_signature(items: List[Dict[str, Any]]) -> str:
+    """一條街行動的指紋 (玩家、行動、金額欄位)；用來找出使用者修改的第一條街。"""
+    compact = [{k: v for k, v in item.items() if k != "street"} for item in items]
+    raw = json.dumps(compact, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+class HandState:
+    """
+    state = HandState.replay(actions, {"BTN": 100, "BB": 100})
+    state.pot_bb, state.to_call("BB", "flop"), state.spr("BTN"), state.snapshots["flop"]
+    """
+
+    def __init__(self, stacks: Optional[Dict[str, Any]] = None, small_blind: float = 0.5, big_blind: float = 1.0):
+        self.starting_stacks: Dict[str, float] = {
+            str(k).upper(): float(v) for k, v in (stacks or {}).items() if v is not None
+        }
+        self.small_blind = float(small_blind)
+        self.big_blind = float(big_blind)
+        self.pot = 0.0
+        self.total_contrib: Dict[str, float] = {}
+        self.street: Optional[str] = None
+        self.street_contrib: Dict[str, float] = {}
+        self.street_max = 0.0
+        self.preflop_aggressor: Optional[str] = None
+        self.last_aggressor: Optional[str] = None
+        self.all_in: set = set()
+        self.action_count = 0
+        self.snapshots: Dict[str, Dict[str, Any]] = {}
+        self.signatures: Dict[str, str] = {}
+        self.reused_streets: List[str] = []
+
+    # ------------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------------
+    def remaining(self, player: str) -> float:
+        player = str(player).upper()
+        start = self.starting_stacks.get(player)
+        if start is None:
+            return _UNLIMITED
+        return max(start - self.total_contrib.get(player, 0.0), 0.0)
+
+    def stacks(self) -> Dict[str, float]:
+        """已知籌碼玩家的目前剩餘籌碼。"""
+        return {p: self.remaining(p) for p in self.starting_stacks}
+
+    def to_call(self, player: str, street: Optional[str] = None) -> float:
+        """player 在該街 (預設為目前這條街) 結束時還需要跟多少，不超過其剩餘籌碼。"""
+        player = str(player).upper()
+        if street and street != self.street:
+            snap = self.snapshots.get(street)
+            if snap is None:
+                return 0.0
+            owed = snap["street_max"] - snap["contrib"].get(player, 0.0)
+            remaining = snap["stacks"].get(player, _UNLIMITED)
+        else:
+            owed = self.street_max - self.street_contrib.get(player, 0.0)
+            remaining = self.remaining(player)
+        return round(max(min(owed, remaining), 0.0), 2)
+
+    def spr(self, player: str) -> float:
+        if self.pot <= 0:
+            return 100.0
+        remaining = self.remaining(player)
+        return (remaining if remaining != _UNLIMITED else 0.0) / self.pot
+
+    def all_in_cap(self, player: str, opponent: str) -> float:
+        """player 還能投入且會被對手跟到的最大金額 (有效籌碼，含本街已下注額)。"""
+        mine = self.remaining(player) + self.street_contrib.get(str(player).upper(), 0.0)
+        theirs = self.remaining(opponent) + self.street_contrib.get(str(opponent).upper(), 0.0)
+        cap = min(mine, theirs)
+        return round(cap, 2) if cap != _UNLIMITED else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "street": self.street,
+            "pot": round(self.pot, 2),
+            "contrib": dict(self.street_contrib),
+            "total_contrib": dict(self.total_contrib),
+            "street_max": self.street_max,
+            "stacks": self.stacks(),
+            "preflop_aggressor": self.preflop_aggressor,
+            "last_aggressor": self.last_aggressor,
+            "all_in": sorted(self.all_in),
+            "action_count": self.action_count,
+            "signature": self.signatures.get(self.street),
+        }
+
+    @property
+    def cache_key(self) -> List[Any]:
+        """快照只在盲注與起始籌碼都相同時才能沿用。"""
+        return [self.small_blind, self.big_blind, sorted([p, s] for p, s in self.starting_stacks.items())]
+
+    def export(self) -> Dict[str, Any]:
+        """可 JSON 序列化的各街快照 (features["street_snapshots"])；伺服器把它留在 session 的 GameState 供下一輪沿用。"""
+        return {"key": self.cache_key, "stacks": dict(self.starting_stacks), "streets": dict(self.snapshots)}
+
+    @staticmethod
+    def exported_stacks(previous: Optional[Dict[str, Any]]) -> Dict[str, float]:
+        """export() 記錄的起始籌碼 (features 的 hero/villain_stack_bb 是重播後的剩餘籌碼，不能當起始值)。"""
+        stacks = previous.get("stacks") if isinstance(previous, dict) else None
+        return dict(stacks) if isinstance(stacks, dict) else {}
+
+    def _restore(self, snap: Dict[str, Any]) -> None:
+        """直接還原到某條街結束時的狀態 (不重播該街行動)。"""
+        self.street = snap["street"]
+        self.pot = float(snap["pot"])
+        self.street_contrib = dict(snap["contrib"])
+        self.total_contrib = dict(snap["total_contrib"])
+        self.street_max = float(snap["street_max"])
+        self.preflop_aggressor = snap.get("preflop_aggressor")
+        self.last_aggressor = snap.get("last_aggressor")
+        self.all_in = set(snap.get("all_in") or [])
+        self.action_count = int(snap.get("action_count") or 0)
+        self.signatures[self.street] = snap.get("signature")
+        self.snapshots[self.street] = dict(snap)
+
+    # ------------------------------------------------------------------
+    # Reducer
+    # ------------------------------------------------------------------
+    def _commit(self, player: str, amount: float) -> None:
+        self.pot += amount
+        self.street_contrib[player] = self.street_contrib.get(player, 0.0) + amount
+        self.total_contrib[player] = self.total_contrib.get(player, 0.0) + amount
+        if self.remaining(player) <= 0:
+            self.all_in.add(player)
+
+    def start_street(self, street: str) -> None:
+        if self.street is not None:
+            self.snapshots[self.street] = self.snapshot()
+        self.street = street
+        self.street_contrib = {}
+        self.street_max = 0.0
+        self.last_aggressor = None
+        if street == "preflop":
+            for player, blind in (("SB", self.small_blind), ("BB", self.big_blind)):
+                self._commit(player, min(blind, self.remaining(player)))
+            self.street_max = max(self.small_blind, self.big_blind)
+
+    def apply(self, item: Dict[str, Any]) -> Optional[float]:
+        """套用一個行動，回傳實際投入的增量 (fold/check 為 None)。"""
+        player = str(item.get("player", "")).upper()
+        act = normalize_action_token(item.get("action", ""))
+        if not player or act in {"", "fold", "check"}:
+            return None
+        self.action_count += 1
+
+        amount = resolve_amount(item, self.pot, self.big_blind)
+        prev = self.street_contrib.get(player, 0.0)
+        can_pay = self.remaining(player)
+
+        if act == "call":
+            required = max(self.street_max - prev, 0.0)
+            amount = required if amount is None else min(amount, required)
+            amount = min(amount, can_pay)
+            self._commit(player, amount)
+            return amount
+
+        if act not in _AGGRESSIVE:
+            return None
+
+        if amount is None and item.get("is_all_in") and can_pay != _UNLIMITED:
+            amount = prev + can_pay
+            item["amount"] = round(amount, 2)
+        if amount is None:
+            amount = self.big_blind if act == "limp" else 0.0
+        if amount - prev > can_pay:
+            amount = prev + can_pay
+            item["amount"] = round(amount, 2)
+
+        increment = max(amount - prev, 0.0)
+        if increment > 0:
+            self._commit(player, increment)
+        if self.street_contrib.get(player, 0.0) > self.street_max:
+            self.street_max = self.street_contrib[player]
+            if act != "limp":
+                self.last_aggressor = player
+                if self.street == "preflop":
+                    self.preflop_aggressor = player
+        return increment
+
+    def finish(self) -> "HandState":
+        if self.street is not None:
+            self.snapshots[self.street] = self.snapshot()
+        return self
+
+    @classmethod
+    def replay(
+        cls,
+        actions: Dict[str, Any],
+        stacks: Optional[Dict[str, Any]] = None,
+        small_blind: float = 0.5,
+        big_blind: float = 1.0,
+        streets: Iterable[str] = STREETS,
+        previous: Optional[Dict[str, Any]] = None,
+    ) -> "HandState":
+        """
+        依序走過各街 (即使該街沒有行動也會留下快照)。
+        previous 為上一輪的 export()：從第一條行動有變動的街開始重播，之前的街直接還原快照。
+        """
+        state = cls(stacks, small_blind, big_blind)
+        cached = {}
+        if isinstance(previous, dict) and previous.get("key") == state.cache_key:
+            cached = previous.get("streets") or {}
+
+        for street in streets:
+            items = _iter_street_actions(actions, street)
+            signature = street_signature(items)
+            snap = cached.get(street)
+            if snap and snap.get("signature") == signature:
+                state._restore(snap)
+                state.reused_streets.append(street)
+                HOT_PATH.add("pot_snapshot_cache_hits")
+                continue
+            if cached:
+                HOT_PATH.add("pot_snapshot_cache_misses")
+            cached = {}  # 這條街之後都要重算
+            state.start_street(street)
+            state.signatures[street] = signature
+            for item in items:
+                state.apply(item)
+        return state.finish()
+
+    @property
+    def pot_bb(self) -> float:
+        return round(self.pot, 2)
+
+
+# ------------------------------------------------------------------
+# 快照沿用檢查：python -m strategy.hand_state
+# ------------------------------------------------------------------
+_CHECK_ACTIONS = {
+    "preflop": [{"player": "BTN", "action": "open", "amount": 2.5}, {"player": "BB", "action": "call"}],
+    "flop": [{"player": "BB", "action": "check"}, {"player": "BTN", "action": "bet", "amount": 3},
+             {"player": "BB", "action": "call"}],
+    "turn": [{"player": "BB", "action": "check"}, {"player": "BTN", "action": "bet", "amount": 6}],
+}
+
+
+def check_snapshot_reuse() -> List[str]:
+    """
+    模擬 /chat 的追問流程 (上一輪 features 當作 current_state)：
+    行動不變時所有街都沿用快照；只改轉牌下注時翻前與翻牌沿用、結果與完整重播相同。回傳錯誤訊息。
+    """
+    import copy
+    from features.context import normalize_poker_features  # features 依賴 strategy，只在檢查時載入
+
+    def run(data, current_state=None):
+        with HOT_PATH.scope() as counts:
+            features = normalize_poker_features(data, current_state)
+        return features, counts.get("pot_snapshot_cache_hits", 0)
+
+    base = {
+        "hero_position": "BB", "villain_position": "BTN",
+        "hero_hole_cards": ["Ah", "Kd"], "board_cards": ["7s", "8d", "2c", "Jh"],
+    }
+    edited = copy.deepcopy(_CHECK_ACTIONS)
+    edited["turn"][1]["amount"] = 9
+    first, _ = run(dict(base, actions=copy.deepcopy(_CHECK_ACTIONS)))
+    again, reused = run({"actions": copy.deepcopy(_CHECK_ACTIONS)}, first)
+    changed, reused_after_edit = run({"actions": copy.deepcopy(edited)}, again)
+    fresh, _ = run(dict(base, actions=copy.deepcopy(edited)))
+
+    errors = []
+    keys = [f["street_snapshots"]["key"] for f in (first, again)]
+    if keys[0] != keys[1]:
+        errors.append(f"追問的 cache_key 不同: {keys[0]} -> {keys[1]}")
+    if reused != len(STREETS):
+        errors.append(f"行動不變卻重播: 沿用 {reused}/{len(STREETS)} 條街")
+    if reused_after_edit != 2:
+        errors.append(f"修改轉牌後應沿用 preflop/flop: 沿用 {reused_after_edit} 條街")
+    for key in ("pot_bb", "amount_to_call", "hero_stack_bb", "villain_stack_bb", "spr"):
+        if changed.get(key) != fresh.get(key):
+            errors.append(f"{key}: 沿用快照 {changed.get(key)} != 完整重播 {fresh.get(key)}")
+    return errors
+
+
+if __name__ == "__main__":
+    problems = check_snapshot_reuse()
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ 追問沿用所有街的快照，修改轉牌後沿用翻前/翻牌且結果與完整重播相同")
+    raise SystemExit(1 if problems else 0)
@@ -0,0 +1,187 @@
+# strategy/pool.py
+"""
+Engine Process Pool：讓 recommend_action 在多個行程中執行，避開 GIL。
+策略引擎是純 Python 的 CPU 運算，thread 之間會互相卡住；
+開啟 ENGINE_WORKERS 後，每個 worker 預先載入 RANGE_ANALYZER 與範圍表
+(range_tables.bin 由主行程先確認為最新，worker 以 mmap 共用同一份 page)，
+並只接收精簡序列化後的 features。
+"""
+from __future__ import annotations
+
+import os
+import json
+import atexit
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional, Tuple, List
+
+from core.metrics import REGISTRY, recording
+
+# 0 = 不開 pool，直接在呼叫端 thread 執行 (預設，與舊行為相同)
+ENGINE_WORKERS = int(os.getenv("ENGINE_WORKERS", "0") or 0)
+
+# Engine 實際會讀取的 features 欄位，其餘 (math_data、advantage_data 等) 不需送進 worker
+ENGINE_FEATURE_KEYS = (
+    "street",
+    "hero_position",
+    "villain_position",
+    "hero_pos",
+    "villain_pos",
+    "hero_hole_cards",
+    "hero_cards",
+    "board_cards",
+    "actions",
+    "pot_bb",
+    "amount_to_call",
+    "hero_stack_bb",
+    "hero_is_ip",
+    "villain_action",
+    "is_3bet_pot",
+    "hero_range",
+    "villain_range",
+)
+
+
+def serialize_features(features: Dict[str, Any]) -> str:
+    """只保留 Engine 需要的欄位，壓成緊湊 JSON 字串以降低 IPC 成本。"""
+    compact = {k: features[k] for k in ENGINE_FEATURE_KEYS if k in features}
+    return json.dumps(compact, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def deserialize_features(payload: str) -> Dict[str, Any]:
+    return json.loads(payload) if payload else {}
+
+
+def _warm_worker() -> None:
+    """Worker initializer：預先建立 1326 combos 並 mmap 範圍表，第一個請求不必再付啟動成本。"""
+    from .ranges.range import RANGE_ANALYZER, RFI_RANGES, FACING_OPEN, FACING_3BET  # noqa: F401
+    from .ranges.range_tables import get_range_tables
+    from . import engine  # noqa: F401
+
+    RANGE_ANALYZER.get_hand_combos("AA")
+    get_range_tables()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _run_serialized(payload: str) -> Tuple[Dict[str, Any], List[Any]]:
+    """Worker 端執行；一併回傳這次呼叫的指標觀測值，交由主行程 replay 到 /metrics。"""
+    from .engine import recommend_action
+    with recording() as events:
+        result = recommend_action(deserialize_features(payload))
+    return result, list(events)
+
+
+def _unwrap(inner: Future, outer: Future) -> None:
+    try:
+        result, events = inner.result()
+    except BaseException as e:
+        outer.set_exception(e)
+        return
+    REGISTRY.replay(events)
+    outer.set_result(result)
+
+
+class EnginePool:
+    """
+    recommend_action 的執行器。
+    workers <= 0 時直接在目前 thread 執行；否則交給 ProcessPoolExecutor。
+    """
+
+    def __init__(self, workers: int = ENGINE_WORKERS):
+        self.workers = max(int(workers or 0), 0)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def start(self) -> None:
+        if not self.enabled or self._executor is not None:
+            return
+        with self._lock:
+            self._ensure_executor()
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        """持有 _lock 時呼叫：尚未啟動、已關閉或已損毀 (被丟棄) 時建立新的 executor。"""
+        if self._executor is not None:
+            return self._executor
+        # 範圍表過期時只由主行程重建一次，worker 直接 mmap
+        from .ranges.range_tables import get_range_tables
+        get_range_tables()
+        executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        # 讓每個 worker 都先跑過 initializer，避免第一批請求吃到冷啟動
+        for f in [executor.submit(_ping) for _ in range(self.workers)]:
+            f.result()
+        self._executor = executor
+        print(f"⚙️ Engine pool ready ({self.workers} workers)")
+        return executor
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        """持有 _lock 時呼叫：worker 異常結束 (BrokenProcessPool) 後整個 executor 都不能再用，下一次 submit 重建。"""
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            print("⚠️ Engine worker 異常結束，下一次請求時重建 pool")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def submit(self, features: Dict[str, Any]) -> Future:
+        if not self.enabled:
+            future: Future = Future()
+            try:
+                from .engine import recommend_action
+                future.set_result(recommend_action(features))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        payload = serialize_features(features)
+        outer: Future = Future()
+        # 取得 executor 與送出都在 _lock 內，shutdown() 不會在中間把 executor 清掉
+        with self._lock:
+            executor = self._ensure_executor()
+            try:
+                inner = executor.submit(_run_serialized, payload)
+            except BrokenProcessPool:
+                self._discard(executor)
+                executor = self._ensure_executor()
+                inner = executor.submit(_run_serialized, payload)
+        inner.add_done_callback(lambda f: self._finish(f, outer, executor))
+        return outer
+
+    def _finish(self, inner: Future, outer: Future, executor: ProcessPoolExecutor) -> None:
+        if not inner.cancelled() and isinstance(inner.exception(), BrokenProcessPool):
+            with self._lock:
+                self._discard(executor)
+        _unwrap(inner, outer)
+
+    def recommend_action(self, features: Dict[str, Any]) -> Dict[str, Any]:
+        return self.submit(features).result()
+
+
+_POOL: Optional[EnginePool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_engine_pool() -> EnginePool:
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = EnginePool(ENGINE_WORKERS)
+                atexit.register(_POOL.shutdown)
+    return _POOL
+
+
+def recommend_action_pooled(features: Dict[str, Any]) -> Dict[str, Any]:
+    """與 strategy.engine.recommend_action 相同介面，依 ENGINE_WORKERS 決定是否走 process pool。"""
+    return get_engine_pool().recommend_action(features)
@@ -1,2 +1,4 @@
 from .range_data import RFI_RANGES, FACING_OPEN, FACING_3BET  # re-export
 from .range import RANGE_ANALYZER  # re-export
+from .range_tables import get_range_tables  # re-export
+from .notation import parse_range  # re-export
@@ -0,0 +1,134 @@
+# strategy/ranges/bitset.py
+"""
+範圍的 bitset 形式：Python int 的第 i 個 bit = combos.COMBOS[i] 是否在範圍內 (不含權重)。
+聯集/交集/差集直接用 | & & ~，數量用 popcount；不必逐 combo 建 dict。
+
+    calls = tables.bits("facing_open/BB/BTN/call")
+    both = calls & tables.bits("facing_open/BB/BTN/3bet")   # 同時在兩個列表的 combos
+    live = calls & ~dead_mask({"Ks", "7d", "2c"})            # 扣掉死牌後剩下的 combos (CARD_MASKS 做 OR)
+    popcount(live)
+
+與權重陣列互轉：from_weights / to_weights；需要 ComboRange dict 時才用 to_combo_range 展開。
+"""
+from __future__ import annotations
+
+from array import array
+from functools import reduce
+from itertools import compress
+from operator import or_, and_
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from .combos import COMBOS, COMBO_INDEX, HAND_CODES, HAND_SLICES, NUM_COMBOS, Combo, empty_weights
+
+EMPTY = 0
+FULL = (1 << NUM_COMBOS) - 1
+
+# 手牌代碼 -> 該手牌所有 combos 的 bits (同一手牌的 combos 在 COMBOS 內連續)
+HAND_MASKS: Dict[str, int] = {
+    code: ((1 << (HAND_SLICES[code][1] - HAND_SLICES[code][0])) - 1) << HAND_SLICES[code][0]
+    for code in HAND_CODES
+}
+
+# bin() 的 "0"/"1" 轉成 compress 用的 0/1 bytes
+_FLAGS = bytes.maketrans(b"01", b"\x00\x01")
+
+
+def popcount(bits: int) -> int:
+    return bin(bits).count("1")
+
+
+if hasattr(int, "bit_count"):  # Python 3.10+
+    popcount = int.bit_count  # noqa: F811
+
+
+def union(*bitsets: int) -> int:
+    return reduce(or_, bitsets, EMPTY)
+
+
+def intersection(*bitsets: int) -> int:
+    return reduce(and_, bitsets, FULL)
+
+
+def difference(bits: int, *others: int) -> int:
+    return bits & ~union(*others)
+
+
+def contains(bits: int, combo: Combo) -> bool:
+    i = COMBO_INDEX.get(tuple(sorted(combo)))
+    return i is not None and bool(bits >> i & 1)
+
+
+def flags(bits: int) -> bytes:
+    """1326 個 0/1 bytes (第 i 個 = bit i)，給 itertools.compress 篩選 COMBOS 順序的序列。"""
+    return format(bits & FULL, f"0{NUM_COMBOS}b")[::-1].encode().translate(_FLAGS)
+
+
+def iter_indices(bits: int) -> Iterator[int]:
+    return compress(range(NUM_COMBOS), flags(bits))
+
+
+# ------------------------------------------------------------------
+# 轉換
+# ------------------------------------------------------------------
+def from_weights(weights: Sequence[float], threshold: float = 0.0) -> int:
+    """權重 > threshold 的 combos。"""
+    return int("".join("1" if w > threshold else "0" for w in reversed(weights)) or "0", 2)
+
+
+def to_weights(bits: int, weights: Optional[Sequence[float]] = None, weight: float = 1.0) -> array:
+    """bits 內的 combos 取 weights 的值 (未提供時一律為 weight)，其餘為 0。"""
+    out = empty_weights()
+    if weights is None:
+        for i in iter_indices(bits):
+            out[i] = weight
+    else:
+        for i in iter_indices(bits):
+            out[i] = weights[i]
+    return out
+
+
+def from_hands(codes: Iterable[str]) -> int:
+    return union(*(HAND_MASKS[code] for code in codes if code in HAND_MASKS))
+
+
+def from_combos(combos: Iterable[Combo]) -> int:
+    bits = EMPTY
+    for combo in combos:
+        i = COMBO_INDEX.get(combo)
+        if i is None:
+            i = COMBO_INDEX.get(tuple(sorted(combo)))
+        if i is not None:
+            bits |= 1 << i
+    return bits
+
+
+def to_combos(bits: int) -> List[Combo]:
+    return list(compress(COMBOS, flags(bits)))
+
+
+def to_combo_range(bits: int, weights: Sequence[float]) -> Dict[Combo, float]:
+    """bits 內且權重不為 0 的 combos → ComboRange dict (COMBOS 順序)。"""
+    return {c: w for c, w in compress(zip(COMBOS, weights), flags(bits)) if w}
+
+
+# ------------------------------------------------------------------
+# 死牌
+# ------------------------------------------------------------------
+def _card_masks() -> Dict[str, int]:
+    masks: Dict[str, int] = {}
+    for i, (c1, c2) in enumerate(COMBOS):
+        masks[c1] = masks.get(c1, EMPTY) | 1 << i
+        masks[c2] = masks.get(c2, EMPTY) | 1 << i
+    return masks
+
+
+# 52 張牌 -> 含該張牌的 51 個 combos
+CARD_MASKS: Dict[str, int] = _card_masks()
+
+
+def dead_mask(cards: Iterable[str]) -> int:
+    """含任一張 cards 的 combos：幾張牌的 mask 做 OR (無法辨識的牌略過，與字串比對時相同)。"""
+    bits = EMPTY
+    for card in cards or ():
+        bits |= CARD_MASKS.get(card, EMPTY)
+    return bits
@@ -0,0 +1,95 @@
+# strategy/ranges/combos.py
+"""
+1326 combos 的固定排序：所有陣列形式的範圍 (range_tables 的二進位表) 都以此為索引。
+combo 依 169 手牌矩陣順序排列，同一手牌代碼的 combos 連續存放 (HAND_SLICES)，
+combo 本身與 RangeAnalyzer 相同為排序後的 tuple，例如 ("Ad", "Ah")。
+
+排序改變時陣列內容就對不上：range_tables 的內容雜湊包含 COMBO_ORDER_KEY，舊檔會自動重建。
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Dict, List, Tuple
+
+from ..utils import SUITS
+
+# 點數由大到小：A=0 ... 2=12 (與 preflop_index 的手牌索引相同)
+RANK_ORDER = "AKQJT98765432"
+
+NUM_HANDS = 169
+NUM_COMBOS = 1326
+
+Combo = Tuple[str, str]
+
+
+def _hand_code_at(row: int, col: int) -> str:
+    """13×13 矩陣：對角線為對子，右上 (row < col) 為同花，左下為不同花。"""
+    hi, lo = RANK_ORDER[min(row, col)], RANK_ORDER[max(row, col)]
+    if row == col:
+        return hi + lo
+    return f"{hi}{lo}s" if row < col else f"{hi}{lo}o"
+
+
+def _hand_combos(code: str) -> List[Combo]:
+    """與 RangeAnalyzer 原本的展開順序相同 (花色依 SUITS 順序)。"""
+    hi, lo = code[0], code[1]
+    if len(code) == 2:
+        return [
+            tuple(sorted((hi + SUITS[a], hi + SUITS[b])))
+            for a in range(len(SUITS)) for b in range(a + 1, len(SUITS))
+        ]
+    suited = code[2] == "s"
+    return [
+        tuple(sorted((hi + s1, lo + s2)))
+        for s1 in SUITS for s2 in SUITS
+        if (s1 == s2) == suited
+    ]
+
+
+HAND_CODES: List[str] = [_hand_code_at(i // 13, i % 13) for i in range(NUM_HANDS)]
+HAND_INDEX: Dict[str, int] = {code: i for i, code in enumerate(HAND_CODES)}
+
+HAND_COMBOS: Dict[str, List[Combo]] = {code: _hand_combos(code) for code in HAND_CODES}
+COMBOS: List[Combo] = [combo for code in HAND_CODES for combo in HAND_COMBOS[code]]
+COMBO_INDEX: Dict[Combo, int] = {combo: i for i, combo in enumerate(COMBOS)}
+COMBO_HAND: List[str] = [code for code in HAND_CODES for _ in HAND_COMBOS[code]]
+
+# 手牌代碼 -> COMBOS 內的 [start, stop)
+HAND_SLICES: Dict[str, Tuple[int, int]] = {}
+_start = 0
+for _code in HAND_CODES:
+    HAND_SLICES[_code] = (_start, _start + len(HAND_COMBOS[_code]))
+    _start += len(HAND_COMBOS[_code])
+del _start, _code
+
+# 排序的指紋 (寫進二進位表的雜湊)
+COMBO_ORDER_KEY = ",".join(a + b for a, b in COMBOS)
+
+
+def empty_weights() -> array:
+    return array("d", bytes(8 * NUM_COMBOS))
+
+
+def weights_from_hands(weighted: Dict[str, float]) -> array:
+    """{hand_code: weight} -> 1326 權重陣列 (未知的手牌代碼略過)。"""
+    out = empty_weights()
+    for code, weight in weighted.items():
+        span = HAND_SLICES.get(code)
+        if span is None:
+            continue
+        for i in range(*span):
+            out[i] = float(weight)
+    return out
+
+
+def weights_from_combos(combo_range: Dict[Combo, float]) -> array:
+    """ComboRange dict -> 1326 權重陣列。"""
+    out = empty_weights()
+    for combo, weight in combo_range.items():
+        i = COMBO_INDEX.get(combo)
+        if i is None:
+            i = COMBO_INDEX.get(tuple(sorted(combo)))
+        if i is not None:
+            out[i] = weight
+    return out
+
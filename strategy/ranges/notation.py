@@ -0,0 +1,122 @@
+# strategy/ranges/notation.py
+"""
+範圍字串解析：常見的範圍簡寫 → 1326 權重陣列 (combos.COMBOS 順序，與 range_tables 的表相同)。
+
+    weights = parse_range("22+, A2s+, KTo+, 76s:0.5")
+    hero_range, villain_range = apply_action_history_to_ranges(features, board, villain_range=weights)
+
+語法 (以逗號分隔；同一個 combo 出現多次時以後面的權重為準)：
+    QQ / AKs / AKo / AK        單一手牌 (AK = AKs + AKo)
+    22+ / A2s+ / KTo+ / AT+    對子往上到 AA；非對子固定高張，踢腳往上到高張的下一張
+    TT-77 / A5s-A2s / KQo-KTo  區間 (兩端皆含，順序不拘)
+    AhKh / 7s6d                指定花色的單一 combo
+    76s:0.5 / 76s:50%          權重 (0~1，預設 1；0 表示移除)
+
+解析失敗丟出 ValueError。結果依字串快取，回傳共用的唯讀 memoryview，呼叫端不可修改。
+"""
+from __future__ import annotations
+
+import os
+from array import array
+from functools import lru_cache
+from typing import List, Tuple
+
+from ..utils import SUITS
+from .combos import RANK_ORDER, HAND_SLICES, COMBO_INDEX, empty_weights
+
+# 不同範圍字串的快取數
+RANGE_NOTATION_CACHE_SIZE = int(os.getenv("RANGE_NOTATION_CACHE_SIZE", "256") or 256)
+
+# 2=0 ... A=12
+_RANK_VALUE = {r: len(RANK_ORDER) - 1 - i for i, r in enumerate(RANK_ORDER)}
+_VALUE_RANK = {v: r for r, v in _RANK_VALUE.items()}
+
+Hand = Tuple[int, int, str]  # (高張, 低張, "s" / "o" / "" = 兩者皆是)
+
+
+def _parse_hand(text: str, token: str) -> Hand:
+    if len(text) not in (2, 3):
+        raise ValueError(f"無法解析的範圍: {token!r}")
+    r1, r2 = _RANK_VALUE.get(text[0].upper()), _RANK_VALUE.get(text[1].upper())
+    kind = text[2].lower() if len(text) == 3 else ""
+    if r1 is None or r2 is None or kind not in ("", "s", "o"):
+        raise ValueError(f"無法解析的範圍: {token!r}")
+    if r1 == r2 and kind:
+        raise ValueError(f"對子不能標示同花/不同花: {token!r}")
+    return max(r1, r2), min(r1, r2), kind
+
+
+def _hand_codes(hi: int, lo: int, kind: str) -> List[str]:
+    code = _VALUE_RANK[hi] + _VALUE_RANK[lo]
+    if hi == lo:
+        return [code]
+    return [code + k for k in (kind or "so")]
+
+
+def _expand_hands(body: str, token: str) -> List[str]:
+    """手牌簡寫 (不含權重) → 手牌代碼。"""
+    if "-" in body:
+        left, right = body.split("-", 1)
+        a, b = _parse_hand(left, token), _parse_hand(right, token)
+        if a[0] == a[1] and b[0] == b[1]:
+            lo, hi = sorted((a[0], b[0]))
+            return [code for v in range(lo, hi + 1) for code in _hand_codes(v, v, "")]
+        if a[0] != b[0] or a[2] != b[2] or a[0] == a[1] or b[0] == b[1]:
+            raise ValueError(f"區間兩端須為同一高張、同一種類: {token!r}")
+        lo, hi = sorted((a[1], b[1]))
+        return [code for k in range(lo, hi + 1) for code in _hand_codes(a[0], k, a[2])]
+
+    if body.endswith("+"):
+        hi, lo, kind = _parse_hand(body[:-1], token)
+        if hi == lo:
+            return [code for v in range(lo, _RANK_VALUE["A"] + 1) for code in _hand_codes(v, v, "")]
+        return [code for k in range(lo, hi) for code in _hand_codes(hi, k, kind)]
+
+    return _hand_codes(*_parse_hand(body, token))
+
+
+def _combo_index(body: str, token: str) -> int:
+    c1, c2 = body[0].upper() + body[1].lower(), body[2].upper() + body[3].lower()
+    if c1 == c2 or c1[0] not in _RANK_VALUE or c2[0] not in _RANK_VALUE:
+        raise ValueError(f"無法解析的 combo: {token!r}")
+    return COMBO_INDEX[tuple(sorted((c1, c2)))]
+
+
+def _parse_weight(text: str, token: str) -> float:
+    try:
+        weight = float(text[:-1]) / 100 if text.endswith("%") else float(text)
+    except ValueError:
+        raise ValueError(f"無法解析的權重: {token!r}") from None
+    if not 0.0 <= weight <= 1.0:
+        raise ValueError(f"權重須介於 0 與 1: {token!r}")
+    return weight
+
+
+def _token_indices(body: str, token: str) -> List[int]:
+    if len(body) == 4 and body[1].lower() in SUITS and body[3].lower() in SUITS:
+        return [_combo_index(body, token)]
+    indices: List[int] = []
+    for code in _expand_hands(body, token):
+        indices.extend(range(*HAND_SLICES[code]))
+    return indices
+
+
+@lru_cache(maxsize=RANGE_NOTATION_CACHE_SIZE)
+def _compile(text: str) -> memoryview:
+    weights: array = empty_weights()
+    for token in text.split(","):
+        token = "".join(token.split())
+        if not token:
+            continue
+        body, _, weight_text = token.partition(":")
+        weight = _parse_weight(weight_text, token) if weight_text else 1.0
+        for i in _token_indices(body, token):
+            weights[i] = weight
+    return memoryview(weights).toreadonly()
+
+
+def parse_range(text: str) -> memoryview:
+    """範圍字串 → 1326 權重 (唯讀 memoryview)；同一字串第二次之後直接取快取。"""
+    if not isinstance(text, str):
+        raise ValueError(f"範圍必須是字串: {text!r}")
+    return _compile(text.strip())
@@ -0,0 +1,109 @@
+# strategy/ranges/preflop_index.py
+"""
+Preflop 決策索引：import 時把 range_data 的翻前表一次編譯成扁平 list，
+位置 = ((scenario × 6 + hero) × 7 + villain) × 169 + 手牌索引 (villain 第 7 格 = 不分對手)。
+每次翻前決策只要算出手牌索引 (兩張牌的點數/花色) 再做一次 list 取值，
+不必每次重建 _build_action_map 或以字串手牌代碼查 dict。
+
+值與 get_preflop_range(...)[hand_code] 相同 (RFI 為 float，其餘為 {action: prob})，
+不在範圍內為 None。共用物件，呼叫端不可就地修改。
+"""
+from __future__ import annotations
+
+from typing import Dict, Any, List, Optional
+
+from features import canonicalize_hand
+from .range import get_preflop_range
+from .combos import RANK_ORDER, HAND_CODES, HAND_INDEX, NUM_HANDS  # noqa: F401 (re-export)
+
+_RANK_INDEX = {r: i for i, r in enumerate(RANK_ORDER)}
+
+POSITIONS = ("UTG", "HJ", "CO", "BTN", "SB", "BB")
+_POS_INDEX = {p: i for i, p in enumerate(POSITIONS)}
+_NUM_POSITIONS = len(POSITIONS)
+_NO_VILLAIN = _NUM_POSITIONS  # RFI / ISO / cold 4-bet 不分對手
+_VILLAIN_SLOTS = _NUM_POSITIONS + 1
+
+# scenario -> get_preflop_range 的 range_type；是否依對手位置區分
+SCENARIOS = ("RFI", "iso", "cold_4bet", "facing_open", "facing_3bet")
+_SCENARIO_INDEX = {s: i for i, s in enumerate(SCENARIOS)}
+_NEEDS_VILLAIN = {"facing_open", "facing_3bet"}
+
+
+def hand_index(hole_cards: Any) -> int:
+    """
+    兩張底牌 → 0..168 (-1 表示無法辨識)。
+    常見輸入 ["Ah", "Kd"] 直接以點數/花色計算；其他格式交給 canonicalize_hand。
+    """
+    if isinstance(hole_cards, (list, tuple)):
+        if len(hole_cards) == 2:
+            c1, c2 = hole_cards
+            if isinstance(c1, str) and isinstance(c2, str) and len(c1) == 2 and len(c2) == 2:
+                r1 = _RANK_INDEX.get(c1[0].upper())
+                r2 = _RANK_INDEX.get(c2[0].upper())
+                if r1 is not None and r2 is not None:
+                    if r1 == r2:
+                        return r1 * 13 + r1
+                    hi, lo = (r1, r2) if r1 < r2 else (r2, r1)
+                    if c1[1].lower() == c2[1].lower():
+                        return hi * 13 + lo
+                    return lo * 13 + hi
+        hole_cards = "".join(map(str, hole_cards))
+    return HAND_INDEX.get(canonicalize_hand(hole_cards) if hole_cards else "", -1)
+
+
+def _compile() -> List[Optional[Any]]:
+    table: List[Optional[Any]] = [None] * (len(SCENARIOS) * _NUM_POSITIONS * _VILLAIN_SLOTS * NUM_HANDS)
+    for scenario in SCENARIOS:
+        for hero in POSITIONS:
+            villains = POSITIONS if scenario in _NEEDS_VILLAIN else (None,)
+            for villain in villains:
+                entries = get_preflop_range(scenario, hero, villain)
+                if not entries:
+                    continue
+                base = _offset(scenario, hero, villain)
+                for code, value in entries.items():
+                    idx = HAND_INDEX.get(code)
+                    if idx is not None:
+                        table[base + idx] = value
+    return table
+
+
+def _offset(scenario: str, hero: str, villain: Optional[str]) -> int:
+    s = _SCENARIO_INDEX[scenario]
+    h = _POS_INDEX[hero]
+    v = _POS_INDEX[villain] if villain is not None else _NO_VILLAIN
+    return ((s * _NUM_POSITIONS + h) * _VILLAIN_SLOTS + v) * NUM_HANDS
+
+
+PREFLOP_INDEX: List[Optional[Any]] = _compile()
+
+
+def lookup(scenario: str, hero_pos: str, villain_pos: Optional[str], hand_idx: int) -> Optional[Any]:
+    """
+    scenario 為 SCENARIOS 之一；位置不在 6-max 表內或手牌無法辨識時回傳 None
+    (與 get_preflop_range 回傳空 dict 時相同，視為不在範圍內)。
+    """
+    if hand_idx < 0:
+        return None
+    h = _POS_INDEX.get(hero_pos)
+    if h is None:
+        return None
+    if scenario in _NEEDS_VILLAIN:
+        v = _POS_INDEX.get(villain_pos)
+        if v is None:
+            return None
+    else:
+        v = _NO_VILLAIN
+    s = _SCENARIO_INDEX[scenario]
+    return PREFLOP_INDEX[((s * _NUM_POSITIONS + h) * _VILLAIN_SLOTS + v) * NUM_HANDS + hand_idx]
+
+
+def scenario_range(scenario: str, hero_pos: str, villain_pos: Optional[str] = None) -> Dict[str, Any]:
+    """由索引還原成 {hand_code: value} (除錯/比對 get_preflop_range 用)。"""
+    out: Dict[str, Any] = {}
+    for idx in range(NUM_HANDS):
+        value = lookup(scenario, hero_pos, villain_pos, idx)
+        if value is not None:
+            out[HAND_CODES[idx]] = value
+    return out
@@ -1,15 +1,15 @@
+from itertools import compress
 from typing import List, Dict, Tuple, Any, Optional
 
 # ==============================================================================
 # 0. Imports & Setup
 # ==============================================================================
-from ..utils import (
-    calculate_hand_strength, 
-    RANKS, 
-    SUITS
-)
+from ..utils import calculate_hand_strength
 from features import canonicalize_hand
+from core.metrics import HOT_PATH
 from .range_data import RFI_RANGES, FACING_OPEN, FACING_3BET, COLD_4BET
+from . import bitset
+from .combos import COMBOS, COMBO_HAND, COMBO_INDEX, HAND_COMBOS
 
 def _canonicalize_hand_code(code: str) -> str:
     """使用 features.canonicalize_hand 統一格式，保留原始值作為 fallback。"""
@@ -122,61 +122,11 @@ class RangeAnalyzer:
     """
     
     def __init__(self):
-        # 1326 種組合的完整映射 (HandCode -> List of Combos)
-        self._hand_code_to_combos: Dict[str, List[Tuple[str, str]]] = self._generate_all_combos_map()
+        # 1326 種組合的完整映射 (HandCode -> List of Combos)，與 range_tables 的陣列共用 combos 模組的排序
+        self._hand_code_to_combos: Dict[str, List[Tuple[str, str]]] = HAND_COMBOS
         # 反向映射 (Combo -> HandCode)
-        self._combo_to_hand_code: Dict[Tuple[str, str], str] = self._generate_reverse_combo_map()
-        
-    def _generate_all_combos_map(self) -> Dict[str, List[Tuple[str, str]]]:
-        """
-        生成並映射所有 1326 種手牌組合。
-        Key 格式範例: 'AA', 'AKs', 'AKo'
-        """
-        all_combos = {}
-        ordered_ranks = "23456789TJQKA"
-        current_suits = SUITS
-
-        for i in range(len(ordered_ranks)):
-            for j in range(len(ordered_ranks)):
-                r1 = ordered_ranks[i]
-                r2 = ordered_ranks[j]
-                
-                # 1. 對子
-                if i == j:
-                    key = r1 + r1
-                    if key not in all_combos: all_combos[key] = []
-                    for s1_idx in range(len(current_suits)):
-                        for s2_idx in range(s1_idx + 1, len(current_suits)):
-                            # 排序以保證一致性
-                            c1, c2 = r1 + current_suits[s1_idx], r1 + current_suits[s2_idx]
-                            all_combos[key].append(tuple(sorted((c1, c2))))
-                            
-                # 2. 非對子
-                elif i > j:
-                    high, low = r1, r2
-                    key_s = high + low + "s"
-                    key_o = high + low + "o"
-                    
-                    if key_s not in all_combos: all_combos[key_s] = []
-                    if key_o not in all_combos: all_combos[key_o] = []
-                    
-                    for s1 in current_suits:
-                        for s2 in current_suits:
-                            combo = tuple(sorted((high + s1, low + s2)))
-                            if s1 == s2:
-                                all_combos[key_s].append(combo)
-                            else:
-                                if combo not in all_combos[key_o]:
-                                    all_combos[key_o].append(combo)
-        return all_combos
-
-    def _generate_reverse_combo_map(self) -> Dict[Tuple[str, str], str]:
-        mapping = {}
-        for code, combos in self._hand_code_to_combos.items():
-            for combo in combos:
-                mapping[combo] = code
-        return mapping
-        
+        self._combo_to_hand_code: Dict[Tuple[str, str], str] = dict(zip(COMBOS, COMBO_HAND))
+
     def get_hand_combos(self, hand_code: str) -> Optional[List[Tuple[str, str]]]:
         if not hand_code: return None
         clean_code = hand_code.upper()
@@ -191,14 +141,24 @@ class RangeAnalyzer:
     ) -> Dict[Tuple[str, str], float]:
         """將 HandCode 的權重範圍展開為具體的 1326 組合權重"""
         combo_range = {}
-        dead_cards = dead_cards or set()
+        HOT_PATH.add("range_expansions")
+        # 死牌：每張牌預先算好的 combo mask 做 OR；手牌的 mask 與死牌不相交時整手保留，
+        # 相交時才依展開的 byte flags (1 = 存活) 挑出殘存組合
+        dead = bitset.dead_mask(dead_cards)
+        live = None
         
         for code, weight in weighted_range.items():
             combos = self.get_hand_combos(code)
             if not combos: continue
             
             # 分配權重給每個殘存組合
-            valid_combos = [c for c in combos if c[0] not in dead_cards and c[1] not in dead_cards]
+            start = COMBO_INDEX[combos[0]]
+            if not dead or not dead & bitset.HAND_MASKS[COMBO_HAND[start]]:
+                valid_combos = combos
+            else:
+                if live is None:
+                    live = bitset.flags(~dead)
+                valid_combos = list(compress(combos, live[start:start + len(combos)]))
             if not valid_combos: continue
             
             # 權重應按比例分配 (如果總組合 6 個，剩 3 個，權重減半)
@@ -206,6 +166,23 @@ class RangeAnalyzer:
             # 這裡採用 standard normalization:
             for combo in valid_combos:
                 combo_range[combo] = weight
+        HOT_PATH.add("combo_iterations", len(combo_range))
+        return combo_range
+
+    def combos_from_weights(
+        self, weights, dead_cards: Optional[set] = None, members: Optional[int] = None
+    ) -> Dict[Tuple[str, str], float]:
+        """
+        1326 權重陣列 (range_tables 的表，combos.COMBOS 順序) 展開為 combo 權重，含死牌的組合略過。
+        members 為已知的成員 bitset (例如 RangeTables.bits)，死牌以 bitset 一次扣除。
+        """
+        HOT_PATH.add("range_expansions")
+        if members is None:
+            members = bitset.from_weights(weights)
+        if dead_cards:
+            members &= ~bitset.dead_mask(dead_cards)
+        combo_range = bitset.to_combo_range(members, weights)
+        HOT_PATH.add("combo_iterations", len(combo_range))
         return combo_range
 
     def get_preflop_weighted_range(self, hero_pos: str, villain_pos: str, action: str = 'RFI') -> Dict[str, float]:
@@ -252,11 +229,16 @@ class RangeAnalyzer:
         }
 
         if not combo_range: return range_summary
+        HOT_PATH.add("range_summaries")
+        HOT_PATH.add("combo_iterations", len(combo_range))
+        # 再次檢查 Dead Cards (Double check)：公牌的 combo mask 做 OR，展開成每個 combo 一個 byte
+        board_dead = bitset.flags(bitset.dead_mask(board_cards)) if board_cards else None
         board_set = set(board_cards)
         
         for combo, weight in combo_range.items():
-            # 再次檢查 Dead Cards (Double check)
-            if combo[0] in board_set or combo[1] in board_set: continue
+            if board_dead is not None:
+                i = COMBO_INDEX.get(combo)
+                if board_dead[i] if i is not None else (combo[0] in board_set or combo[1] in board_set): continue
             
             try:
                 cat, details = calculate_hand_strength(list(combo), board_cards)
@@ -279,14 +261,19 @@ class RangeAnalyzer:
         villain_combo_range: Dict[Tuple[str, str], float],
         board_cards: List[str],
         features: Optional[Dict[str, Any]] = None,
-        ctx: Optional[Dict[str, Any]] = None
+        ctx: Optional[Dict[str, Any]] = None,
+        summaries: Optional[Tuple[Dict[str, float], Dict[str, float]]] = None
     ) -> Dict[str, Any]:
         """
         計算 Hero 相對於 Villain 的範圍優勢 (Range Advantage) 與堅果優勢 (Nut Advantage)。
         進化版本：包含權益實現修正 (Realized Advantage)。
+        summaries 為已算好的 (hero_summary, villain_summary)，提供時不再重算。
         """
-        hero_summary = self.get_postflop_range_summary(hero_combo_range, board_cards)
-        villain_summary = self.get_postflop_range_summary(villain_combo_range, board_cards)
+        if summaries is not None:
+            hero_summary, villain_summary = summaries
+        else:
+            hero_summary = self.get_postflop_range_summary(hero_combo_range, board_cards)
+            villain_summary = self.get_postflop_range_summary(villain_combo_range, board_cards)
 
         def get_score(summary):
             if not summary or summary.get("total_active_combos", 0) == 0: return 0.5
@@ -374,6 +361,9 @@ class RangeAnalyzer:
         is_wet = conn_score >= 60 or is_dynamic
         
         filtered = base_combo_range.copy()
+        HOT_PATH.add("range_copies")
+        HOT_PATH.add("range_filters")
+        HOT_PATH.add("combo_iterations", len(filtered))
         
         for combo, weight in filtered.items():
             # 獲取該組合的實際牌力
@@ -3,6 +3,7 @@ from __future__ import annotations
 from typing import Dict, Any, Tuple
 import traceback
 
+from core.metrics import RANGE_SECONDS, ERRORS
 from .range import RANGE_ANALYZER  # 單例：避免重複生成 1326 combos
 from ..gto import DecisionMaker
 
@@ -141,17 +142,18 @@ def ensure_range_math_data(features: Dict[str, Any], ctx: Dict[str, Any], street
         return ctx
 
     try:
-        # 3. 獲取動態範圍 (考慮行動歷史後的 Capping)
-        from .range_utils import apply_action_history_to_ranges
-        board_cards = features.get("board_cards", [])
-        hero_combo_range, villain_combo_range = apply_action_history_to_ranges(features, board_cards)
-
-        # 4. 計算 Postflop 範圍分布 (使用 Combo 模式)
-        hero_summary = _RA.get_postflop_range_summary(hero_combo_range, board_cards)
-        villain_summary = _RA.get_postflop_range_summary(villain_combo_range, board_cards)
-
-        # 5. 計算優勢分數 (利用已進化的 calculate_advantage)
-        adv_res = _RA.calculate_advantage(hero_combo_range, villain_combo_range, board_cards, features, ctx)
+        with RANGE_SECONDS.time(stage="math_data"):
+            # 3. 獲取動態範圍 (考慮行動歷史後的 Capping)
+            # 4. 計算 Postflop 範圍分布 (使用 Combo 模式；重播與摘要皆有快取，只重算被修改的部分)
+            from .range_utils import get_range_summaries
+            board_cards = features.get("board_cards", [])
+            hero_combo_range, villain_combo_range, hero_summary, villain_summary = get_range_summaries(features, board_cards)
+
+            # 5. 計算優勢分數 (利用已進化的 calculate_advantage)
+            adv_res = _RA.calculate_advantage(
+                hero_combo_range, villain_combo_range, board_cards, features, ctx,
+                summaries=(hero_summary, villain_summary),
+            )
 
         # 6. 更新 GTO 數據到 math_data
         hero_pos = str(features.get("hero_pos", features.get("hero_position", "BTN"))).upper()
@@ -177,6 +179,7 @@ def ensure_range_math_data(features: Dict[str, Any], ctx: Dict[str, Any], street
         
     except Exception as e:
         traceback.print_exc()
+        ERRORS.inc(phase="range")
         print(f"⚠️ Range Context Error: {e}")
         math_data.update({"street": street, "ratio": 1.0, "error": str(e)})
 
@@ -0,0 +1,241 @@
+# strategy/ranges/range_tables.py
+"""
+範圍表的二進位檔 (range_tables.bin)：把 range_data 的每個範圍編譯成 1326 個 float64
+(combos.COMBOS 的順序)，以 mmap 唯讀載入。ENGINE_WORKERS 的每個 worker 對應到同一份
+page cache，不必各自展開手牌代碼。
+
+    python -m strategy.ranges.range_tables          # 建置 (range_data 修改後)
+    python -m strategy.ranges.range_tables --check  # 只檢查檔案是否為最新
+
+檔案格式 (little/big endian 依建置機器，記錄在標頭)：
+    標頭  magic "PKRT" | FORMAT_VERSION (u16) | byteorder (u16) | sha256 (32 bytes) | 表數 (u32) | 名稱長度 (u32)
+    名稱  utf-8，以 "\\n" 分隔，補齊到 8 bytes
+    資料  表數 × 1326 個 double
+
+sha256 = FORMAT_VERSION + combos 排序 + range_data.py / range.py / 本檔的內容。
+載入時雜湊不符 (範圍表或編譯方式改過) 或檔案不存在會重新建置；無法寫入時改用記憶體內編譯的表。
+
+表名稱：
+    rfi/{pos}
+    facing_open/{hero}/{opener}/3bet|call
+    facing_3bet/{hero}/{3bettor}/4bet|call
+    cold_4bet/{hero}/4bet|call
+    limped_capped                          (跛入底池雙方的封頂範圍)
+"""
+from __future__ import annotations
+
+import os
+import sys
+import mmap
+import struct
+import hashlib
+import argparse
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from . import bitset, combos
+from .combos import NUM_COMBOS, weights_from_hands
+from .range import RFI_RANGES, FACING_OPEN, FACING_3BET, COLD_4BET
+
+FORMAT_VERSION = 1
+MAGIC = b"PKRT"
+
+_HERE = Path(__file__).resolve().parent
+# 空字串 = 不使用檔案 (每個行程各自在記憶體內編譯)
+RANGE_TABLES_PATH = os.getenv("RANGE_TABLES_PATH", str(_HERE / "range_tables.bin"))
+
+_HEADER = struct.Struct("<4sHH32sII")
+_BYTEORDER = {"little": 0, "big": 1}[sys.byteorder]
+_ITEM = array("d").itemsize
+
+# 跛入/過牌底池 (Limped Pot)：雙方範圍極寬且封頂 (Capped)
+# 以 BTN RFI 範圍為基底，移除頂端強牌 (AA-TT, AK, AQs)，權重稍微降低表示不確定性
+LIMPED_BASE_POSITION = "BTN"
+LIMPED_PREMIUM = frozenset({"AA", "KK", "QQ", "JJ", "TT", "AKs", "AKo", "AQs"})
+LIMPED_WEIGHT = 0.8
+
+
+# ==============================================================================
+# 編譯
+# ==============================================================================
+
+def _hands(hand_list) -> Dict[str, float]:
+    return {code: 1.0 for code in hand_list or []}
+
+
+def compile_tables() -> Dict[str, array]:
+    """由 range.py 已正規化的表編譯出所有 1326 陣列 (建置與 fallback 共用)。"""
+    tables: Dict[str, array] = {}
+    for pos, weighted in RFI_RANGES.items():
+        tables[f"rfi/{pos}"] = weights_from_hands(weighted)
+    for hero, sub in FACING_OPEN.items():
+        for opener, ranges in (sub or {}).items():
+            for act in ("3bet", "call"):
+                tables[f"facing_open/{hero}/{opener}/{act}"] = weights_from_hands(_hands((ranges or {}).get(act)))
+    for hero, sub in FACING_3BET.items():
+        for threebettor, ranges in (sub or {}).items():
+            for act in ("4bet", "call"):
+                tables[f"facing_3bet/{hero}/{threebettor}/{act}"] = weights_from_hands(_hands(ranges.get(act)))
+    for hero, ranges in COLD_4BET.items():
+        for act in ("4bet", "call"):
+            tables[f"cold_4bet/{hero}/{act}"] = weights_from_hands(_hands((ranges or {}).get(act)))
+    base = RFI_RANGES.get(LIMPED_BASE_POSITION, {})
+    tables["limped_capped"] = weights_from_hands(
+        {code: LIMPED_WEIGHT for code in base if code not in LIMPED_PREMIUM}
+    )
+    return tables
+
+
+def source_digest() -> bytes:
+    h = hashlib.sha256()
+    h.update(f"{FORMAT_VERSION}|{NUM_COMBOS}|".encode())
+    h.update(combos.COMBO_ORDER_KEY.encode())
+    for name in ("range_data.py", "range.py", "range_tables.py"):
+        h.update(b"|" + name.encode() + b"|")
+        h.update((_HERE / name).read_bytes())
+    return h.digest()
+
+
+def build(path: str = RANGE_TABLES_PATH, digest: Optional[bytes] = None) -> Tuple[int, int]:
+    """寫入二進位檔 (先寫暫存檔再 rename，其他行程不會讀到寫一半的檔)。回傳 (表數, bytes)。"""
+    tables = compile_tables()
+    names = list(tables)
+    name_blob = "\n".join(names).encode("utf-8")
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, _BYTEORDER, digest or source_digest(), len(names), len(name_blob))
+    head = header + name_blob
+    head += b"\0" * (-len(head) % _ITEM)
+
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(head)
+        for name in names:
+            f.write(tables[name].tobytes())
+    os.replace(tmp, target)
+    return len(names), len(head) + len(names) * NUM_COMBOS * _ITEM
+
+
+# ==============================================================================
+# 載入
+# ==============================================================================
+
+class RangeTables:
+    """
+    tables = get_range_tables()
+    weights = tables.get("rfi/BTN")   # 1326 個 float 的唯讀 memoryview，沒有此表時為 None
+    members = tables.bits("rfi/BTN")  # 權重 > 0 的 combos (bitset.py)，沒有此表時為 0
+    """
+
+    __slots__ = ("source", "_tables", "_mmap", "_bits")
+
+    def __init__(self, tables: Dict[str, memoryview], source: str, mm: Optional[mmap.mmap] = None):
+        self.source = source  # 檔案路徑，或 "memory" (未使用檔案)
+        self._tables = tables
+        self._mmap = mm
+        self._bits: Dict[str, int] = {}
+
+    def get(self, name: str) -> Optional[memoryview]:
+        return self._tables.get(name)
+
+    def bits(self, name: str) -> int:
+        """第一次使用時由權重算出並保留 (每個行程各自一份，只有 166 bytes)。"""
+        members = self._bits.get(name)
+        if members is None:
+            weights = self._tables.get(name)
+            members = self._bits[name] = bitset.from_weights(weights) if weights is not None else bitset.EMPTY
+        return members
+
+    def names(self) -> List[str]:
+        return list(self._tables)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tables
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    def __repr__(self) -> str:
+        return f"RangeTables({len(self._tables)} tables from {self.source})"
+
+
+def load(path: str, digest: Optional[bytes] = None) -> Optional[RangeTables]:
+    """mmap 載入；檔案不存在、格式或雜湊不符時回傳 None。"""
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(mm) < _HEADER.size:
+        return None
+    magic, version, byteorder, file_digest, count, names_len = _HEADER.unpack_from(mm, 0)
+    if (magic, version, byteorder) != (MAGIC, FORMAT_VERSION, _BYTEORDER):
+        return None
+    if file_digest != (digest or source_digest()):
+        return None
+    offset = _HEADER.size + names_len
+    offset += -offset % _ITEM
+    if len(mm) != offset + count * NUM_COMBOS * _ITEM:
+        return None
+    names = bytes(mm[_HEADER.size:_HEADER.size + names_len]).decode("utf-8").split("\n") if count else []
+    data = memoryview(mm)[offset:].cast("d")
+    tables = {name: data[i * NUM_COMBOS:(i + 1) * NUM_COMBOS] for i, name in enumerate(names)}
+    return RangeTables(tables, str(path), mm)
+
+
+def _in_memory() -> RangeTables:
+    return RangeTables({name: memoryview(arr).toreadonly() for name, arr in compile_tables().items()}, "memory")
+
+
+def open_tables(path: str = RANGE_TABLES_PATH) -> RangeTables:
+    """載入二進位檔；過期或不存在就重新建置，仍無法使用時改用記憶體內編譯的表。"""
+    if not path:
+        return _in_memory()
+    digest = source_digest()
+    tables = load(path, digest)
+    if tables is not None:
+        return tables
+    try:
+        count, size = build(path, digest)
+        print(f"🔧 範圍表已重新建置: {path} ({count} 張表, {size // 1024} KB)")
+    except OSError as e:
+        print(f"⚠️ 範圍表無法寫入 ({path}): {e}，改用記憶體內編譯")
+        return _in_memory()
+    return load(path, digest) or _in_memory()
+
+
+_TABLES: Optional[RangeTables] = None
+_TABLES_LOCK = threading.Lock()
+
+
+def get_range_tables() -> RangeTables:
+    global _TABLES
+    if _TABLES is None:
+        with _TABLES_LOCK:
+            if _TABLES is None:
+                _TABLES = open_tables()
+    return _TABLES
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compile range_data into the binary range tables")
+    parser.add_argument("--path", default=RANGE_TABLES_PATH or str(_HERE / "range_tables.bin"))
+    parser.add_argument("--check", action="store_true", help="only verify that the file is up to date")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        tables = load(args.path)
+        if tables is None:
+            print(f"❌ {args.path} 不存在或已過期 (請執行 python -m strategy.ranges.range_tables)")
+            return 1
+        print(f"✅ {args.path} 為最新 ({len(tables)} 張表)")
+        return 0
+    count, size = build(args.path)
+    print(f"✅ {args.path}: {count} 張表, {size} bytes, sha256={source_digest().hex()[:12]}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
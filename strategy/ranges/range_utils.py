@@ -1,75 +1,148 @@
-from typing import List, Dict, Any
-from .range import RANGE_ANALYZER, get_preflop_range
-
-def _flatten(range_data: Dict[str, Any]) -> Dict[str, float]:
-    """將複雜的 Preflop Range 格式扁平化為 Dict[str, float]"""
-    if not range_data: return {}
-    flattened = {}
-    for hand, data in range_data.items():
-        if isinstance(data, dict):
-            # 取最大頻率 (例如 {"raise": 0.8, "call": 0.2} -> 1.0)
-            flattened[hand] = sum(data.values())
-        else:
-            flattened[hand] = float(data)
-    return flattened
+import os
+import threading
+from collections import OrderedDict
+from array import array
+from typing import List, Dict, Any, Tuple, Optional, Sequence, Union
+from core.metrics import RANGE_SECONDS, HOT_PATH
+from .range import RANGE_ANALYZER
+from .range_tables import get_range_tables
+from .combos import NUM_COMBOS
+from .notation import parse_range
+
+# 範圍重播快照 (每條街結束時的 Hero/Villain combo 範圍) 與範圍摘要的 LRU 容量
+RANGE_CACHE_SIZE = int(os.getenv("RANGE_CACHE_SIZE", "64"))
+
+ComboRange = Dict[Tuple[str, str], float]
+# 範圍字串 (notation.parse_range 的語法) 或 1326 權重陣列
+CustomRange = Union[str, Sequence[float]]
+
+
+class _LRU:
+    """小型 thread-safe LRU (server 會在多個 executor thread 同時呼叫)。"""
+
+    def __init__(self, size: int):
+        self.size = max(int(size), 0)
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        if not self.size:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# 快取內的 combo 範圍會被多個請求共用：呼叫端只能讀取 (filter_range_by_action 本身會先 copy)
+_REPLAY_CACHE = _LRU(RANGE_CACHE_SIZE * 4)  # 每個牌局最多 4 個街快照 + 起始範圍
+_SUMMARY_CACHE = _LRU(RANGE_CACHE_SIZE)
 
-def apply_action_history_to_ranges(features: Dict[str, Any], board_cards: List[str]):
+
+def clear_range_caches() -> None:
+    """清空範圍重播快照與摘要快取 (bench 量測冷啟動路徑用)。"""
+    _REPLAY_CACHE.clear()
+    _SUMMARY_CACHE.clear()
+
+def apply_action_history_to_ranges(
+    features: Dict[str, Any],
+    board_cards: List[str],
+    hero_range: Optional[CustomRange] = None,
+    villain_range: Optional[CustomRange] = None,
+):
     """
     根據行動歷史過濾 Hero 與 Villain 的範圍。
     進化版本：起始即使用 1326 Combo 級別追蹤。
+    hero_range / villain_range：自訂起始範圍 (範圍字串如 "22+, A2s+, KTo+, 76s:0.5"，或 1326 權重陣列)，
+    未提供時讀 features 的 "hero_range" / "villain_range"，都沒有才使用翻前範圍表。
     """
     hero_pos = features.get("hero_pos", features.get("hero_position", "BTN"))
     villain_pos = features.get("villain_pos", features.get("villain_position", "BB"))
     actions = features.get("actions", [])
     hero_hole_cards = features.get("hero_cards", []) # Hero 的具體手牌作為已知死牌
+    HOT_PATH.add("action_history_replays")
+
+    hero_custom = _custom_range(hero_range if hero_range is not None else features.get("hero_range"))
+    villain_custom = _custom_range(villain_range if villain_range is not None else features.get("villain_range"))
     
     # 初始死牌 (公牌 + Hero 手牌)
     dead_set = set(board_cards) | set(hero_hole_cards)
-    
-    # 1. 分析 Preflop 結構以決定初始範圍
-    # [FIX] 區分加注底池 (Raised Pot) 與 跛入底池 (Limped Pot)
-    preflop_acts = []
-    if isinstance(actions, dict):
-        preflop_acts = actions.get("preflop", [])
-    elif isinstance(actions, list):
-        preflop_acts = [a for a in actions if a.get("street") == "preflop"]
-        
-    has_raise = any(str(a.get("action", "")).lower() in ["open", "raise"] for a in preflop_acts)
-    
-    if has_raise:
-        # 加注底池：假設 Hero RFI (或被動), Villain Call (或 RFI)
-        # 這裡簡化假設 Hero 是主要視角，若 Hero 沒 Open 則可能邏輯需反轉，但暫維持原樣
-        h_pre_weighted = _flatten(get_preflop_range("RFI", hero_pos))
-        
-        # 對於防守方 (Villain)
-        v_preflop_data = get_preflop_range("facing_open", villain_pos, hero_pos)
-        v_call_range = {}
-        for hand, acts in v_preflop_data.items():
-            if "call" in acts:
-                v_call_range[hand] = acts["call"]
-        v_pre_weighted = _flatten(v_call_range)
-    else:
-        # 跛入/過牌底池 (Limped Pot)：雙方範圍極寬且封頂 (Capped)
-        # 模擬 Top 60% 範圍，並移除頂端 5% 強牌 (AA-TT, AK, AQs)
-        # 這裡直接調用寬範圍 (RFI UTG 類似 Top 15%, BTN 50%) - 我們用 BTN 範圍作為基底並放寬
-        base_range = _flatten(get_preflop_range("RFI", "BTN")) 
-        
-        # 移除強牌 (Capping)
-        capped_range = {}
-        premium = {"AA", "KK", "QQ", "JJ", "TT", "AKs", "AKo", "AQs"}
-        for hand, w in base_range.items():
-            if hand not in premium:
-                capped_range[hand] = 0.8 # 稍微降低權重表示不確定性
-        
-        h_pre_weighted = capped_range
-        v_pre_weighted = capped_range.copy()
 
-    hero_range = RANGE_ANALYZER.convert_weighted_range_to_combos(h_pre_weighted, dead_set)
-    villain_range = RANGE_ANALYZER.convert_weighted_range_to_combos(v_pre_weighted, dead_set)
+    # 行動依時間順序攤平 (缺 street 的 action 會補上)
+    flat_actions = _flatten_actions(actions)
+
+    # 快取鍵：過濾只看行動種類 (不看金額)，但前翻/河牌的過濾與死牌都用完整公牌，公牌須完全相同
+    base_key = (
+        str(hero_pos), str(villain_pos), tuple(hero_hole_cards or ()), tuple(board_cards or ()),
+        _has_preflop_raise(actions), hero_custom[0], villain_custom[0],
+    )
+    steps = [
+        (str(a.get("street", "")).lower(), str(a.get("player", "")).upper(), str(a.get("action", "")).lower())
+        for a in flat_actions if isinstance(a, dict)
+    ]
+    # 可沿用的前綴：每條街結束處 + 起始範圍
+    boundaries = sorted({0, len(steps)} | {i + 1 for i in range(len(steps)) if i + 1 == len(steps) or steps[i + 1][0] != steps[i][0]})
 
-    # 2. 依次對各街行動進行過濾 (Range Capping)
+    start = 0
+    cached = None
+    for n in reversed(boundaries):
+        cached = _REPLAY_CACHE.get(base_key + tuple(steps[:n]))
+        if cached is not None:
+            start = n
+            break
+    if cached is not None:
+        HOT_PATH.add("range_replay_cache_hits")
+        hero_range, villain_range = cached
+        if start == len(steps):
+            return hero_range, villain_range
+    else:
+        HOT_PATH.add("range_replay_cache_misses")
+        hero_range, villain_range = _initial_ranges(actions, hero_pos, villain_pos, dead_set, hero_custom[1], villain_custom[1])
+        _REPLAY_CACHE.put(base_key, (hero_range, villain_range))
+
+    # 2. 依次對各街行動進行過濾 (Range Capping)，只重算 start 之後的行動
     from features import analyze_board
-    
+
+    board_info_cache: Dict[int, Dict[str, Any]] = {}
+    for index in range(start, len(steps)):
+        street, p, a = steps[index]
+
+        # 獲取當時街的公牌
+        if street == "flop":
+            current_board = board_cards[:3]
+        elif street == "turn":
+            current_board = board_cards[:4]
+        else:
+            current_board = board_cards
+
+        if current_board and len(current_board) not in board_info_cache:
+            board_info_cache[len(current_board)] = analyze_board(current_board)
+        current_board_info = board_info_cache.get(len(current_board), {}) if current_board else {}
+
+        if p == "HERO":
+            hero_range = RANGE_ANALYZER.filter_range_by_action(hero_range, a, street, current_board, current_board_info)
+        else:
+            villain_range = RANGE_ANALYZER.filter_range_by_action(villain_range, a, street, current_board, current_board_info)
+
+        if index + 1 in boundaries:
+            _REPLAY_CACHE.put(base_key + tuple(steps[:index + 1]), (hero_range, villain_range))
+
+    return hero_range, villain_range
+
+
+def _flatten_actions(actions: Any) -> List[Dict[str, Any]]:
     # [FIX] actions is a Dict {street: [list_of_actions]}, we need to flatten it chronologically
     flat_actions = []
     if isinstance(actions, dict):
@@ -84,31 +157,90 @@ def apply_action_history_to_ranges(features: Dict[str, Any], board_cards: List[s
                          flat_actions.append(item)
     elif isinstance(actions, list):
         flat_actions = actions
+    return flat_actions
 
-    for act in flat_actions:
-        if not isinstance(act, dict):
-            continue
-        street = act.get("street", "").lower()
-        p = act.get("player", "").upper()
-        a = act.get("action", "").lower()
-        
-        # 獲取當時街的公牌
-        if street == "flop":
-            current_board = board_cards[:3]
-        elif street == "turn":
-            current_board = board_cards[:4]
-        else:
-            current_board = board_cards
-            
-        current_board_info = analyze_board(current_board) if current_board else {}
-            
-        if p == "HERO":
-            hero_range = RANGE_ANALYZER.filter_range_by_action(hero_range, a, street, current_board, current_board_info)
-        else:
-            villain_range = RANGE_ANALYZER.filter_range_by_action(villain_range, a, street, current_board, current_board_info)
-            
+
+def _preflop_actions(actions: Any) -> List[Dict[str, Any]]:
+    if isinstance(actions, dict):
+        return actions.get("preflop", [])
+    if isinstance(actions, list):
+        return [a for a in actions if a.get("street") == "preflop"]
+    return []
+
+
+def _has_preflop_raise(actions: Any) -> bool:
+    return any(str(a.get("action", "")).lower() in ["open", "raise"] for a in _preflop_actions(actions))
+
+
+def _custom_range(value: Optional[CustomRange]) -> Tuple[Any, Optional[Sequence[float]]]:
+    """自訂範圍 → (快取鍵, 1326 權重)；範圍字串經 parse_range 解析 (同一字串只解析一次)。"""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None, None
+    if isinstance(value, str):
+        return value.strip(), parse_range(value)
+    if len(value) != NUM_COMBOS:
+        raise ValueError(f"自訂範圍須為 {NUM_COMBOS} 個權重 (收到 {len(value)})")
+    weights = array("d", value)
+    return weights.tobytes(), weights
+
+
+def check_custom_range(value: Optional[CustomRange]) -> None:
+    """自訂範圍格式錯誤 (無法解析的範圍字串、權重數不是 1326) 時丟出 ValueError；API 在送進 Engine 前先檢查。"""
+    _custom_range(value)
+
+
+def _initial_ranges(
+    actions: Any, hero_pos: str, villain_pos: str, dead_set: set,
+    hero_weights: Optional[Sequence[float]] = None, villain_weights: Optional[Sequence[float]] = None,
+) -> Tuple[ComboRange, ComboRange]:
+    # 1. 分析 Preflop 結構以決定初始範圍 (range_tables 預先編譯好的 1326 陣列；自訂範圍優先)
+    # [FIX] 區分加注底池 (Raised Pot) 與 跛入底池 (Limped Pot)
+    tables = get_range_tables()
+    hero, villain = str(hero_pos or "").upper(), str(villain_pos or "").upper()
+
+    if _has_preflop_raise(actions):
+        # 加注底池：假設 Hero RFI (或被動), Villain Call (或 RFI)
+        # 這裡簡化假設 Hero 是主要視角，若 Hero 沒 Open 則可能邏輯需反轉，但暫維持原樣
+        h_table = f"rfi/{hero}"
+        # 對於防守方 (Villain)：面對 Hero open 的跟注範圍
+        v_table = f"facing_open/{villain}/{hero}/call"
+    else:
+        # 跛入/過牌底池 (Limped Pot)：雙方範圍極寬且封頂 (Capped)，見 range_tables.LIMPED_*
+        h_table = v_table = "limped_capped"
+
+    if hero_weights is not None:
+        hero_range = RANGE_ANALYZER.combos_from_weights(hero_weights, dead_set)
+    else:
+        hero_range = RANGE_ANALYZER.combos_from_weights(tables.get(h_table) or (), dead_set, tables.bits(h_table))
+    if villain_weights is not None:
+        villain_range = RANGE_ANALYZER.combos_from_weights(villain_weights, dead_set)
+    else:
+        villain_range = RANGE_ANALYZER.combos_from_weights(tables.get(v_table) or (), dead_set, tables.bits(v_table))
     return hero_range, villain_range
 
+
+def get_range_summaries(
+    features: Dict[str, Any], board_cards: List[str]
+) -> Tuple[ComboRange, ComboRange, Dict[str, float], Dict[str, float]]:
+    """
+    重播範圍並計算兩邊的 postflop 摘要；同一牌局 (同公牌、同行動種類) 的摘要直接取快取。
+    回傳 (hero_range, villain_range, hero_summary, villain_summary)，摘要為副本可自由修改。
+    """
+    hero_range, villain_range = apply_action_history_to_ranges(features, board_cards)
+    key = (id(hero_range), id(villain_range), tuple(board_cards or ()))
+    cached = _SUMMARY_CACHE.get(key)
+    # id 可能被回收重用：確認快取對應的仍是同一組範圍物件
+    if cached is not None and cached[0] is hero_range and cached[1] is villain_range:
+        HOT_PATH.add("range_summary_cache_hits")
+        hero_summary, villain_summary = cached[2], cached[3]
+    else:
+        HOT_PATH.add("range_summary_cache_misses")
+        hero_summary = RANGE_ANALYZER.get_postflop_range_summary(hero_range, board_cards)
+        villain_summary = RANGE_ANALYZER.get_postflop_range_summary(villain_range, board_cards)
+        _SUMMARY_CACHE.put(key, (hero_range, villain_range, hero_summary, villain_summary))
+    return hero_range, villain_range, dict(hero_summary), dict(villain_summary)
+
+
 def get_dynamic_advantage(features: Dict[str, Any], ctx: Dict[str, Any]):
     """
     獲取動態 Advantage 數據。
@@ -117,5 +249,8 @@ def get_dynamic_advantage(features: Dict[str, Any], ctx: Dict[str, Any]):
     if not board_cards:
         return {"range_advantage": 1.0, "nut_advantage": 1.0}
         
-    hero_range, villain_range = apply_action_history_to_ranges(features, board_cards)
-    return RANGE_ANALYZER.calculate_advantage(hero_range, villain_range, board_cards, features, ctx)
+    with RANGE_SECONDS.time(stage="advantage"):
+        hero_range, villain_range, hero_summary, villain_summary = get_range_summaries(features, board_cards)
+        return RANGE_ANALYZER.calculate_advantage(
+            hero_range, villain_range, board_cards, features, ctx, summaries=(hero_summary, villain_summary)
+        )
@@ -3,7 +3,7 @@ from typing import Dict, Any, Optional, List
 import random
 import re
 
-from ..ranges import range as ranges
+from ..ranges import preflop_index
 from ..utils import normalize_hand_code_preflop, format_output, weighted_choice
 
 _FACING_4BET_RAISE = {"AA", "KK", "QQ", "AKs", "AKo"}
@@ -59,6 +59,7 @@ def recommend_preflop(features: Dict[str, Any], ctx: Dict[str, Any]) -> Dict[str
     # 1. Parsing
     hero_cards = features.get("hero_hole_cards", [])
     hand_code = normalize_hand_code_preflop(hero_cards)
+    hand_idx = preflop_index.hand_index(hero_cards)
     hero_pos = str(features.get("hero_position", "BTN")).upper()
     villain_pos = str(features.get("villain_position", "UTG")).upper()
 
@@ -137,10 +138,9 @@ def recommend_preflop(features: Dict[str, Any], ctx: Dict[str, Any]) -> Dict[str
         # Use ISO/RFI logic
         # For ISO, size up: 3bb + 1bb/limper + 1bb OOP
         range_key = "iso" if is_iso_spot else "RFI"
-        rfi_range = ranges.get_preflop_range(range_key, hero_pos)
-        
-        if hand_code in rfi_range:
-            prob = rfi_range[hand_code]
+        prob = preflop_index.lookup(range_key, hero_pos, None, hand_idx)
+
+        if prob is not None:
             if weighted_choice({"raise": prob, "fold": 1-prob}) == "raise":
                 size = _get_rfi_size(hero_pos)
                 if is_iso_spot:
@@ -174,8 +174,7 @@ def recommend_preflop(features: Dict[str, Any], ctx: Dict[str, Any]) -> Dict[str
 
     # --- B. Cold 4-Bet ---
     if is_cold_4bet_spot:
-        hero_range_table = ranges.get_preflop_range("cold_4bet", hero_pos)
-        if hand_code in hero_range_table:
+        if preflop_index.lookup("cold_4bet", hero_pos, None, hand_idx) is not None:
              # Cold 4-Bet Logic: Usually strict value
              size = _get_4bet_size(last_raise_amt, hero_is_ip)
              _mark_preflop_context(ctx, features, "raise")
@@ -194,11 +193,11 @@ def recommend_preflop(features: Dict[str, Any], ctx: Dict[str, Any]) -> Dict[str
     if facing_open:
         # Lookup range: Facing Open
         # range keys are typically "facing_open"
-        hero_range_table = ranges.get_preflop_range("facing_open", hero_pos, villain_pos)
-        # Table format: {hand: {'raise': 0.x, 'call': 0.y}}
-        
-        if hand_code in hero_range_table:
-            action_probs = hero_range_table[hand_code]
+        # Entry format: {'raise': 0.x, 'call': 0.y} (compiled index, copy before handing out)
+        entry = preflop_index.lookup("facing_open", hero_pos, villain_pos, hand_idx)
+
+        if entry is not None:
+            action_probs = dict(entry)
             chosen = weighted_choice(action_probs)
             
             _mark_preflop_context(ctx, features, chosen)
@@ -226,10 +225,10 @@ def recommend_preflop(features: Dict[str, Any], ctx: Dict[str, Any]) -> Dict[str
 
     # --- C. Facing 3-Bet ---
     if facing_3bet:
-        hero_range_table = ranges.get_preflop_range("facing_3bet", hero_pos, villain_pos)
-        
-        if hand_code in hero_range_table:
-            action_probs = hero_range_table[hand_code]
+        entry = preflop_index.lookup("facing_3bet", hero_pos, villain_pos, hand_idx)
+
+        if entry is not None:
+            action_probs = dict(entry)
             chosen = weighted_choice(action_probs)
             # In facing_3bet range, 'raise' Usually means 4-Bet
             